@@ -5,8 +5,8 @@ import json
 import asyncio
 import whisper_timestamped as whisper
 from utility.script.script_generator import generate_script, generate_prayer_script
-from utility.audio.audio_generator import generate_audio
-from utility.captions.timed_captions_generator import generate_timed_captions
+from utility.audio.audio_generator import TTS_STREAMING, generate_audio, generate_audio_stream
+from utility.captions.timed_captions_generator import generate_timed_captions, generate_timed_captions_streaming
 from utility.video.background_video_generator import generate_video_url
 from utility.render.render_engine import get_output_media
 from utility.video.video_search_query_generator import getVideoSearchQueriesTimed, merge_empty_intervals
@@ -89,24 +89,33 @@ async def generate_video_with_db(topic: str, credentials_name: str = "default",
         
         # Gerar áudio
         SAMPLE_FILE_NAME = f"audio_tts_{video_id}.wav" if video_id else "audio_tts.wav"
-        await generate_audio(response, SAMPLE_FILE_NAME, voice_name)
+        if TTS_STREAMING:
+            # Gerar áudio e legendas juntos: cada trecho é legendado enquanto os seguintes são sintetizados
+            timed_captions, word_timings = await generate_timed_captions_streaming(
+                generate_audio_stream(response, SAMPLE_FILE_NAME, voice_name))
+        else:
+            word_timings = await generate_audio(response, SAMPLE_FILE_NAME, voice_name)
+            
+            # Gerar legendas
+            timed_captions = generate_timed_captions(SAMPLE_FILE_NAME, word_timings=word_timings, script_text=response)
+        print(timed_captions)
+        
+        # Gerar termos de busca
+        search_terms = getVideoSearchQueriesTimed(response, timed_captions)
+        print(search_terms)
         
         # Aplicar pausas estratégicas se template especificado
         if template_id and template_config:
             print("⏱️ Aplicando pausas estratégicas...")
             pauses_config = template_config.get('script_pattern', {}).get('pauses_strategy', {})
             if pauses_config:
-                SAMPLE_FILE_NAME = template_render_engine.apply_strategic_pauses(SAMPLE_FILE_NAME, pauses_config)
+                SAMPLE_FILE_NAME, remap = template_render_engine.insert_strategic_pauses(
+                    SAMPLE_FILE_NAME, pauses_config, word_timings)
+                # Legendas e segmentos já calculados são deslocados, sem transcrever de novo
+                timed_captions = remap.captions(timed_captions)
+                search_terms = remap.segments(search_terms)
                 print(f"Pausas estratégicas aplicadas ao áudio")
         
-        # Gerar legendas
-        timed_captions = generate_timed_captions(SAMPLE_FILE_NAME)
-        print(timed_captions)
-        
-        # Gerar termos de busca
-        search_terms = getVideoSearchQueriesTimed(response, timed_captions)
-        print(search_terms)
-        
         # Gerar vídeos de fundo
         VIDEO_SERVER = "pexel"
         background_video_urls = None
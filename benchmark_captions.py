@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark do Alinhador de Legendas
+Mede getCaptionsWithTime em transcrições sintéticas (10 minutos por padrão) e
+compara com a implementação anterior (dicionário percorrido a cada palavra e
+fatiamento da lista de palavras), conferindo que as legendas são idênticas.
+
+Uso:
+    python benchmark_captions.py --minutes 10 30 60
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import re
+import time
+
+from utility.captions.timed_captions_generator import getCaptionsWithTime
+
+WORDS_PER_MINUTE = 150
+WORDS_PER_SEGMENT = 12
+
+VOCABULARY = [
+    "deus", "hoje", "nossa", "vida", "fé", "caminho", "família", "sempre", "força", "luz",
+    "coração,", "oração", "palavra.", "esperança", "momento", "juntos", "paz!", "amor", "tempo", "vitória?",
+]
+
+
+def synthetic_transcript(minutes, seed=42):
+    """Análise no formato do Whisper com segmentos de WORDS_PER_SEGMENT palavras"""
+    rng = random.Random(seed)
+    total_words = int(minutes * WORDS_PER_MINUTE)
+    seconds_per_word = 60.0 / WORDS_PER_MINUTE
+    segments = []
+    t = 0.0
+    for first in range(0, total_words, WORDS_PER_SEGMENT):
+        count = min(WORDS_PER_SEGMENT, total_words - first)
+        words = [rng.choice(VOCABULARY) for _ in range(count)]
+        # Pausas ocasionais entre segmentos
+        t += rng.choice([0.0, 0.0, 0.0, 1.5, 2.5])
+        end = t + count * seconds_per_word
+        segments.append({"text": " " + " ".join(words), "start": t, "end": end})
+        t = end
+    return {"text": "".join(segment["text"] for segment in segments), "segments": segments}
+
+
+# Implementação anterior, mantida só como referência de tempo e resultado
+
+def legacy_split_words_by_size(words, max_caption_size):
+    half_caption_size = max_caption_size / 2
+    captions = []
+    while words:
+        caption = words[0]
+        words = words[1:]
+        while words and len(caption + ' ' + words[0]) <= max_caption_size:
+            caption += ' ' + words[0]
+            words = words[1:]
+            if len(caption) >= half_caption_size and words:
+                break
+        captions.append(caption)
+    return captions
+
+
+def legacy_timestamp_mapping(whisper_analysis):
+    index = 0
+    location_to_timestamp = {}
+    for segment in whisper_analysis['segments']:
+        words = segment['text'].split()
+        word_duration = (segment['end'] - segment['start']) / len(words) if words else 0
+        for i, word in enumerate(words):
+            new_index = index + len(word) + 1
+            location_to_timestamp[(index, new_index)] = segment['start'] + ((i + 1) * word_duration)
+            index = new_index
+    return location_to_timestamp
+
+
+def legacy_interpolate(word_position, d):
+    for key, value in d.items():
+        if key[0] <= word_position <= key[1]:
+            return value
+    return None
+
+
+def legacy_captions_with_time(whisper_analysis, max_caption_size=15):
+    mapping = legacy_timestamp_mapping(whisper_analysis)
+    position = 0
+    start_time = 0
+    pairs = []
+    words = whisper_analysis['text'].split()
+    words = [re.sub(r'[^\w\s\-_"\'\']', '', word) for word in legacy_split_words_by_size(words, max_caption_size)]
+    words = [word for word in words if word.strip()]
+    for word in words:
+        position += len(word) + 1
+        end_time = legacy_interpolate(position, mapping)
+        if end_time and word:
+            if end_time - start_time > 1.0:
+                pause_duration = end_time - start_time
+                if pause_duration > 2.0:
+                    start_time = end_time
+                    continue
+                pairs.append(((start_time + (pause_duration * 0.1), end_time), word))
+            else:
+                pairs.append(((start_time, end_time), word))
+            start_time = end_time
+    return pairs
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def quiet(function):
+    """getCaptionsWithTime avisa cada pausa longa; o aviso não entra na medição"""
+    def wrapper(*args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return function(*args)
+    return wrapper
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do alinhador de legendas")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[10])
+    parser.add_argument("--skip-legacy", action="store_true", help="Não mede a implementação anterior")
+    args = parser.parse_args()
+
+    results = []
+    for minutes in args.minutes:
+        analysis = synthetic_transcript(minutes)
+        captions, seconds = timed(quiet(getCaptionsWithTime), analysis)
+        result = {
+            "minutes": minutes,
+            "words": len(analysis["text"].split()),
+            "captions": len(captions),
+            "seconds": round(seconds, 4),
+        }
+        if not args.skip_legacy:
+            legacy, legacy_seconds = timed(legacy_captions_with_time, analysis)
+            result["legacy_seconds"] = round(legacy_seconds, 4)
+            result["speedup"] = round(legacy_seconds / seconds, 1) if seconds else None
+            result["identical"] = legacy == captions
+        results.append(result)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Benchmark de Renderização
+Executa get_output_media (e opcionalmente TemplateRenderEngine.apply_template_to_video)
+com fixtures sintéticas 100% locais: narração gerada, legendas sintéticas de 1, 3 e
+10 minutos e clips de cor/ruído servidos por um servidor HTTP local no lugar das
+URLs do Pexels. Reporta tempo total, fps de codificação, tempo por etapa e pico de
+memória (RSS) em JSON, para comparar commits e backends.
+
+Uso:
+    python benchmark_render.py --durations 1 3 --backends moviepy ffmpeg --output bench.json
+"""
+
+import argparse
+import functools
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+RESULT_MARKER = "BENCHMARK_RESULT "
+
+BENCH_FPS = 25
+SEGMENT_SECONDS = 6.0
+CAPTION_SECONDS = 2.0
+WORDS_PER_CAPTION = 5
+
+# Palavras comuns e palavras-chave coloridas por get_word_color
+VOCABULARY = [
+    "deus", "hoje", "nossa", "vida", "fé", "caminho", "família", "sempre", "força", "luz",
+    "coração", "oração", "palavra", "esperança", "momento", "juntos", "paz", "amor", "tempo", "vitória",
+]
+
+# Fixtures de vídeo/imagem em resoluções e fps variados: (arquivo, fonte lavfi)
+CLIP_FIXTURES = [
+    ("clip_blue_noise.mp4", "color=c=0x3366aa:s=1280x720:r=30:d=8,noise=alls=40:allf=t"),
+    ("clip_testsrc.mp4", "testsrc2=s=1920x1080:r=30:d=8"),
+    ("clip_red_noise.mp4", "color=c=0xaa3333:s=720x1280:r=24:d=5,noise=alls=30:allf=t"),
+    ("clip_gradient.mp4", "gradients=s=1080x1920:r=25:d=10"),
+]
+IMAGE_FIXTURES = [
+    ("still_mandelbrot.jpg", "mandelbrot=s=1080x1920"),
+    ("still_cells.png", "cellauto=s=1280x720:rule=110"),
+]
+
+
+def get_ffmpeg():
+    """Mesmo binário que o render usa, sem importar os módulos do projeto (e seus caches)"""
+    binary = os.environ.get("FFMPEG_BINARY")
+    if binary and binary != "auto-detect":
+        return binary
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return "ffmpeg"
+
+
+def run_ffmpeg(args):
+    subprocess.run([get_ffmpeg(), "-y", "-v", "error"] + args, check=True)
+
+
+def generate_media_fixtures(fixtures_dir):
+    """Clips de cor/ruído e imagens estáticas em resoluções variadas"""
+    for filename, source in CLIP_FIXTURES:
+        path = os.path.join(fixtures_dir, filename)
+        if not os.path.exists(path):
+            run_ffmpeg(["-f", "lavfi", "-i", source, "-c:v", "libx264", "-preset", "ultrafast",
+                        "-pix_fmt", "yuv420p", path])
+    for filename, source in IMAGE_FIXTURES:
+        path = os.path.join(fixtures_dir, filename)
+        if not os.path.exists(path):
+            run_ffmpeg(["-f", "lavfi", "-i", source, "-frames:v", "1", path])
+
+
+def generate_narration(fixtures_dir, seconds):
+    """Narração sintética: tom com modulação de amplitude e ruído rosa"""
+    path = os.path.join(fixtures_dir, f"narration_{int(seconds)}s.wav")
+    if not os.path.exists(path):
+        run_ffmpeg(["-f", "lavfi", "-i", f"sine=frequency=180:sample_rate=44100:duration={seconds}",
+                    "-f", "lavfi", "-i", f"anoisesrc=d={seconds}:c=pink:r=44100:a=0.05",
+                    "-filter_complex", "[0:a]tremolo=f=4:d=0.8[v];[v][1:a]amix=inputs=2:duration=first",
+                    "-ac", "1", path])
+    return path
+
+
+def synthetic_captions(seconds):
+    """Legendas de CAPTION_SECONDS com WORDS_PER_CAPTION palavras cada"""
+    captions = []
+    t = 0.0
+    index = 0
+    while t + CAPTION_SECONDS <= seconds:
+        words = [VOCABULARY[(index + i) % len(VOCABULARY)] for i in range(WORDS_PER_CAPTION)]
+        captions.append(((round(t, 2), round(t + CAPTION_SECONDS, 2)), " ".join(words)))
+        t += CAPTION_SECONDS
+        index += WORDS_PER_CAPTION
+    return captions
+
+
+def synthetic_backgrounds(seconds, base_url):
+    """Segmentos de fundo alternando entre os clips e imagens locais"""
+    media = [name for name, _ in CLIP_FIXTURES] + [name for name, _ in IMAGE_FIXTURES]
+    backgrounds = []
+    t = 0.0
+    index = 0
+    while t < seconds:
+        end = min(seconds, t + SEGMENT_SECONDS)
+        backgrounds.append(((round(t, 2), round(end, 2)), f"{base_url}/{media[index % len(media)]}"))
+        t = end
+        index += 1
+    return backgrounds
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_media_server(fixtures_dir):
+    """Servidor HTTP local no lugar do Pexels"""
+    handler = functools.partial(QuietHandler, directory=fixtures_dir)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def peak_rss_mb(who):
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+class StageTimer:
+    """Mede o tempo acumulado de funções envolvidas durante o benchmark"""
+
+    def __init__(self):
+        self.stages = {}
+
+    def wrap(self, owner, attribute, stage):
+        original = getattr(owner, attribute)
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                entry = self.stages.setdefault(stage, {"seconds": 0.0, "calls": 0})
+                entry["seconds"] = round(entry["seconds"] + time.perf_counter() - started, 3)
+                entry["calls"] += 1
+
+        setattr(owner, attribute, timed)
+
+
+def run_case(case):
+    """Executa um caso em um processo isolado (pico de RSS por caso)"""
+    sys.path.insert(0, REPO_ROOT)
+    # Saídas vão para o diretório do caso; os assets dos templates são relativos ao cwd
+    assets_link = os.path.join(case["work_dir"], "assets")
+    if not os.path.exists(assets_link):
+        os.symlink(os.path.join(REPO_ROOT, "assets"), assets_link)
+    os.chdir(case["work_dir"])
+
+    import_started = time.perf_counter()
+    from moviepy.video.VideoClip import VideoClip
+    from utility.render import ffmpeg_render, parallel_render, render_engine
+    from utility.render.template_render_engine import TemplateRenderEngine
+    import_seconds = round(time.perf_counter() - import_started, 3)
+
+    timer = StageTimer()
+    timer.wrap(render_engine, "prepare_background_media", "prepare_media")
+    timer.wrap(render_engine, "filter_timed_captions", "filter_captions")
+    timer.wrap(render_engine, "generate_colored_text_clips", "caption_clips")
+    timer.wrap(TemplateRenderEngine, "compose_template", "compose_template")
+    timer.wrap(VideoClip, "write_videofile", "moviepy_encode")
+    timer.wrap(ffmpeg_render, "render_ffmpeg", "ffmpeg_render")
+    timer.wrap(parallel_render, "render_parallel", "parallel_render")
+
+    template_config = None
+    if case["template"]:
+        from utility.templates.template_manager import TemplateManager
+        template_config = TemplateManager(os.path.join(REPO_ROOT, "utility", "templates")).get_template(case["template"])
+
+    captions = synthetic_captions(case["seconds"])
+    backgrounds = synthetic_backgrounds(case["seconds"], case["base_url"])
+
+    started = time.perf_counter()
+    output = render_engine.get_output_media(case["audio"], captions, backgrounds, "pexel", case["template"],
+                                            template_config=template_config, render_mode=case["mode"],
+                                            render_backend=case["backend"])
+    wall_seconds = time.perf_counter() - started
+    frames = int(case["seconds"] * BENCH_FPS)
+
+    result = {
+        "duration_minutes": case["minutes"],
+        "backend": case["backend"],
+        "mode": case["mode"],
+        "caption_renderer": os.environ.get("CAPTION_RENDERER", "auto"),
+        "template": case["template"],
+        "captions": len(captions),
+        "background_segments": len(backgrounds),
+        "import_seconds": import_seconds,
+        "wall_seconds": round(wall_seconds, 3),
+        "frames": frames,
+        "encode_fps": round(frames / wall_seconds, 2) if wall_seconds else None,
+        "output_bytes": os.path.getsize(output) if output and os.path.exists(output) else None,
+        "stages": timer.stages,
+    }
+
+    if case["template"] and case["template_pass"]:
+        # Segunda passada legada: aplicar o template a um vídeo já renderizado
+        started = time.perf_counter()
+        TemplateRenderEngine().apply_template_to_video(output, template_config, case["audio"])
+        template_seconds = time.perf_counter() - started
+        result["apply_template_to_video"] = {
+            "wall_seconds": round(template_seconds, 3),
+            "encode_fps": round(frames / template_seconds, 2) if template_seconds else None,
+        }
+
+    result["peak_rss_mb"] = peak_rss_mb(resource.RUSAGE_SELF)
+    result["peak_rss_children_mb"] = peak_rss_mb(resource.RUSAGE_CHILDREN)
+    print(RESULT_MARKER + json.dumps(result))
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT).decode().strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline de get_output_media")
+    parser.add_argument("--durations", type=float, nargs="+", default=[1, 3, 10], help="Durações em minutos")
+    parser.add_argument("--backends", nargs="+", default=["moviepy"], choices=["moviepy", "ffmpeg"])
+    parser.add_argument("--modes", nargs="+", default=["single"], choices=["single", "parallel"])
+    parser.add_argument("--caption-renderers", nargs="+", default=["auto"], choices=["auto", "ass", "clips"])
+    parser.add_argument("--template", default=None, help="ID do template (ex: cinematic_religious)")
+    parser.add_argument("--template-pass", action="store_true",
+                        help="Também mede apply_template_to_video sobre o vídeo renderizado")
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="Reaproveita o cache de mídia/mezzanine entre os casos")
+    parser.add_argument("--fixtures-dir", default=None, help="Diretório das fixtures (reaproveitado entre execuções)")
+    parser.add_argument("--output", default=None, help="Arquivo JSON do relatório (padrão: stdout)")
+    parser.add_argument("--run-case", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        run_case(json.loads(args.run_case))
+        return
+
+    root = tempfile.mkdtemp(prefix="render_bench_")
+    fixtures_dir = os.path.abspath(args.fixtures_dir or os.path.join(root, "fixtures"))
+    os.makedirs(fixtures_dir, exist_ok=True)
+
+    print(f"🧪 Gerando fixtures em {fixtures_dir}", file=sys.stderr)
+    generate_media_fixtures(fixtures_dir)
+    server, base_url = start_media_server(fixtures_dir)
+
+    results = []
+    try:
+        for minutes in args.durations:
+            seconds = minutes * 60
+            audio = generate_narration(fixtures_dir, seconds)
+            for backend in args.backends:
+                for mode in args.modes:
+                    for caption_renderer in args.caption_renderers:
+                        work_dir = tempfile.mkdtemp(dir=root, prefix="case_")
+                        cache_dir = os.path.join(root, "cache") if args.warm_cache else os.path.join(work_dir, "cache")
+                        case = {
+                            "minutes": minutes, "seconds": seconds, "audio": audio, "base_url": base_url,
+                            "backend": backend, "mode": mode, "template": args.template,
+                            "template_pass": args.template_pass, "work_dir": work_dir,
+                        }
+                        env = dict(os.environ, MEDIA_CACHE_DIR=cache_dir, CAPTION_RENDERER=caption_renderer)
+                        print(f"⏱️ {minutes} min | {backend} | {mode} | legendas {caption_renderer}", file=sys.stderr)
+                        completed = subprocess.run([sys.executable, os.path.abspath(__file__),
+                                                    "--run-case", json.dumps(case)],
+                                                   env=env, capture_output=True, text=True)
+                        result = None
+                        for line in completed.stdout.splitlines():
+                            if line.startswith(RESULT_MARKER):
+                                result = json.loads(line[len(RESULT_MARKER):])
+                        if result is None:
+                            result = {"duration_minutes": minutes, "backend": backend, "mode": mode,
+                                      "caption_renderer": caption_renderer, "error": completed.stderr.strip()[-2000:]}
+                            print(f"❌ Caso falhou: {result['error'][-300:]}", file=sys.stderr)
+                        results.append(result)
+    finally:
+        server.shutdown()
+        shutil.rmtree(root, ignore_errors=True)
+
+    report = {"commit": git_commit(), "cpu_count": os.cpu_count(), "python": sys.version.split()[0],
+              "results": results}
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"✅ Relatório salvo em {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
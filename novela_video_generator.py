@@ -130,12 +130,12 @@ class NovelaVideoGenerator:
             if not voice_name:
                 voice_name = "francisco"  # Voz padrão para novelas
             
-            await generate_audio(script, audio_filename, voice_name)
+            word_timings = await generate_audio(script, audio_filename, voice_name)
             print(f"✅ Áudio gerado: {audio_filename}")
             
             # 3. Gerar legendas temporizadas
             print("📺 Gerando legendas...")
-            captions = generate_timed_captions(audio_filename)
+            captions = generate_timed_captions(audio_filename, word_timings=word_timings, script_text=script)
             print(f"✅ Legendas geradas: {len(captions)} segmentos")
             
             # 4. Gerar consultas de busca para vídeos de fundo
@@ -195,16 +195,9 @@ class NovelaVideoGenerator:
             print("🎬 Renderizando vídeo final...")
             output_filename = f"novela_resumo_{video_id}.mp4" if video_id else "novela_resumo.mp4"
             
-            # Aplicar template de novela
-            if self.novela_template:
-                # Primeiro gerar vídeo básico
-                temp_output = get_output_media(audio_filename, captions, video_urls, "temp_" + output_filename)
-                # Depois aplicar template
-                output_filename = self.template_render_engine.apply_template_to_video(
-                    temp_output, self.novela_template, audio_filename
-                )
-            else:
-                output_filename = get_output_media(audio_filename, captions, video_urls, output_filename)
+            # Template de novela aplicado na mesma passada de renderização (uma única codificação)
+            output_filename = get_output_media(audio_filename, captions, video_urls, output_filename,
+                                               template_config=self.novela_template)
             
             print(f"✅ Vídeo renderizado: {output_filename}")
             
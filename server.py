@@ -16,8 +16,11 @@ import time
 
 # Importar módulos do projeto
 from utility.script.script_generator import generate_script
-from utility.audio.audio_generator import generate_audio
+from utility.audio.audio_generator import TTS_STREAMING, generate_audio, generate_audio_stream
+from utility.audio.elevenlabs_client import close_http_client
 from utility.captions.timed_captions_generator import generate_timed_captions
+from utility.captions.transcribers import ASR_BACKEND, TRANSCRIBERS, get_transcriber
+from utility.captions.subtitle_writer import SUBTITLE_FORMATS, normalize_formats
 from utility.video.background_video_generator import generate_video_url
 from utility.render.render_engine import get_output_media
 from utility.video.video_search_query_generator import getVideoSearchQueriesTimed, merge_empty_intervals
@@ -59,6 +62,8 @@ class VideoJob:
         self.audio_path = None
         self.srt_file = None
         self.vtt_file = None
+        self.ass_file = None
+        self.json_file = None
         self.duration = None
         self.error = None
 
@@ -74,6 +79,8 @@ class VideoJob:
             'audio_path': self.audio_path,
             'srt_file': self.srt_file,
             'vtt_file': self.vtt_file,
+            'ass_file': self.ass_file,
+            'json_file': self.json_file,
             'duration': self.duration,
             'error': self.error
         }
@@ -93,7 +100,7 @@ def update_job_progress(job_id, progress, status=None):
             'status': jobs[job_id].status
         })
 
-async def generate_video_async(job_id, topic, template_id=None, voice_id=None, use_db=False, duration_minutes=1, background_music=None):
+async def generate_video_async(job_id, topic, template_id=None, voice_id=None, use_db=False, duration_minutes=1, background_music=None, asr_backend=None, subtitle_formats=None):
     """Gera vídeo de forma assíncrona com suporte a templates e duração personalizada"""
     try:
         job = jobs[job_id]
@@ -120,20 +127,31 @@ async def generate_video_async(job_id, topic, template_id=None, voice_id=None, u
         # 2. Gerar áudio
         update_job_progress(job_id, 40)
         audio_file = f"audio_tts_{job_id}.wav"
-        await generate_audio(response, audio_file, voice_id)  # Usar voz selecionada ou detectar automaticamente
+        from utility.captions.timed_captions_generator import generate_subtitle_files
+        captions_pairs = None
+        if TTS_STREAMING:
+            # Legendas de cada trecho enquanto os seguintes ainda são sintetizados
+            from utility.captions.timed_captions_generator import generate_timed_captions_streaming
+            captions_pairs, word_timings = await generate_timed_captions_streaming(
+                generate_audio_stream(response, audio_file, voice_id), asr_backend=asr_backend)
+        else:
+            # Usar voz selecionada ou detectar automaticamente; o TTS devolve o tempo de cada palavra
+            word_timings = await generate_audio(response, audio_file, voice_id)
         job.audio_path = audio_file
         print(f"Áudio gerado: {audio_file}")
         
         # 3. Gerar legendas e arquivos SRT/VTT
         update_job_progress(job_id, 60)
-        from utility.captions.timed_captions_generator import generate_subtitle_files
-        
-        subtitle_data = generate_subtitle_files(audio_file)
+        subtitle_data = generate_subtitle_files(audio_file, word_timings=word_timings, script_text=response,
+                                                asr_backend=asr_backend, formats=subtitle_formats,
+                                                captions_pairs=captions_pairs)
         timed_captions = subtitle_data['captions_pairs']
         job.srt_file = subtitle_data['srt_file']
         job.vtt_file = subtitle_data['vtt_file']
+        job.ass_file = subtitle_data['ass_file']
+        job.json_file = subtitle_data['json_file']
         print(f"Legendas geradas: {len(timed_captions)} segmentos")
-        print(f"Arquivos SRT/VTT: {job.srt_file}, {job.vtt_file}")
+        print(f"Arquivos de legenda: {', '.join(subtitle_data['files'].values())}")
         
         # 4. Gerar termos de busca
         update_job_progress(job_id, 70)
@@ -151,18 +169,15 @@ async def generate_video_async(job_id, topic, template_id=None, voice_id=None, u
         # 6. Renderizar vídeo final
         update_job_progress(job_id, 90)
         if background_video_urls:
-            # Usar renderização normal com legendas
-            output_video = get_output_media(audio_file, timed_captions, background_video_urls, "pexel", template_id)
+            # Adicionar música de fundo ao template config se especificada
+            if template_id and template_config and background_music:
+                template_config['background_music'] = background_music
+                print(f"🎵 Música de fundo adicionada ao template: {background_music}")
             
-            # 6.5. Aplicar template se especificado
+            # Renderizar legendas, fundos e template em uma única codificação
+            output_video = get_output_media(audio_file, timed_captions, background_video_urls, "pexel", template_id,
+                                            template_config=template_config if template_id else None)
             if template_id and template_config:
-                update_job_progress(job_id, 95)
-                # Adicionar música de fundo ao template config se especificada
-                if background_music:
-                    template_config['background_music'] = background_music
-                    print(f"🎵 Música de fundo adicionada ao template: {background_music}")
-                
-                output_video = template_render_engine.apply_template_to_video(output_video, template_config, audio_file)
                 print(f"Template '{template_id}' aplicado ao vídeo")
             
             job.video_path = output_video
@@ -185,13 +200,14 @@ async def generate_video_async(job_id, topic, template_id=None, voice_id=None, u
         update_job_progress(job_id, 0, "FAILED")
         socketio.emit('job_failed', {'job_id': job_id, 'error': str(e)})
 
-def run_async_generation(job_id, topic, template_id=None, voice_id=None, use_db=False, duration_minutes=1, background_music=None):
+def run_async_generation(job_id, topic, template_id=None, voice_id=None, use_db=False, duration_minutes=1, background_music=None, asr_backend=None, subtitle_formats=None):
     """Executa geração de vídeo em thread separada"""
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     try:
-        loop.run_until_complete(generate_video_async(job_id, topic, template_id, voice_id, use_db, duration_minutes, background_music))
+        loop.run_until_complete(generate_video_async(job_id, topic, template_id, voice_id, use_db, duration_minutes, background_music, asr_backend, subtitle_formats))
     finally:
+        loop.run_until_complete(close_http_client())
         loop.close()
 
 # Rotas da aplicação
@@ -264,9 +280,19 @@ def create_job():
     template_id = data.get('template_id', '').strip() or None
     voice_id = data.get('voice_id', '').strip() or None
     background_music = data.get('background_music', '').strip() or None
+    asr_backend = data.get('asr_backend', '').strip().lower() or None
     
     if not topic:
         return jsonify({'error': 'Tópico é obrigatório'}), 400
+    if asr_backend and asr_backend not in TRANSCRIBERS:
+        return jsonify({'error': f"Backend de transcrição inválido. Opções: {', '.join(TRANSCRIBERS)}"}), 400
+    
+    # Formatos de legenda do job (lista ou "srt,vtt,..."); só os pedidos são gerados
+    subtitle_formats = data.get('subtitle_formats')
+    if subtitle_formats is not None:
+        subtitle_formats = normalize_formats(subtitle_formats)
+        if not subtitle_formats:
+            return jsonify({'error': f"Formatos de legenda inválidos. Opções: {', '.join(SUBTITLE_FORMATS)}"}), 400
     
     # Criar novo job
     job = VideoJob(topic)
@@ -280,7 +306,7 @@ def create_job():
     # Iniciar geração em thread separada
     thread = threading.Thread(
         target=run_async_generation,
-        args=(job.id, topic, template_id, voice_id, DB_AVAILABLE, duration_minutes, background_music)
+        args=(job.id, topic, template_id, voice_id, DB_AVAILABLE, duration_minutes, background_music, asr_backend, subtitle_formats)
     )
     thread.daemon = True
     thread.start()
@@ -346,6 +372,34 @@ def download_vtt(job_id):
     
     return send_file(vtt_path, as_attachment=True, download_name=f"legendas_{job_id}.vtt")
 
+@app.route('/api/videos/<job_id>/ass', methods=['GET'])
+def download_ass(job_id):
+    """Download do arquivo ASS"""
+    if job_id not in completed_videos:
+        return jsonify({'error': 'Vídeo não encontrado'}), 404
+    
+    video_data = completed_videos[job_id]
+    ass_path = video_data.get('ass_file')
+    
+    if not ass_path or not os.path.exists(ass_path):
+        return jsonify({'error': 'Arquivo ASS não encontrado'}), 404
+    
+    return send_file(ass_path, as_attachment=True, download_name=f"legendas_{job_id}.ass")
+
+@app.route('/api/videos/<job_id>/words', methods=['GET'])
+def download_word_timings(job_id):
+    """Tempo de cada palavra em JSON (player web e ferramentas)"""
+    if job_id not in completed_videos:
+        return jsonify({'error': 'Vídeo não encontrado'}), 404
+    
+    video_data = completed_videos[job_id]
+    json_path = video_data.get('json_file')
+    
+    if not json_path or not os.path.exists(json_path):
+        return jsonify({'error': 'Arquivo de palavras não encontrado'}), 404
+    
+    return send_file(json_path, mimetype='application/json', download_name=f"palavras_{job_id}.json")
+
 @app.route('/gallery')
 def gallery():
     """Página da galeria de vídeos"""
@@ -384,6 +438,12 @@ def list_voices():
         print(f"Erro ao listar vozes: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/metrics/tts', methods=['GET'])
+def tts_metrics():
+    """Taxa de hedge, vitórias por provedor e latência do primeiro byte do TTS"""
+    from utility.audio.tts_hedging import tts_hedge_metrics
+    return jsonify(tts_hedge_metrics.snapshot())
+
 @app.route('/api/chat', methods=['POST'])
 def chat_with_ai():
     """Chat com IA para sugestões de tópicos"""
@@ -467,5 +527,20 @@ if __name__ == '__main__':
     print("📱 Interface web disponível em: http://localhost:5000")
     print("🎬 API disponível em: http://localhost:5000/api")
     
+    # Pré-carregar modelos do backend de transcrição configurado para o primeiro job não pagar a carga
+    warmup_models = [m.strip() for m in os.environ.get("WHISPER_WARMUP_MODELS", "base").split(",") if m.strip()]
+    if warmup_models:
+        def warmup_transcriber():
+            transcriber = get_transcriber(ASR_BACKEND)
+            for model_size in warmup_models:
+                try:
+                    transcriber.warmup(model_size)
+                except Exception as e:
+                    print(f"⚠️ Erro ao aquecer backend '{transcriber.name}' ({model_size}): {e}")
+        
+        warmup_thread = threading.Thread(target=warmup_transcriber)
+        warmup_thread.daemon = True
+        warmup_thread.start()
+    
     # Configuração para produção - desabilitar debug e usar configurações mais seguras
     socketio.run(app, host='0.0.0.0', port=5000, debug=False, allow_unsafe_werkzeug=True) 
\ No newline at end of file
@@ -1,8 +1,47 @@
 import edge_tts
+import asyncio
+import functools
 import os
-import requests
-import json
-from typing import Optional, Dict, Any
+import shutil
+import tempfile
+import time
+import weakref
+from typing import Optional, Dict, Any, List, Callable, Awaitable, AsyncIterator
+
+from utility.audio.elevenlabs_client import stream_speech
+from utility.audio.pcm_buffer import audio_buffers
+from utility.audio.tts_hedging import TTS_HEDGING, tts_hedge_metrics
+from utility.audio.tts_cache import TTS_SENTENCE_REUSE, split_chunks, split_sentences, splice_audio, tts_cache
+
+# Edge TTS informa offset/duração das palavras em unidades de 100 ns
+EDGE_TICKS_PER_SECOND = 10_000_000
+
+# Roteiros maiores que TTS_CHUNK_CHARS são sintetizados em trechos de frases inteiras, em paralelo
+TTS_CHUNK_CHARS = int(os.environ.get("TTS_CHUNK_CHARS", "800"))
+TTS_CHUNK_RETRIES = int(os.environ.get("TTS_CHUNK_RETRIES", "2"))
+TTS_CROSSFADE_SECONDS = float(os.environ.get("TTS_CROSSFADE_SECONDS", "0.03"))
+# Modo streaming: o áudio é entregue por trechos (de até TTS_STREAM_CHUNK_CHARS) à medida que fica pronto
+TTS_STREAMING = os.environ.get("TTS_STREAMING", "0") == "1"
+TTS_STREAM_CHUNK_CHARS = int(os.environ.get("TTS_STREAM_CHUNK_CHARS", "300"))
+# Requisições simultâneas por provedor
+TTS_CONCURRENCY = {
+    "elevenlabs": int(os.environ.get("ELEVENLABS_CONCURRENCY", "3")),
+    "edge": int(os.environ.get("EDGE_TTS_CONCURRENCY", "4"))
+}
+
+# Semáforos por event loop (cada job roda no seu próprio loop)
+_provider_semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+# Modelo multilíngue do ElevenLabs (português)
+ELEVENLABS_MODEL_ID = "eleven_multilingual_v2"
+
+# Voz do Edge TTS usada como fallback
+EDGE_VOICE = {
+    "provider": "edge",
+    "voice_id": "pt-BR-AntonioNeural",
+    "settings": {},
+    "rate": "-20%"
+}
 
 # Configuração das vozes ElevenLabs recomendadas
 ELEVENLABS_VOICES = {
@@ -77,6 +116,46 @@ def detect_content_category(text: str) -> str:
     # Padrão: fatos curiosos/documentários
     return "curiosities"
 
+def word_timing_from_boundary(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converte um evento WordBoundary do Edge TTS em {"word", "start", "end"} (segundos)
+    """
+    start = chunk["offset"] / EDGE_TICKS_PER_SECOND
+    return {
+        "word": chunk["text"],
+        "start": start,
+        "end": start + chunk["duration"] / EDGE_TICKS_PER_SECOND
+    }
+
+def word_timings_from_alignment(alignment: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Agrupa o alinhamento por caractere do ElevenLabs em palavras {"word", "start", "end"}
+    """
+    if not alignment:
+        return []
+    
+    characters = alignment.get("characters", [])
+    starts = alignment.get("character_start_times_seconds", [])
+    ends = alignment.get("character_end_times_seconds", [])
+    
+    word_timings = []
+    current = None
+    for char, start, end in zip(characters, starts, ends):
+        if char.isspace():
+            if current:
+                word_timings.append(current)
+                current = None
+            continue
+        if current is None:
+            current = {"word": char, "start": start, "end": end}
+        else:
+            current["word"] += char
+            current["end"] = end
+    if current:
+        word_timings.append(current)
+    
+    return word_timings
+
 def get_recommended_voice(content_category: str) -> str:
     """
     Retorna a voz recomendada baseada na categoria do conteúdo
@@ -88,14 +167,46 @@ def get_recommended_voice(content_category: str) -> str:
     else:
         return "james"    # James para fatos curiosos/documentários
 
-async def generate_audio_elevenlabs(text: str, output_filename: str, voice_name: Optional[str] = None) -> bool:
+def elevenlabs_voice_settings(category: str) -> Dict[str, Any]:
+    """
+    Configurações de voz do ElevenLabs baseadas na categoria
+    """
+    voice_settings = {
+        "stability": 0.5,
+        "similarity_boost": 0.75,
+        "style": 0.0,
+        "use_speaker_boost": True
+    }
+    
+    # Ajustes específicos por categoria
+    if category == "spiritual":
+        voice_settings.update({
+            "stability": 0.8,  # Mais estável para conteúdo solene
+            "similarity_boost": 0.85,
+            "style": 0.4  # Mais expressivo
+        })
+    elif category == "narrative":
+        voice_settings.update({
+            "stability": 0.9,  # Muito estável para narrativas
+            "similarity_boost": 0.9,
+            "style": 0.5  # Muito expressivo
+        })
+    elif category == "reflection":
+        voice_settings.update({
+            "stability": 0.6,
+            "similarity_boost": 0.7,
+            "style": 0.2  # Moderadamente expressivo
+        })
+    return voice_settings
+
+def resolve_elevenlabs_voice(text: str, voice_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
     """
-    Gera áudio usando ElevenLabs
+    Voz do ElevenLabs que será usada para o texto ({"provider", "voice_id", "settings", ...}),
+    ou None quando o ElevenLabs não está disponível
     """
-    api_key = os.environ.get("ELEVENLABS_API_KEY")
-    if not api_key:
+    if not os.environ.get("ELEVENLABS_API_KEY"):
         print("⚠️ ELEVENLABS_API_KEY não configurada. Usando Edge TTS...")
-        return False
+        return None
     
     # Detectar categoria do conteúdo se voz não especificada
     if not voice_name:
@@ -105,95 +216,79 @@ async def generate_audio_elevenlabs(text: str, output_filename: str, voice_name:
     
     if voice_name not in ELEVENLABS_VOICES:
         print(f"⚠️ Voz '{voice_name}' não encontrada. Usando Edge TTS...")
-        return False
+        return None
     
     voice_config = ELEVENLABS_VOICES[voice_name]
-    voice_id = voice_config["voice_id"]
+    return {
+        "provider": "elevenlabs",
+        "name": voice_name,
+        "voice_id": voice_config["voice_id"],
+        "model_id": ELEVENLABS_MODEL_ID,
+        "settings": elevenlabs_voice_settings(voice_config["category"]),
+        "rate": None,
+        "description": voice_config["description"]
+    }
+
+async def synthesize_elevenlabs(text: str, output_filename: str, voice: Dict[str, Any],
+                                first_byte: Optional[asyncio.Event] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Sintetiza o texto com ElevenLabs (modo with-timestamps, gravando o áudio à medida que chega)
+    A latência até o primeiro byte vai para as métricas de hedging e sinaliza first_byte
+    Retorna o tempo de cada palavra ou None se não foi possível gerar o áudio
+    """
+    started = time.monotonic()
+    
+    def on_first_byte():
+        if first_byte is None or not first_byte.is_set():
+            tts_hedge_metrics.record_first_byte(time.monotonic() - started)
+        if first_byte is not None:
+            first_byte.set()
+
+    data = {
+        "text": text,
+        "model_id": voice["model_id"],  # Modelo multilíngue para português
+        "voice_settings": voice["settings"]
+    }
+    
+    print(f"🎤 Gerando áudio com ElevenLabs - Voz: {voice['name']}")
+    print(f"📝 Configuração: {voice['description']}")
     
     try:
-        # Configuração da API ElevenLabs
-        url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
-        
-        headers = {
-            "Accept": "audio/mpeg",
-            "Content-Type": "application/json",
-            "xi-api-key": api_key
-        }
-        
-        # Configurações de voz baseadas na categoria
-        voice_settings = {
-            "stability": 0.5,
-            "similarity_boost": 0.75,
-            "style": 0.0,
-            "use_speaker_boost": True
-        }
-        
-        # Ajustes específicos por categoria
-        if voice_config["category"] == "spiritual":
-            voice_settings.update({
-                "stability": 0.8,  # Mais estável para conteúdo solene
-                "similarity_boost": 0.85,
-                "style": 0.4  # Mais expressivo
-            })
-        elif voice_config["category"] == "narrative":
-            voice_settings.update({
-                "stability": 0.9,  # Muito estável para narrativas
-                "similarity_boost": 0.9,
-                "style": 0.5  # Muito expressivo
-            })
-        elif voice_config["category"] == "reflection":
-            voice_settings.update({
-                "stability": 0.6,
-                "similarity_boost": 0.7,
-                "style": 0.2  # Moderadamente expressivo
-            })
-        
-        data = {
-            "text": text,
-            "model_id": "eleven_multilingual_v2",  # Modelo multilíngue para português
-            "voice_settings": voice_settings
-        }
-        
-        print(f"🎤 Gerando áudio com ElevenLabs - Voz: {voice_name}")
-        print(f"📝 Configuração: {voice_config['description']}")
-        
-        response = requests.post(url, json=data, headers=headers)
-        
-        if response.status_code == 200:
-            with open(output_filename, "wb") as f:
-                f.write(response.content)
-            print(f"✅ Áudio gerado com ElevenLabs: {output_filename}")
-            return True
-        else:
-            print(f"❌ Erro na API ElevenLabs: {response.status_code} - {response.text}")
-            return False
-            
+        alignment = await stream_speech(voice["voice_id"], data, output_filename,
+                                        os.environ.get("ELEVENLABS_API_KEY", ""), on_first_byte)
     except Exception as e:
         print(f"❌ Erro ao gerar áudio com ElevenLabs: {e}")
-        return False
+        return None
+    
+    word_timings = word_timings_from_alignment(alignment)
+    print(f"✅ Áudio gerado com ElevenLabs: {output_filename} ({len(word_timings)} palavras alinhadas)")
+    return word_timings
 
-async def generate_audio(text: str, output_filename: str, voice_name: Optional[str] = None) -> None:
+async def synthesize_edge(text: str, output_filename: str,
+                          voice: Dict[str, Any] = EDGE_VOICE) -> Optional[List[Dict[str, Any]]]:
     """
-    Gera áudio usando ElevenLabs (se disponível) ou Edge TTS como fallback
+    Sintetiza o texto com Edge TTS, com retry automático
+    Retorna o tempo de cada palavra (eventos WordBoundary)
     """
-    # Tentar ElevenLabs primeiro
-    if await generate_audio_elevenlabs(text, output_filename, voice_name):
-        return
-    
-    # Fallback para Edge TTS com retry automático
-    print("🔄 Usando Edge TTS como fallback...")
-    
     max_retries = 3
     for attempt in range(max_retries):
         try:
             print(f"🎤 Tentativa {attempt + 1}/{max_retries} - Gerando áudio com Edge TTS...")
             
             # Criar nova instância do Communicate para gerar novo token
-            communicate = edge_tts.Communicate(text, "pt-BR-AntonioNeural", rate="-20%")
-            await communicate.save(output_filename)
+            communicate = edge_tts.Communicate(text, voice["voice_id"], rate=voice["rate"])
             
-            print(f"✅ Áudio gerado com Edge TTS: {output_filename}")
-            return
+            # Salvar o áudio e guardar os eventos WordBoundary (tempo de cada palavra)
+            word_timings = []
+            with open(output_filename, "wb") as f:
+                async for chunk in communicate.stream():
+                    if chunk["type"] == "audio":
+                        f.write(chunk["data"])
+                    elif chunk["type"] == "WordBoundary":
+                        word_timings.append(word_timing_from_boundary(chunk))
+            
+            print(f"✅ Áudio gerado com Edge TTS: {output_filename} ({len(word_timings)} palavras alinhadas)")
+            return word_timings
             
         except Exception as e:
             error_msg = str(e)
@@ -202,7 +297,6 @@ async def generate_audio(text: str, output_filename: str, voice_name: Optional[s
             if "403" in error_msg or "Invalid response status" in error_msg:
                 print("🔄 Token expirado, tentando novamente...")
                 # Aguardar um pouco antes da próxima tentativa
-                import asyncio
                 await asyncio.sleep(2)
                 continue
             elif attempt == max_retries - 1:
@@ -210,10 +304,329 @@ async def generate_audio(text: str, output_filename: str, voice_name: Optional[s
                 raise e
             else:
                 print(f"🔄 Tentando novamente em 1 segundo...")
-                import asyncio
                 await asyncio.sleep(1)
     
     print(f"❌ Falha ao gerar áudio após {max_retries} tentativas")
+    return None
+
+async def synthesize_cached(text: str, output_filename: str, voice: Dict[str, Any],
+                            synthesize: Callable[..., Awaitable[Optional[List[Dict[str, Any]]]]]
+                            ) -> Optional[List[Dict[str, Any]]]:
+    """
+    Sintetiza o texto passando pelo cache de áudio do TTS
+    Texto inteiro em cache é copiado; textos longos são divididos em trechos
+    sintetizados em paralelo; com TTS_SENTENCE_REUSE, frases já sintetizadas
+    são emendadas e só os trechos novos vão para a API
+    """
+    key = tts_cache.key_for(voice, text)
+    # Cópias, decodificação e hashing do cache rodam fora do event loop
+    word_timings = await asyncio.to_thread(tts_cache.restore, key, output_filename)
+    if word_timings is not None:
+        print(f"💾 Áudio do TTS reaproveitado do cache: {output_filename}")
+        return word_timings
+    
+    chunks = split_chunks(text, TTS_CHUNK_CHARS) if len(text) > TTS_CHUNK_CHARS else []
+    if len(chunks) > 1:
+        word_timings = await synthesize_chunked(chunks, output_filename, voice, synthesize)
+        if word_timings is not None:
+            await asyncio.to_thread(tts_cache.put, key, output_filename, word_timings)
+        return word_timings
+    
+    sentences = split_sentences(text) if TTS_SENTENCE_REUSE else []
+    if len(sentences) > 1:
+        cached = await asyncio.to_thread(
+            lambda: [tts_cache.get(tts_cache.key_for(voice, sentence)) for sentence in sentences]
+        )
+        if any(cached):
+            word_timings = await splice_sentences(sentences, cached, output_filename, voice, synthesize)
+            if word_timings is not None:
+                await asyncio.to_thread(tts_cache.put, key, output_filename, word_timings)
+            return word_timings
+    
+    async with provider_semaphore(voice["provider"]):
+        word_timings = await synthesize(text, output_filename, voice)
+    if word_timings is not None:
+        try:
+            await asyncio.to_thread(tts_cache.put, key, output_filename, word_timings)
+            if TTS_SENTENCE_REUSE:
+                await asyncio.to_thread(tts_cache.store_sentences, voice, text, output_filename, word_timings)
+        except Exception as e:
+            print(f"⚠️ Não foi possível salvar o áudio no cache do TTS: {e}")
+    return word_timings
+
+def provider_semaphore(provider: str) -> asyncio.Semaphore:
+    """Semáforo que limita as requisições simultâneas ao provedor no loop atual"""
+    semaphores = _provider_semaphores.setdefault(asyncio.get_running_loop(), {})
+    if provider not in semaphores:
+        semaphores[provider] = asyncio.Semaphore(max(1, TTS_CONCURRENCY.get(provider, 1)))
+    return semaphores[provider]
+
+async def synthesize_chunked(chunks: List[str], output_filename: str, voice: Dict[str, Any],
+                             synthesize: Callable[..., Awaitable[Optional[List[Dict[str, Any]]]]]
+                             ) -> Optional[List[Dict[str, Any]]]:
+    """
+    Sintetiza os trechos em paralelo (limitado por provider_semaphore), repete só
+    os que falharam e emenda o resultado com crossfade curto
+    """
+    print(f"🧩 Roteiro dividido em {len(chunks)} trechos para síntese paralela")
+    work_dir = tempfile.mkdtemp(prefix="tts_chunks_")
+    extension = os.path.splitext(output_filename)[1]
+    try:
+        paths = [os.path.join(work_dir, f"chunk_{i}{extension}") for i in range(len(chunks))]
+        results: List[Any] = [None] * len(chunks)
+        pending = list(range(len(chunks)))
+        for attempt in range(TTS_CHUNK_RETRIES + 1):
+            if attempt:
+                print(f"🔄 Repetindo {len(pending)} trecho(s) que falharam (tentativa {attempt + 1})...")
+            outcomes = await asyncio.gather(
+                *(synthesize_cached(chunks[i], paths[i], voice, synthesize) for i in pending),
+                return_exceptions=True
+            )
+            for i, outcome in zip(pending, outcomes):
+                results[i] = outcome
+            pending = [i for i in pending if results[i] is None or isinstance(results[i], Exception)]
+            if not pending:
+                break
+        
+        if pending:
+            failure = next((results[i] for i in pending if isinstance(results[i], Exception)), None)
+            print(f"❌ {len(pending)} trecho(s) falharam após {TTS_CHUNK_RETRIES + 1} tentativas")
+            if failure is not None:
+                raise failure
+            return None
+        
+        return await asyncio.to_thread(splice_audio, list(zip(paths, results)), output_filename,
+                                       TTS_CROSSFADE_SECONDS)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+async def splice_sentences(sentences: List[str], cached: List, output_filename: str, voice: Dict[str, Any],
+                           synthesize: Callable[..., Awaitable[Optional[List[Dict[str, Any]]]]]
+                           ) -> Optional[List[Dict[str, Any]]]:
+    """
+    Emenda as frases em cache com os trechos que faltam, sintetizando cada
+    sequência contínua de frases novas em uma única chamada
+    """
+    hits = sum(1 for entry in cached if entry)
+    print(f"💾 {hits}/{len(sentences)} frases reaproveitadas do cache do TTS")
+    
+    work_dir = tempfile.mkdtemp(prefix="tts_splice_")
+    try:
+        parts = []
+        pending: List[str] = []
+        for sentence, entry in list(zip(sentences, cached)) + [(None, True)]:
+            if not entry:
+                pending.append(sentence)
+                continue
+            if pending:
+                run_path = os.path.join(work_dir, f"run_{len(parts)}{os.path.splitext(output_filename)[1]}")
+                run_timings = await synthesize_cached(" ".join(pending), run_path, voice, synthesize)
+                if run_timings is None:
+                    return None
+                parts.append((run_path, run_timings))
+                pending = []
+            if sentence is not None:
+                parts.append(entry)
+        return await asyncio.to_thread(splice_audio, parts, output_filename)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+async def generate_audio_elevenlabs(text: str, output_filename: str,
+                                    voice_name: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Gera áudio usando ElevenLabs (modo with-timestamps)
+    Retorna o tempo de cada palavra ou None se não foi possível gerar o áudio
+    """
+    voice = resolve_elevenlabs_voice(text, voice_name)
+    if voice is None:
+        return None
+    return await synthesize_cached(text, output_filename, voice, synthesize_elevenlabs)
+
+async def first_successful(tasks: Dict[str, "asyncio.Future"]):
+    """
+    Nome e resultado da primeira tarefa que terminar com áudio (resultado não None)
+    Retorna (None, [exceções]) se todas falharem
+    """
+    names = {task: name for name, task in tasks.items()}
+    pending = set(tasks.values())
+    errors = []
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is not None:
+                errors.append(task.exception())
+            elif task.result() is not None:
+                return names[task], task.result()
+    return None, errors
+
+async def synthesize_hedged(text: str, output_filename: str,
+                            voice: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """
+    ElevenLabs com hedge no Edge TTS: se o primeiro byte não chegar dentro do
+    percentil TTS_HEDGE_PERCENTILE da latência recente, o Edge TTS também é
+    chamado e o primeiro áudio completo vence (o outro é cancelado)
+    """
+    base, extension = os.path.splitext(output_filename)
+    paths = {"primary": f"{base}.primary{extension}", "secondary": f"{base}.secondary{extension}"}
+    first_byte = asyncio.Event()
+    primary = functools.partial(synthesize_elevenlabs, first_byte=first_byte)
+    tasks = {"primary": asyncio.ensure_future(synthesize_cached(text, paths["primary"], voice, primary))}
+    first_byte_wait = asyncio.ensure_future(first_byte.wait())
+    delay = tts_hedge_metrics.hedge_delay()
+    hedged = False
+    try:
+        await asyncio.wait({tasks["primary"], first_byte_wait}, timeout=delay,
+                           return_when=asyncio.FIRST_COMPLETED)
+        if not first_byte.is_set() and not tasks["primary"].done():
+            print(f"⏱️ ElevenLabs sem resposta em {delay:.1f}s - disparando Edge TTS em paralelo (hedge)")
+            tasks["secondary"] = asyncio.ensure_future(
+                synthesize_cached(text, paths["secondary"], EDGE_VOICE, synthesize_edge))
+            hedged = True
+        
+        winner, result = await first_successful(tasks)
+        if winner is None and not hedged:
+            # ElevenLabs falhou antes do hedge: fallback normal
+            print("🔄 Usando Edge TTS como fallback...")
+            tasks["secondary"] = asyncio.ensure_future(
+                synthesize_cached(text, paths["secondary"], EDGE_VOICE, synthesize_edge))
+            winner, result = await first_successful({"secondary": tasks["secondary"]})
+        if winner is None:
+            tts_hedge_metrics.record_request(hedged, "none")
+            if result:
+                raise result[-1]
+            print("❌ Nenhum provedor de TTS gerou o áudio")
+            return None
+        
+        tts_hedge_metrics.record_request(hedged, winner)
+        if hedged:
+            print(f"🏁 Hedge vencido pelo {'ElevenLabs' if winner == 'primary' else 'Edge TTS'}")
+        os.replace(paths[winner], output_filename)
+        return result
+    finally:
+        first_byte_wait.cancel()
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(first_byte_wait, *tasks.values(), return_exceptions=True)
+        for path in paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+
+async def generate_audio(text: str, output_filename: str,
+                         voice_name: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Gera áudio usando ElevenLabs (se disponível) ou Edge TTS como fallback
+    Com TTS_HEDGING, um ElevenLabs lento dispara o Edge TTS em paralelo
+    Retorna o tempo de cada palavra falada ({"word", "start", "end"}) informado pelo
+    TTS, ou None quando o motor não forneceu alinhamento
+    """
+    # Tentar ElevenLabs primeiro
+    voice = resolve_elevenlabs_voice(text, voice_name)
+    if voice is not None:
+        if TTS_HEDGING:
+            word_timings = await synthesize_hedged(text, output_filename, voice)
+            return word_timings or None
+        word_timings = await synthesize_cached(text, output_filename, voice, synthesize_elevenlabs)
+        if word_timings is not None:
+            return word_timings or None
+    
+    # Fallback para Edge TTS com retry automático
+    print("🔄 Usando Edge TTS como fallback...")
+    word_timings = await synthesize_cached(text, output_filename, EDGE_VOICE, synthesize_edge)
+    return word_timings or None
+
+async def synthesize_chunk(text: str, output_filename: str, voice: Dict[str, Any],
+                           synthesize: Callable[..., Awaitable[Optional[List[Dict[str, Any]]]]]
+                           ) -> List[Dict[str, Any]]:
+    """
+    Sintetiza um trecho com a voz do stream, repetindo até TTS_CHUNK_RETRIES vezes
+    Levanta RuntimeError se o provedor não gerou o áudio
+    """
+    for attempt in range(TTS_CHUNK_RETRIES + 1):
+        if attempt:
+            print(f"🔄 Repetindo trecho (tentativa {attempt + 1}): {text[:50]}...")
+        word_timings = await synthesize_cached(text, output_filename, voice, synthesize)
+        if word_timings is not None:
+            return word_timings
+    raise RuntimeError(f"Falha ao gerar áudio do trecho: {text[:50]}...")
+
+async def stream_chunks(chunks: List[str], paths: List[str], voice: Dict[str, Any],
+                        synthesize: Callable[..., Awaitable[Optional[List[Dict[str, Any]]]]]
+                        ) -> AsyncIterator[Dict[str, Any]]:
+    """Trechos sintetizados em paralelo com uma única voz, entregues em ordem"""
+    tasks = [asyncio.ensure_future(synthesize_chunk(chunk, path, voice, synthesize))
+             for chunk, path in zip(chunks, paths)]
+    try:
+        offset = 0.0
+        previous_frames = 0
+        for index, (chunk, path, task) in enumerate(zip(chunks, paths, tasks)):
+            word_timings = await task
+            # Decodificação do trecho fora do event loop
+            buffer = await asyncio.to_thread(audio_buffers.get, path)
+            # Mesma sobreposição que splice_audio aplica entre os trechos
+            overlap = min(int(round(TTS_CROSSFADE_SECONDS * buffer.sample_rate)), buffer.frames, previous_frames)
+            start = offset - overlap / buffer.sample_rate
+            yield {
+                "index": index,
+                "text": chunk,
+                "path": path,
+                "word_timings": word_timings,
+                "offset": start,
+                "duration": buffer.duration
+            }
+            offset = start + buffer.duration
+            previous_frames = buffer.frames
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def generate_audio_stream(text: str, output_filename: str,
+                                voice_name: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Gera o áudio por trechos de frases, sintetizados em paralelo e entregues em ordem
+    assim que cada um fica pronto, para as legendas começarem antes do fim do TTS
+    Cada trecho: {"index", "text", "path", "word_timings", "offset", "duration"}
+    (word_timings relativo ao trecho, offset no áudio final)
+    O provedor é escolhido uma vez para o stream inteiro; se o ElevenLabs falhar,
+    o stream recomeça do início com Edge TTS, precedido de {"restart": True} quando
+    algum trecho já tinha sido entregue (o consumidor descarta o que recebeu), para
+    a narração nunca misturar vozes
+    Ao fim da iteração output_filename contém o áudio completo
+    """
+    voice = resolve_elevenlabs_voice(text, voice_name)
+    chunks = split_chunks(text, TTS_STREAM_CHUNK_CHARS)
+    print(f"📡 TTS em streaming: {len(chunks)} trechos")
+    
+    providers = [(EDGE_VOICE, synthesize_edge)]
+    if voice is not None:
+        providers.insert(0, (voice, synthesize_elevenlabs))
+    
+    work_dir = tempfile.mkdtemp(prefix="tts_stream_")
+    extension = os.path.splitext(output_filename)[1]
+    try:
+        for attempt, (stream_voice, synthesize) in enumerate(providers):
+            paths = [os.path.join(work_dir, f"{stream_voice['provider']}_{i}{extension}") for i in range(len(chunks))]
+            parts = []
+            failed = False
+            try:
+                async for chunk in stream_chunks(chunks, paths, stream_voice, synthesize):
+                    parts.append((chunk["path"], chunk["word_timings"]))
+                    yield chunk
+            except Exception as e:
+                if attempt == len(providers) - 1:
+                    raise
+                print(f"❌ Stream com {stream_voice['provider']} falhou ({e}) - recomeçando com Edge TTS...")
+                failed = True
+            if failed:
+                if parts:
+                    yield {"restart": True, "provider": providers[attempt + 1][0]["provider"]}
+                continue
+            
+            await asyncio.to_thread(splice_audio, parts, output_filename, TTS_CROSSFADE_SECONDS)
+            print(f"✅ Áudio completo gerado por streaming: {output_filename}")
+            return
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
 
 def list_available_voices() -> Dict[str, Any]:
     """
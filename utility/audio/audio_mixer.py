@@ -0,0 +1,176 @@
+"""
+Mixagem de áudio em buffers PCM com numpy
+Repete a música até o fim da narração, abaixa a música enquanto há voz
+(ducking por sidechain), posiciona os efeitos nos tempos de cue e normaliza
+a mixagem para uma loudness integrada alvo (ITU-R BS.1770) em uma passada,
+gravando o resultado uma única vez para o mux final
+"""
+
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Loudness integrada alvo da mixagem final (LUFS) e pico máximo das amostras
+MIX_TARGET_LUFS = float(os.environ.get("MIX_TARGET_LUFS", "-16"))
+MIX_PEAK_LIMIT = float(os.environ.get("MIX_PEAK_LIMIT", "0.98"))
+# Atenuação extra da música sob a narração (dB) e tempos de ataque/liberação (s)
+DUCKING_DB = float(os.environ.get("MIX_DUCKING_DB", "-9"))
+DUCKING_ATTACK_SECONDS = 0.08
+DUCKING_RELEASE_SECONDS = 0.4
+# Narração acima deste nível (dBFS) conta como voz ativa
+DUCKING_THRESHOLD_DB = -45.0
+ENVELOPE_FRAME_SECONDS = 0.01
+
+# Filtro K da BS.1770 (shelf de alta + passa-altas), parametrizado pela taxa de amostragem
+K_SHELF_GAIN_DB = 3.99984385397
+K_SHELF_Q = 0.7071752369554193
+K_SHELF_FREQUENCY = 1681.9744509555319
+K_HIGHPASS_Q = 0.5003270373253953
+K_HIGHPASS_FREQUENCY = 38.13547087613982
+LOUDNESS_BLOCK_SECONDS = 0.4
+LOUDNESS_STEP_SECONDS = 0.1
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+
+
+def db_to_gain(db: float) -> float:
+    return 10.0 ** (db / 20.0)
+
+
+def loop_to_length(samples: np.ndarray, frames: int) -> np.ndarray:
+    """Repete as amostras até completar frames quadros"""
+    if len(samples) == 0 or frames <= 0:
+        return np.zeros((max(0, frames), samples.shape[1] if samples.ndim > 1 else 1), dtype=np.float32)
+    repeats = -(-frames // len(samples))
+    return np.tile(np.asarray(samples, dtype=np.float32), (repeats, 1))[:frames]
+
+
+def frame_rms(samples: np.ndarray, frame_size: int) -> np.ndarray:
+    """RMS de cada quadro de frame_size amostras (média dos canais)"""
+    mono = samples.mean(axis=1) if samples.ndim > 1 else samples
+    frames = len(mono) // frame_size
+    if frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    trimmed = np.asarray(mono[:frames * frame_size], dtype=np.float32).reshape(frames, frame_size)
+    return np.sqrt(np.mean(trimmed ** 2, axis=1))
+
+
+def ducking_gain(narration: np.ndarray, sample_rate: int, depth_db: float = DUCKING_DB) -> np.ndarray:
+    """
+    Ganho por amostra para a música: depth_db enquanto a narração está ativa,
+    mantido por DUCKING_RELEASE_SECONDS e suavizado em DUCKING_ATTACK_SECONDS
+    """
+    frame_size = max(1, int(sample_rate * ENVELOPE_FRAME_SECONDS))
+    rms = frame_rms(narration, frame_size)
+    if len(rms) == 0:
+        return np.ones(len(narration), dtype=np.float32)
+
+    active = rms > db_to_gain(DUCKING_THRESHOLD_DB)
+    # Manter a atenuação por release quadros depois da voz (janela deslizante via soma acumulada)
+    release = max(1, int(DUCKING_RELEASE_SECONDS / ENVELOPE_FRAME_SECONDS))
+    counts = np.concatenate([[0], np.cumsum(active)])
+    starts = np.maximum(0, np.arange(1, len(active) + 1) - release)
+    held = counts[1:] - counts[starts] > 0
+
+    gain_db = np.where(held, depth_db, 0.0)
+    attack = max(1, int(DUCKING_ATTACK_SECONDS / ENVELOPE_FRAME_SECONDS))
+    gain_db = np.convolve(np.pad(gain_db, (attack // 2, attack - 1 - attack // 2), mode="edge"),
+                          np.ones(attack) / attack, mode="valid")
+
+    frame_times = (np.arange(len(gain_db)) + 0.5) * frame_size
+    gain = np.interp(np.arange(len(narration)), frame_times, 10.0 ** (gain_db / 20.0))
+    return gain.astype(np.float32)
+
+
+def biquad_shelf(sample_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Primeiro estágio do filtro K (coeficientes da norma em 48 kHz, recalculados para a taxa)"""
+    k = np.tan(np.pi * K_SHELF_FREQUENCY / sample_rate)
+    vh = 10.0 ** (K_SHELF_GAIN_DB / 20.0)
+    vb = vh ** 0.4996667741545416
+    a0 = 1.0 + k / K_SHELF_Q + k * k
+    b = np.array([(vh + vb * k / K_SHELF_Q + k * k) / a0, 2.0 * (k * k - vh) / a0,
+                  (vh - vb * k / K_SHELF_Q + k * k) / a0])
+    a = np.array([1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / K_SHELF_Q + k * k) / a0])
+    return b, a
+
+
+def biquad_highpass(sample_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Segundo estágio do filtro K (passa-altas RLB)"""
+    k = np.tan(np.pi * K_HIGHPASS_FREQUENCY / sample_rate)
+    a0 = 1.0 + k / K_HIGHPASS_Q + k * k
+    b = np.array([1.0, -2.0, 1.0])
+    a = np.array([1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / K_HIGHPASS_Q + k * k) / a0])
+    return b, a
+
+
+def integrated_loudness(samples: np.ndarray, sample_rate: int) -> float:
+    """Loudness integrada (LUFS) com filtro K e portas absoluta e relativa da BS.1770"""
+    from scipy.signal import lfilter
+
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    weighted = np.asarray(samples, dtype=np.float64)
+    for b, a in (biquad_shelf(sample_rate), biquad_highpass(sample_rate)):
+        weighted = lfilter(b, a, weighted, axis=0)
+
+    block = int(LOUDNESS_BLOCK_SECONDS * sample_rate)
+    step = int(LOUDNESS_STEP_SECONDS * sample_rate)
+    if len(weighted) < block:
+        block = step = max(1, len(weighted))
+
+    # Média quadrática de cada bloco por canal, com soma acumulada
+    energy = np.concatenate([np.zeros((1, weighted.shape[1])), np.cumsum(weighted ** 2, axis=0)])
+    starts = np.arange(0, len(weighted) - block + 1, step)
+    block_power = ((energy[starts + block] - energy[starts]) / block).sum(axis=1)
+    with np.errstate(divide="ignore"):
+        block_loudness = -0.691 + 10.0 * np.log10(block_power)
+
+    gated = block_power[block_loudness > ABSOLUTE_GATE_LUFS]
+    if len(gated) == 0:
+        return float("-inf")
+    relative_gate = -0.691 + 10.0 * np.log10(gated.mean()) + RELATIVE_GATE_LU
+    gated = block_power[(block_loudness > ABSOLUTE_GATE_LUFS) & (block_loudness > relative_gate)]
+    return float(-0.691 + 10.0 * np.log10(gated.mean()))
+
+
+def normalize_loudness(mix: np.ndarray, sample_rate: int, target_lufs: float = MIX_TARGET_LUFS,
+                       peak_limit: float = MIX_PEAK_LIMIT) -> np.ndarray:
+    """Ganho único até a loudness alvo, limitado para o pico não passar de peak_limit"""
+    loudness = integrated_loudness(mix, sample_rate)
+    if not np.isfinite(loudness):
+        return mix
+    gain = db_to_gain(target_lufs - loudness)
+    peak = float(np.max(np.abs(mix))) if len(mix) else 0.0
+    if peak > 0:
+        gain = min(gain, peak_limit / peak)
+    print(f"🔊 Loudness {loudness:.1f} LUFS -> {loudness + 20 * np.log10(gain):.1f} LUFS")
+    return mix * np.float32(gain)
+
+
+def mix_tracks(narration: np.ndarray, sample_rate: int, music: Optional[np.ndarray] = None,
+               music_volume: float = 1.0, effects: Optional[List[Tuple[np.ndarray, float, float]]] = None,
+               duck: bool = True, target_lufs: Optional[float] = MIX_TARGET_LUFS) -> np.ndarray:
+    """
+    Mixa a narração (quadros x canais) com música em loop e efeitos
+    effects: [(amostras, volume, início em segundos)]
+    Todas as faixas devem estar na mesma taxa e número de canais da narração
+    """
+    frames = len(narration)
+    mix = np.array(narration, dtype=np.float32)
+
+    if music is not None and len(music):
+        bed = loop_to_length(music, frames) * np.float32(music_volume)
+        if duck:
+            bed *= ducking_gain(narration, sample_rate)[:, None]
+        mix += bed
+
+    for samples, volume, start in effects or []:
+        first = min(frames, max(0, int(round(start * sample_rate))))
+        length = min(len(samples), frames - first)
+        if length > 0:
+            mix[first:first + length] += np.asarray(samples[:length], dtype=np.float32) * np.float32(volume)
+
+    if target_lufs is not None:
+        mix = normalize_loudness(mix, sample_rate, target_lufs)
+    return mix
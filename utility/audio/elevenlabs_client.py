@@ -0,0 +1,120 @@
+"""
+Cliente HTTP assíncrono do ElevenLabs
+Usa um httpx.AsyncClient com pool de conexões por event loop, grava o áudio
+no disco à medida que chega (endpoint stream/with-timestamps), aplica
+timeouts explícitos de conexão/leitura e repete erros transitórios com
+backoff exponencial com jitter, sem bloquear o loop dos outros jobs
+"""
+
+import asyncio
+import base64
+import json
+import os
+import random
+import weakref
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+ELEVENLABS_API_URL = os.environ.get("ELEVENLABS_API_URL", "https://api.elevenlabs.io/v1")
+ELEVENLABS_CONNECT_TIMEOUT = float(os.environ.get("ELEVENLABS_CONNECT_TIMEOUT", "10"))
+ELEVENLABS_READ_TIMEOUT = float(os.environ.get("ELEVENLABS_READ_TIMEOUT", "60"))
+ELEVENLABS_MAX_RETRIES = int(os.environ.get("ELEVENLABS_MAX_RETRIES", "3"))
+ELEVENLABS_BACKOFF_SECONDS = float(os.environ.get("ELEVENLABS_BACKOFF_SECONDS", "1.0"))
+ELEVENLABS_MAX_CONNECTIONS = int(os.environ.get("ELEVENLABS_MAX_CONNECTIONS", "8"))
+
+# Respostas que valem nova tentativa (limite de taxa e falhas do servidor)
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Um cliente por event loop (as conexões do pool pertencem ao loop que as abriu)
+_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+class ElevenLabsError(Exception):
+    """Falha definitiva da API (erro não transitório ou tentativas esgotadas)"""
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Cliente compartilhado pelas requisições do loop atual"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=ELEVENLABS_API_URL,
+            timeout=httpx.Timeout(ELEVENLABS_READ_TIMEOUT, connect=ELEVENLABS_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=ELEVENLABS_MAX_CONNECTIONS,
+                                max_keepalive_connections=ELEVENLABS_MAX_CONNECTIONS),
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_http_client():
+    """Fecha o cliente do loop atual (chamar antes de encerrar o loop)"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def backoff_delay(attempt: int) -> float:
+    """Backoff exponencial com jitter completo"""
+    return random.uniform(0, ELEVENLABS_BACKOFF_SECONDS * (2 ** attempt))
+
+
+async def _stream_once(voice_id: str, payload: Dict[str, Any], output_filename: str, api_key: str,
+                       on_first_byte: Optional[Callable[[], None]] = None) -> Dict[str, List]:
+    headers = {"Accept": "application/json", "Content-Type": "application/json", "xi-api-key": api_key}
+    alignment: Dict[str, List] = {"characters": [], "character_start_times_seconds": [],
+                                  "character_end_times_seconds": []}
+    client = get_http_client()
+    async with client.stream("POST", f"/text-to-speech/{voice_id}/stream/with-timestamps",
+                             json=payload, headers=headers) as response:
+        if response.status_code != 200:
+            body = (await response.aread()).decode("utf-8", "replace")
+            raise httpx.HTTPStatusError(f"{response.status_code} - {body}", request=response.request,
+                                        response=response)
+        # Cada linha é um JSON com um pedaço do áudio e o alinhamento dos caracteres dele
+        with open(output_filename, "wb") as f:
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("audio_base64"):
+                    if on_first_byte is not None and f.tell() == 0:
+                        on_first_byte()
+                    f.write(base64.b64decode(chunk["audio_base64"]))
+                chunk_alignment = chunk.get("alignment") or {}
+                starts = chunk_alignment.get("character_start_times_seconds") or []
+                ends = chunk_alignment.get("character_end_times_seconds") or []
+                # Tempos relativos ao pedaço são deslocados para o tempo do áudio inteiro
+                received_ends = alignment["character_end_times_seconds"]
+                previous_end = received_ends[-1] if received_ends else 0.0
+                offset = previous_end if starts and starts[0] < previous_end - 1e-3 else 0.0
+                alignment["characters"].extend(chunk_alignment.get("characters") or [])
+                alignment["character_start_times_seconds"].extend(t + offset for t in starts)
+                alignment["character_end_times_seconds"].extend(t + offset for t in ends)
+    return alignment
+
+
+async def stream_speech(voice_id: str, payload: Dict[str, Any], output_filename: str, api_key: str,
+                        on_first_byte: Optional[Callable[[], None]] = None) -> Dict[str, List]:
+    """
+    Sintetiza payload gravando o áudio em output_filename enquanto é recebido
+    on_first_byte é chamado quando chega o primeiro pedaço de áudio de cada tentativa
+    Retorna o alinhamento por caractere; levanta ElevenLabsError se não for possível
+    """
+    for attempt in range(ELEVENLABS_MAX_RETRIES + 1):
+        try:
+            return await _stream_once(voice_id, payload, output_filename, api_key, on_first_byte)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code not in RETRYABLE_STATUS:
+                raise ElevenLabsError(f"Erro na API ElevenLabs: {e}") from e
+            error = e
+        except (httpx.TransportError, json.JSONDecodeError) as e:
+            error = e
+        if attempt == ELEVENLABS_MAX_RETRIES:
+            break
+        delay = backoff_delay(attempt)
+        print(f"⚠️ ElevenLabs falhou ({error}), tentando novamente em {delay:.1f}s...")
+        await asyncio.sleep(delay)
+    raise ElevenLabsError(f"ElevenLabs falhou após {ELEVENLABS_MAX_RETRIES + 1} tentativas: {error}")
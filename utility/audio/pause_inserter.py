@@ -0,0 +1,141 @@
+"""
+Inserção de pausas estratégicas com numpy
+Posiciona as pausas do template no fim de frases (tempo das palavras do TTS)
+ou no trecho de menor energia próximo da posição pedida, insere o silêncio
+de uma vez nas amostras e devolve um remapeamento de tempo para deslocar
+legendas e segmentos de busca já calculados em vez de recalculá-los
+"""
+
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Distância máxima (s) entre a posição pedida e a fronteira de frase ou silêncio escolhida
+PAUSE_SEARCH_SECONDS = float(os.environ.get("PAUSE_SEARCH_SECONDS", "2.0"))
+ENERGY_FRAME_SECONDS = 0.02
+
+SENTENCE_END = (".", "!", "?", "…", ";", ":")
+
+
+class PauseRemap:
+    """Converte tempos do áudio original para o áudio com pausas"""
+
+    def __init__(self, points: Optional[np.ndarray] = None, durations: Optional[np.ndarray] = None):
+        self.points = np.asarray(points if points is not None else [], dtype=np.float64)
+        self.durations = np.asarray(durations if durations is not None else [], dtype=np.float64)
+        # Deslocamento acumulado depois de cada pausa (índice 0 = antes da primeira)
+        self.offsets = np.concatenate([[0.0], np.cumsum(self.durations)])
+
+    @property
+    def total(self) -> float:
+        return float(self.offsets[-1])
+
+    def __call__(self, t, side: str = "right"):
+        """
+        Tempo remapeado (escalar ou array)
+        side="right" desloca um tempo igual à posição da pausa (inícios);
+        side="left" o mantém antes dela (fins)
+        """
+        shifted = np.asarray(t, dtype=np.float64) + self.offsets[np.searchsorted(self.points, t, side=side)]
+        return float(shifted) if np.ndim(shifted) == 0 else shifted
+
+    def captions(self, captions_pairs) -> List:
+        """[((início, fim), texto)] no tempo do áudio com pausas"""
+        return [((self(start), self(end, "left")), text) for (start, end), text in captions_pairs]
+
+    def segments(self, timed_segments) -> List:
+        """
+        Segmentos de busca [[início, fim], termos] no tempo do áudio com pausas
+        O segmento que termina na pausa a cobre, para o fundo continuar contínuo
+        """
+        if not timed_segments:
+            return timed_segments
+        return [[[self(start), self(end)], terms] for (start, end), terms in timed_segments]
+
+    def word_timings(self, word_timings: Optional[List[Dict]]) -> Optional[List[Dict]]:
+        if not word_timings:
+            return word_timings
+        return [dict(w, start=self(w["start"]), end=self(w["end"], "left")) for w in word_timings]
+
+
+def pause_targets(pauses_config: Dict) -> List[Tuple[float, float]]:
+    """
+    Pausas pedidas como [(posição relativa 0-1, duração)]
+    Aceita as listas do template ("impact_pauses", "natural_pauses", ...) ou o
+    formato antigo {"count", "duration"} com pausas igualmente espaçadas
+    """
+    targets = []
+    for pauses in pauses_config.values():
+        if not isinstance(pauses, list):
+            continue
+        for pause in pauses:
+            if isinstance(pause, dict) and "position" in pause:
+                targets.append((float(pause["position"]), float(pause.get("duration", 0.3))))
+    if not targets and ("count" in pauses_config or "duration" in pauses_config):
+        count = int(pauses_config.get("count", 3))
+        duration = float(pauses_config.get("duration", 2.0))
+        targets = [((i + 1) / (count + 1), duration) for i in range(count)]
+    return sorted(targets)
+
+
+def sentence_boundaries(word_timings: Optional[List[Dict]]) -> np.ndarray:
+    """Meio do intervalo entre a palavra que fecha uma frase e a seguinte"""
+    if not word_timings:
+        return np.zeros(0)
+    boundaries = [
+        (word["end"] + following["start"]) / 2
+        for word, following in zip(word_timings, word_timings[1:])
+        if word["word"].rstrip().endswith(SENTENCE_END)
+    ]
+    return np.asarray(boundaries, dtype=np.float64)
+
+
+def quietest_point(samples: np.ndarray, sample_rate: int, target: float, search: float) -> float:
+    """Centro do quadro de menor energia RMS a até search segundos de target"""
+    first = max(0, int((target - search) * sample_rate))
+    last = min(len(samples), int((target + search) * sample_rate))
+    frame_size = max(1, int(sample_rate * ENERGY_FRAME_SECONDS))
+    frames = (last - first) // frame_size
+    if frames <= 0:
+        return target
+    window = np.asarray(samples[first:first + frames * frame_size], dtype=np.float32)
+    if window.ndim > 1:
+        window = window.mean(axis=1)
+    energy = np.sqrt(np.mean(window.reshape(frames, frame_size) ** 2, axis=1))
+    return (first + int(np.argmin(energy)) * frame_size + frame_size // 2) / sample_rate
+
+
+def place_pauses(samples: np.ndarray, sample_rate: int, targets: List[Tuple[float, float]],
+                 word_timings: Optional[List[Dict]] = None,
+                 search: float = PAUSE_SEARCH_SECONDS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Instantes (s) e durações das pausas: a fronteira de frase mais próxima da
+    posição pedida ou, sem frase por perto, o ponto mais silencioso
+    Pausas que caem no mesmo instante viram uma só (a maior)
+    """
+    total = len(samples) / sample_rate
+    boundaries = sentence_boundaries(word_timings)
+    placed: Dict[int, float] = {}
+    for position, duration in targets:
+        target = min(max(position, 0.0), 1.0) * total
+        nearby = boundaries[np.abs(boundaries - target) <= search] if len(boundaries) else boundaries
+        if len(nearby):
+            point = float(nearby[np.argmin(np.abs(nearby - target))])
+        else:
+            point = quietest_point(samples, sample_rate, target, search)
+        frame = min(len(samples), max(0, int(round(point * sample_rate))))
+        placed[frame] = max(placed.get(frame, 0.0), duration)
+
+    frames = np.asarray(sorted(placed), dtype=np.int64)
+    durations = np.asarray([placed[frame] for frame in frames], dtype=np.float64)
+    return frames, durations
+
+
+def insert_pauses(samples: np.ndarray, sample_rate: int, frames: np.ndarray,
+                  durations: np.ndarray) -> Tuple[np.ndarray, PauseRemap]:
+    """Insere o silêncio de todas as pausas em uma única operação"""
+    pause_frames = np.round(durations * sample_rate).astype(np.int64)
+    indices = np.repeat(frames, pause_frames)
+    paused = np.insert(np.asarray(samples, dtype=np.float32), indices, 0.0, axis=0)
+    return paused, PauseRemap(frames / sample_rate, pause_frames / sample_rate)
@@ -0,0 +1,177 @@
+"""
+Buffer de áudio decodificado compartilhado pelas etapas do pipeline
+A narração é decodificada uma única vez para PCM float32 intercalado (.f32) no
+cache em disco, mapeada em memória e entregue a cada etapa (transcrição,
+pausas, mixagem e renderização) como uma view numpy, sem novos processos
+do ffmpeg até o mux final
+"""
+
+import os
+import subprocess
+import threading
+import wave
+from collections import OrderedDict
+from math import gcd
+from typing import Optional, Tuple
+
+import numpy as np
+
+from utility.cache.disk_cache import DiskCache, hash_file, hash_key
+
+PCM_CACHE_DIR = os.environ.get("PCM_CACHE_DIR", ".cache/pcm")
+PCM_CACHE_MAX_MB = int(os.environ.get("PCM_CACHE_MAX_MB", "2048"))
+# Buffers mantidos abertos por processo
+PCM_MAX_BUFFERS = int(os.environ.get("PCM_MAX_BUFFERS", "8"))
+
+# Formato do buffer: o mesmo que o MoviePy usa para áudio (44,1 kHz estéreo)
+PCM_SAMPLE_RATE = 44100
+PCM_CHANNELS = 2
+WHISPER_SAMPLE_RATE = 16000
+
+# Alterar quando o formato do arquivo .f32 mudar (invalida o cache)
+PCM_CACHE_VERSION = 1
+
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int = PCM_SAMPLE_RATE):
+    """Grava amostras float32 (quadros x canais) em WAV PCM 16 bits"""
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    with wave.open(path, "wb") as f:
+        f.setnchannels(samples.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+
+
+class DecodedAudio:
+    """Áudio decodificado em float32, mapeado em memória (quadros x canais)"""
+
+    def __init__(self, source_path: str, pcm_path: str, sample_rate: int = PCM_SAMPLE_RATE,
+                 channels: int = PCM_CHANNELS):
+        self.source_path = source_path
+        self.pcm_path = pcm_path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        if os.path.getsize(pcm_path) > 0:
+            self.samples = np.memmap(pcm_path, dtype=np.float32, mode="r").reshape(-1, channels)
+        else:
+            self.samples = np.zeros((0, channels), dtype=np.float32)
+        self._whisper_samples: Optional[np.ndarray] = None
+
+    @property
+    def frames(self) -> int:
+        return self.samples.shape[0]
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+    def slice(self, start: float, end: Optional[float] = None) -> np.ndarray:
+        """View das amostras entre start e end (segundos)"""
+        first = max(0, int(round(start * self.sample_rate)))
+        last = self.frames if end is None else min(self.frames, int(round(end * self.sample_rate)))
+        return self.samples[first:last]
+
+    def mono(self) -> np.ndarray:
+        return self.samples.mean(axis=1, dtype=np.float32)
+
+    def whisper_samples(self) -> np.ndarray:
+        """Mono 16 kHz, como whisper.load_audio (calculado uma vez por buffer)"""
+        if self._whisper_samples is None:
+            from scipy.signal import resample_poly
+
+            divisor = gcd(WHISPER_SAMPLE_RATE, self.sample_rate)
+            resampled = resample_poly(self.mono(), WHISPER_SAMPLE_RATE // divisor, self.sample_rate // divisor)
+            self._whisper_samples = resampled.astype(np.float32)
+        return self._whisper_samples
+
+    def audio_clip(self):
+        """AudioArrayClip do MoviePy lendo direto do buffer"""
+        from moviepy.audio.AudioClip import AudioArrayClip
+
+        return AudioArrayClip(self.samples, fps=self.sample_rate)
+
+
+class AudioBufferRegistry:
+    """Buffers por arquivo de áudio, decodificados no máximo uma vez (cache em disco + LRU em memória)"""
+
+    def __init__(self, root: str = PCM_CACHE_DIR, max_mb: int = PCM_CACHE_MAX_MB,
+                 max_buffers: int = PCM_MAX_BUFFERS):
+        self.cache = DiskCache(root, max_mb * 1024 * 1024)
+        self.cache.clear_stale_temp_files()
+        self.max_buffers = max(1, max_buffers)
+        self._buffers: "OrderedDict[Tuple[str, int, int], DecodedAudio]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.decodes = 0
+        self.hits = 0
+
+    def _file_id(self, path: str) -> Tuple[str, int, int]:
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+    def _remember(self, file_id: Tuple[str, int, int], buffer: DecodedAudio) -> DecodedAudio:
+        with self._lock:
+            self._buffers[file_id] = buffer
+            self._buffers.move_to_end(file_id)
+            while len(self._buffers) > self.max_buffers:
+                self._buffers.popitem(last=False)
+        return buffer
+
+    def key_for(self, path: str) -> str:
+        return hash_key("pcm", PCM_CACHE_VERSION, hash_file(path), PCM_SAMPLE_RATE, PCM_CHANNELS)
+
+    def _decode(self, path: str, key: str) -> str:
+        from utility.render.mezzanine import get_ffmpeg_binary
+
+        temp_path = self.cache.temp_path(key, ".f32")
+        command = [get_ffmpeg_binary(), "-v", "error", "-y", "-i", path,
+                   "-f", "f32le", "-acodec", "pcm_f32le", "-ac", str(PCM_CHANNELS), "-ar", str(PCM_SAMPLE_RATE),
+                   str(temp_path)]
+        try:
+            subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except Exception:
+            self.cache.discard(temp_path)
+            raise
+        self.decodes += 1
+        print(f"🔊 Áudio decodificado para o buffer compartilhado: {os.path.basename(path)}")
+        return self.cache.commit(temp_path, key, ".f32")
+
+    def get(self, path: str) -> DecodedAudio:
+        """Buffer do arquivo, decodificando-o só se ainda não estiver no cache"""
+        file_id = self._file_id(path)
+        with self._lock:
+            buffer = self._buffers.get(file_id)
+            if buffer is not None:
+                self._buffers.move_to_end(file_id)
+                self.hits += 1
+                return buffer
+
+        key = self.key_for(path)
+        with self.cache.key_lock(key):
+            pcm_path = self.cache.get(key, ".f32")
+            if pcm_path:
+                self.hits += 1
+            else:
+                pcm_path = self._decode(path, key)
+        return self._remember(file_id, DecodedAudio(path, pcm_path))
+
+    def put(self, path: str, samples: np.ndarray) -> DecodedAudio:
+        """
+        Registra amostras já em memória (44,1 kHz estéreo) como o buffer de path,
+        para áudio produzido pelo próprio pipeline não ser decodificado de novo
+        """
+        key = self.key_for(path)
+        with self.cache.key_lock(key):
+            temp_path = self.cache.temp_path(key, ".f32")
+            try:
+                np.ascontiguousarray(samples, dtype=np.float32).tofile(str(temp_path))
+            except Exception:
+                self.cache.discard(temp_path)
+                raise
+            pcm_path = self.cache.commit(temp_path, key, ".f32")
+        return self._remember(self._file_id(path), DecodedAudio(path, pcm_path))
+
+
+# Instância global dos buffers de áudio
+audio_buffers = AudioBufferRegistry()
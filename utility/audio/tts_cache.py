@@ -0,0 +1,188 @@
+"""
+Cache persistente de áudio do TTS
+Guarda o áudio codificado e o tempo das palavras pela chave (provedor, voz,
+configurações, velocidade, texto normalizado), para que novas tentativas,
+re-renderizações e frases repetidas (CTAs, saudações) não paguem de novo a
+latência e a cota da API. Frases de uma síntese também são guardadas
+separadamente, para serem emendadas em roteiros futuros
+"""
+
+import json
+import os
+import re
+import shutil
+import tempfile
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utility.audio.pcm_buffer import audio_buffers, write_wav
+from utility.cache.disk_cache import DiskCache, hash_key
+
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", ".cache/tts")
+TTS_CACHE_MAX_MB = int(os.environ.get("TTS_CACHE_MAX_MB", "1024"))
+# Reaproveitar frases já sintetizadas em outros roteiros ("0" desliga)
+TTS_SENTENCE_REUSE = os.environ.get("TTS_SENTENCE_REUSE", "1") != "0"
+
+# Alterar quando o formato salvo mudar (invalida o cache)
+TTS_CACHE_VERSION = 1
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?…])\s+")
+PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+
+
+def normalize_text(text: str) -> str:
+    """Texto na forma usada pela chave (NFC, espaços colapsados)"""
+    return unicodedata.normalize("NFC", " ".join(text.split()))
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence for sentence in SENTENCE_SPLIT.split(normalize_text(text)) if sentence]
+
+
+def split_chunks(text: str, max_chars: int) -> List[str]:
+    """
+    Agrupa frases inteiras em trechos de até max_chars, sem atravessar parágrafos
+    (uma frase maior que max_chars fica sozinha no seu trecho)
+    """
+    chunks = []
+    for paragraph in PARAGRAPH_SPLIT.split(text):
+        current = ""
+        for sentence in split_sentences(paragraph):
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                chunks.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            chunks.append(current)
+    return chunks
+
+
+class TTSCache:
+    """Áudio do TTS (.audio) e tempo das palavras (.json), com despejo LRU limitado por bytes"""
+
+    def __init__(self, root: str = TTS_CACHE_DIR, max_mb: int = TTS_CACHE_MAX_MB):
+        self.cache = DiskCache(root, max_mb * 1024 * 1024)
+        self.cache.clear_stale_temp_files()
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, voice: Dict, text: str) -> str:
+        return hash_key("tts", TTS_CACHE_VERSION, voice["provider"], voice["voice_id"],
+                        json.dumps(voice.get("settings") or {}, sort_keys=True), voice.get("rate"),
+                        voice.get("model_id"), normalize_text(text))
+
+    def get(self, key: str) -> Optional[Tuple[str, List[Dict]]]:
+        """(caminho do áudio, tempo das palavras) ou None"""
+        audio_path = self.cache.get(key, ".audio")
+        meta_path = self.cache.get(key, ".json") if audio_path else None
+        if not meta_path:
+            self.misses += 1
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Áudio em cache ilegível, sintetizando de novo: {e}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return audio_path, meta.get("word_timings") or []
+
+    def put(self, key: str, audio_path: str, word_timings: Optional[List[Dict]]):
+        """Salva uma cópia do áudio e o tempo das palavras"""
+        with self.cache.key_lock(key):
+            temp_audio = self.cache.temp_path(key, ".audio")
+            temp_meta = self.cache.temp_path(key, ".json")
+            try:
+                shutil.copyfile(audio_path, temp_audio)
+                with open(temp_meta, "w", encoding="utf-8") as f:
+                    json.dump({"word_timings": word_timings or []}, f, ensure_ascii=False)
+            except Exception:
+                self.cache.discard(temp_audio)
+                self.cache.discard(temp_meta)
+                raise
+            cached_audio = self.cache.commit(temp_audio, key, ".audio")
+            self.cache.commit(temp_meta, key, ".json", protect=[cached_audio])
+
+    def restore(self, key: str, output_filename: str) -> Optional[List[Dict]]:
+        """Copia o áudio em cache para output_filename e retorna o tempo das palavras"""
+        entry = self.get(key)
+        if entry is None:
+            return None
+        audio_path, word_timings = entry
+        shutil.copyfile(audio_path, output_filename)
+        return word_timings
+
+    def store_sentences(self, voice: Dict, text: str, audio_path: str, word_timings: Optional[List[Dict]]):
+        """
+        Recorta a síntese nas fronteiras de frase (pelo tempo das palavras) e guarda
+        cada frase com o tempo relativo ao seu início
+        Só recorta quando as palavras do TTS correspondem às palavras do texto
+        """
+        sentences = split_sentences(text)
+        if len(sentences) < 2 or not word_timings:
+            return
+        counts = [len(sentence.split()) for sentence in sentences]
+        if sum(counts) != len(word_timings):
+            return
+
+        buffer = audio_buffers.get(audio_path)
+        ends = np.cumsum(counts)
+        work_dir = tempfile.mkdtemp(prefix="tts_sentences_")
+        try:
+            start_time = 0.0
+            for i, (sentence, last) in enumerate(zip(sentences, ends)):
+                first = last - counts[i]
+                # Corte no meio do silêncio entre a última palavra da frase e a próxima
+                if last < len(word_timings):
+                    end_time = (word_timings[last - 1]["end"] + word_timings[last]["start"]) / 2
+                else:
+                    end_time = buffer.duration
+                sentence_timings = [
+                    dict(timing, start=timing["start"] - start_time, end=timing["end"] - start_time)
+                    for timing in word_timings[first:last]
+                ]
+                sentence_path = os.path.join(work_dir, f"sentence_{i}.wav")
+                write_wav(sentence_path, buffer.slice(start_time, end_time), buffer.sample_rate)
+                self.put(self.key_for(voice, sentence), sentence_path, sentence_timings)
+                start_time = end_time
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def splice_audio(parts: List[Tuple[str, List[Dict]]], output_filename: str,
+                 crossfade: float = 0.0) -> List[Dict]:
+    """
+    Emenda os áudios em ordem em output_filename, deslocando o tempo das palavras
+    crossfade (s) sobrepõe o fim de cada parte ao início da seguinte
+    """
+    pieces = []
+    word_timings = []
+    offset = 0.0
+    sample_rate = None
+    for audio_path, timings in parts:
+        buffer = audio_buffers.get(audio_path)
+        sample_rate = buffer.sample_rate
+        samples = buffer.samples
+        overlap = min(int(round(crossfade * sample_rate)), len(samples), len(pieces[-1])) if pieces else 0
+        if overlap:
+            ramp = np.linspace(0.0, 1.0, overlap, dtype=np.float32)[:, None]
+            blended = pieces[-1][-overlap:] * (1.0 - ramp) + samples[:overlap] * ramp
+            pieces[-1] = pieces[-1][:-overlap]
+            pieces.append(blended)
+            samples = samples[overlap:]
+        start = offset - overlap / sample_rate
+        word_timings.extend(dict(t, start=t["start"] + start, end=t["end"] + start) for t in timings)
+        pieces.append(samples)
+        offset = start + buffer.duration
+    samples = np.concatenate(pieces)
+    write_wav(output_filename, samples, sample_rate)
+    audio_buffers.put(output_filename, samples)
+    return word_timings
+
+
+# Instância global do cache de áudio do TTS
+tts_cache = TTSCache()
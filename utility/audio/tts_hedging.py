@@ -0,0 +1,75 @@
+"""
+Métricas das requisições do TTS com hedging
+Guarda a latência até o primeiro byte do provedor principal (janela móvel)
+para calcular o atraso do hedge por percentil, e conta quantas requisições
+dispararam o provedor secundário e qual provedor venceu a corrida
+"""
+
+import os
+import threading
+from collections import deque
+from typing import Dict
+
+import numpy as np
+
+# "1" liga o hedging: sem primeiro byte do ElevenLabs dentro do percentil, o Edge TTS também é chamado
+TTS_HEDGING = os.environ.get("TTS_HEDGING", "0") == "1"
+TTS_HEDGE_PERCENTILE = float(os.environ.get("TTS_HEDGE_PERCENTILE", "95"))
+# Atraso usado até haver amostras suficientes, e limites do atraso calculado (s)
+TTS_HEDGE_DEFAULT_DELAY = float(os.environ.get("TTS_HEDGE_DEFAULT_DELAY", "8"))
+TTS_HEDGE_MIN_DELAY = float(os.environ.get("TTS_HEDGE_MIN_DELAY", "1"))
+TTS_HEDGE_MAX_DELAY = float(os.environ.get("TTS_HEDGE_MAX_DELAY", "30"))
+TTS_HEDGE_MIN_SAMPLES = 20
+TTS_HEDGE_WINDOW = int(os.environ.get("TTS_HEDGE_WINDOW", "200"))
+
+
+class HedgeMetrics:
+    """Latências do primeiro byte e contadores de hedge (compartilhados pelas threads dos jobs)"""
+
+    def __init__(self, window: int = TTS_HEDGE_WINDOW):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.wins = {"primary": 0, "secondary": 0}
+
+    def record_first_byte(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def record_request(self, hedged: bool, winner: str):
+        with self._lock:
+            self.requests += 1
+            if hedged:
+                self.hedged += 1
+                if winner in self.wins:
+                    self.wins[winner] += 1
+
+    def hedge_delay(self, percentile: float = TTS_HEDGE_PERCENTILE) -> float:
+        """Percentil da latência do primeiro byte, limitado a [TTS_HEDGE_MIN_DELAY, TTS_HEDGE_MAX_DELAY]"""
+        with self._lock:
+            latencies = list(self._latencies)
+        if len(latencies) < TTS_HEDGE_MIN_SAMPLES:
+            return TTS_HEDGE_DEFAULT_DELAY
+        delay = float(np.percentile(latencies, percentile))
+        return min(max(delay, TTS_HEDGE_MIN_DELAY), TTS_HEDGE_MAX_DELAY)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            latencies = list(self._latencies)
+            requests, hedged, wins = self.requests, self.hedged, dict(self.wins)
+        return {
+            "enabled": TTS_HEDGING,
+            "requests": requests,
+            "hedged": hedged,
+            "hedge_rate": hedged / requests if requests else 0.0,
+            "wins": wins,
+            "secondary_win_rate": wins.get("secondary", 0) / hedged if hedged else 0.0,
+            "hedge_delay": self.hedge_delay(),
+            "first_byte_p50": float(np.percentile(latencies, 50)) if latencies else None,
+            "first_byte_p95": float(np.percentile(latencies, 95)) if latencies else None,
+        }
+
+
+# Instância global das métricas de hedging
+tts_hedge_metrics = HedgeMetrics()
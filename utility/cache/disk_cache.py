@@ -0,0 +1,145 @@
+"""
+Cache em disco endereçado por conteúdo com despejo LRU por bytes
+Base comum para os caches de mídia, transcrição e áudio
+"""
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+
+def hash_key(*parts) -> str:
+    """Gera a chave SHA-256 a partir das partes informadas"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 do conteúdo de um arquivo, lido em blocos"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """Diretório de cache com escrita atômica e despejo dos arquivos menos usados"""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        # Início de cada job em andamento (ver job())
+        self._active_jobs = {}
+
+    def path_for(self, key: str, suffix: str = "") -> Path:
+        """Caminho final de uma entrada (subdiretório pelos 2 primeiros caracteres)"""
+        return self.root / key[:2] / f"{key}{suffix}"
+
+    def temp_path(self, key: str, suffix: str = "") -> Path:
+        """Caminho temporário no mesmo disco, para publicar com os.replace"""
+        path = self.root / key[:2] / f".{key}.{uuid.uuid4().hex}.part{suffix}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def key_lock(self, key: str) -> threading.Lock:
+        """Lock por chave para evitar que duas threads produzam a mesma entrada"""
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    @contextmanager
+    def job(self) -> Iterator[None]:
+        """
+        Mantém as entradas usadas por um job até ele terminar
+        Enquanto houver jobs ativos, arquivos usados (get/commit) desde o início
+        do job mais antigo não são despejados, mesmo que o cache passe do orçamento
+        """
+        token = object()
+        with self._lock:
+            self._active_jobs[token] = time.time()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active_jobs.pop(token, None)
+
+    def get(self, key: str, suffix: str = "") -> Optional[str]:
+        """Retorna o caminho da entrada se existir, marcando-a como usada"""
+        path = self.path_for(key, suffix)
+        try:
+            os.utime(path, None)
+        except FileNotFoundError:
+            return None
+        return str(path)
+
+    def commit(self, temp_path, key: str, suffix: str = "", protect: Iterable[str] = ()) -> str:
+        """Publica o arquivo temporário como entrada do cache e aplica o orçamento"""
+        path = self.path_for(key, suffix)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, path)
+        self.evict(protect=set(protect) | {str(path)})
+        return str(path)
+
+    def discard(self, temp_path):
+        """Remove um arquivo temporário após falha"""
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+    def total_bytes(self) -> int:
+        return sum(entry.stat().st_size for entry in self.root.rglob("*") if entry.is_file())
+
+    def evict(self, protect: Iterable[str] = ()):
+        """Remove as entradas menos usadas até o cache caber em max_bytes"""
+        protect = {str(p) for p in protect}
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in self.root.rglob("*"):
+                if not entry.is_file() or entry.name.startswith("."):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry))
+                total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            # Arquivos usados desde o início do job ativo mais antigo ainda podem ser abertos
+            in_use_since = min(self._active_jobs.values(), default=None)
+
+            entries.sort()
+            for mtime, size, entry in entries:
+                if total <= self.max_bytes:
+                    break
+                if in_use_since is not None and mtime >= in_use_since:
+                    break
+                if str(entry) in protect:
+                    continue
+                try:
+                    entry.unlink()
+                    total -= size
+                except OSError:
+                    continue
+
+    def clear_stale_temp_files(self, max_age_seconds: int = 3600):
+        """Remove arquivos .part deixados por processos interrompidos"""
+        now = time.time()
+        for entry in self.root.rglob(".*.part*"):
+            try:
+                if now - entry.stat().st_mtime > max_age_seconds:
+                    entry.unlink()
+            except OSError:
+                continue
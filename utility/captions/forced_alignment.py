@@ -0,0 +1,131 @@
+"""
+Alinhamento forçado do roteiro conhecido ao áudio
+Em vez de transcrever do zero, passa o texto exato do roteiro pelo decoder do
+Whisper (uma única passada com teacher forcing) e usa o DTW sobre a atenção
+cruzada (whisper.timing.find_alignment) para obter o tempo real de cada palavra
+"""
+
+import os
+from typing import Dict, List
+
+import torch
+import whisper
+from whisper.audio import FRAMES_PER_SECOND, HOP_LENGTH, N_FRAMES, N_SAMPLES, SAMPLE_RATE
+from whisper.timing import find_alignment
+
+from utility.audio.pcm_buffer import audio_buffers
+from utility.captions.whisper_model_registry import whisper_model_registry
+
+# Palavras aceitas só se terminarem antes desta margem do fim da janela (o resto vai para a próxima)
+ALIGNMENT_TAIL_MARGIN_SECONDS = float(os.environ.get("ALIGNMENT_TAIL_MARGIN_SECONDS", "3.0"))
+# Palavras candidatas por segundo de áudio em cada janela (folga sobre a fala rápida)
+ALIGNMENT_WORDS_PER_SECOND = float(os.environ.get("ALIGNMENT_WORDS_PER_SECOND", "4.0"))
+# Tokens de texto por janela (o decoder aceita 448 com a sequência inicial)
+ALIGNMENT_MAX_TOKENS = 400
+
+
+def get_alignment_tokenizer(model, language: str):
+    return whisper.tokenizer.get_tokenizer(model.is_multilingual,
+                                           num_languages=getattr(model, "num_languages", 99),
+                                           language=language, task="transcribe")
+
+
+def merge_word_timings(script_words: List[str], timings, first_word: int) -> List[Dict]:
+    """
+    Junta as palavras do tokenizer (que separa pontuação) nas palavras do roteiro,
+    casando pela posição dos caracteres do texto alinhado
+    """
+    merged = []
+    word = first_word
+    consumed = 0
+    target = len(" " + script_words[word]) if word < len(script_words) else 0
+    current = None
+    for timing in timings:
+        if word >= len(script_words):
+            break
+        if current is None:
+            current = {"word": script_words[word], "start": timing.start, "end": timing.end}
+        else:
+            current["end"] = timing.end
+        consumed += len(timing.word)
+        if consumed >= target:
+            merged.append(current)
+            current = None
+            consumed -= target
+            word += 1
+            target = len(" " + script_words[word]) if word < len(script_words) else 0
+    return merged
+
+
+def align_script(audio, script_text: str, model_size: str = "base", language: str = "pt") -> List[Dict]:
+    """
+    Alinha as palavras de script_text ao áudio (caminho ou array 16 kHz)
+    Retorna [{"word", "start", "end"}] no mesmo formato do alinhamento do TTS
+    """
+    if isinstance(audio, str):
+        audio = audio_buffers.get(audio).whisper_samples()
+    script_words = script_text.split()
+    if not script_words:
+        return []
+
+    aligned: List[Dict] = []
+    with whisper_model_registry.use_model(model_size) as entry:
+        model = entry.model
+        tokenizer = get_alignment_tokenizer(model, language)
+        word_tokens = [tokenizer.encode(" " + word) for word in script_words]
+        dtype = torch.float16 if entry.fp16 else torch.float32
+
+        mel = whisper.log_mel_spectrogram(audio, model.dims.n_mels, padding=N_SAMPLES)
+        content_frames = mel.shape[-1] - N_FRAMES
+        seek = 0
+        word_index = 0
+
+        while word_index < len(script_words) and seek < content_frames:
+            segment_size = min(N_FRAMES, content_frames - seek)
+            window_seconds = segment_size / FRAMES_PER_SECOND
+            offset = seek * HOP_LENGTH / SAMPLE_RATE
+            is_last_window = seek + segment_size >= content_frames
+
+            # Palavras candidatas para a janela, limitadas pelo contexto do decoder
+            max_words = max(1, int(window_seconds * ALIGNMENT_WORDS_PER_SECOND))
+            text_tokens: List[int] = []
+            end_word = word_index
+            while end_word < len(script_words) and end_word - word_index < max_words:
+                if len(text_tokens) + len(word_tokens[end_word]) > ALIGNMENT_MAX_TOKENS:
+                    break
+                text_tokens.extend(word_tokens[end_word])
+                end_word += 1
+            if is_last_window:
+                # Última janela recebe todo o restante que couber
+                while end_word < len(script_words) and \
+                        len(text_tokens) + len(word_tokens[end_word]) <= ALIGNMENT_MAX_TOKENS:
+                    text_tokens.extend(word_tokens[end_word])
+                    end_word += 1
+
+            mel_segment = whisper.pad_or_trim(mel[:, seek:seek + segment_size], N_FRAMES)
+            mel_segment = mel_segment.to(model.device, dtype=dtype)
+            timings = find_alignment(model, tokenizer, text_tokens, mel_segment, segment_size)
+            words = merge_word_timings(script_words, timings, word_index)
+
+            # Palavras perto do fim da janela podem estar comprimidas; realinhar na próxima
+            if not is_last_window:
+                cutoff = window_seconds - ALIGNMENT_TAIL_MARGIN_SECONDS
+                accepted = [word for word in words if word["end"] <= cutoff]
+                words = accepted or words[:1]
+
+            for word in words:
+                aligned.append({"word": word["word"], "start": word["start"] + offset, "end": word["end"] + offset})
+            word_index += len(words)
+
+            if not words:
+                break
+            next_seek = int(round((offset + words[-1]["end"]) * FRAMES_PER_SECOND))
+            seek = max(seek + 1, next_seek)
+
+    # Palavras que sobraram (áudio acabou antes do roteiro) ficam no fim
+    if word_index < len(script_words) and aligned:
+        end_time = aligned[-1]["end"]
+        for word in script_words[word_index:]:
+            aligned.append({"word": word, "start": end_time, "end": end_time})
+
+    return aligned
@@ -0,0 +1,175 @@
+"""
+Transcrição paralela de áudios longos
+Divide a narração em pontos de baixa energia (pausas entre frases), transcreve
+os trechos em um pool de processos persistente (cada worker carrega o modelo
+uma vez, pelo registro de modelos) e junta os segmentos com o deslocamento de
+cada trecho, devolvendo um resultado contínuo no formato do Whisper
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Áudios a partir desta duração usam o modo paralelo
+LONG_AUDIO_SECONDS = float(os.environ.get("LONG_AUDIO_SECONDS", "180"))
+# Duração alvo de cada trecho e janela de busca pela pausa em torno do corte
+LONG_AUDIO_CHUNK_SECONDS = float(os.environ.get("LONG_AUDIO_CHUNK_SECONDS", "60"))
+LONG_AUDIO_SEARCH_SECONDS = float(os.environ.get("LONG_AUDIO_SEARCH_SECONDS", "10"))
+LONG_AUDIO_WORKERS = int(os.environ.get("LONG_AUDIO_WORKERS", str(max(1, min(4, (os.cpu_count() or 1) // 2)))))
+
+SAMPLE_RATE = 16000
+ENERGY_FRAME_SECONDS = 0.025
+
+
+def frame_energy(audio: np.ndarray, frame_size: int) -> np.ndarray:
+    """Energia RMS por quadro de frame_size amostras"""
+    frames = len(audio) // frame_size
+    if frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    trimmed = audio[:frames * frame_size].reshape(frames, frame_size)
+    return np.sqrt(np.mean(trimmed.astype(np.float32) ** 2, axis=1))
+
+
+def find_split_points(audio: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                      chunk_seconds: float = LONG_AUDIO_CHUNK_SECONDS,
+                      search_seconds: float = LONG_AUDIO_SEARCH_SECONDS) -> List[int]:
+    """
+    Amostras onde cortar o áudio: o quadro de menor energia dentro de
+    ±search_seconds de cada múltiplo de chunk_seconds
+    """
+    frame_size = int(sample_rate * ENERGY_FRAME_SECONDS)
+    energy = frame_energy(audio, frame_size)
+    frames_per_second = 1.0 / ENERGY_FRAME_SECONDS
+    total_seconds = len(audio) / sample_rate
+
+    splits = []
+    last_split = 0.0
+    target = chunk_seconds
+    while target < total_seconds - chunk_seconds / 2:
+        low = max(last_split + chunk_seconds / 2, target - search_seconds)
+        high = min(total_seconds, target + search_seconds)
+        first_frame = int(low * frames_per_second)
+        last_frame = max(first_frame + 1, int(high * frames_per_second))
+        window = energy[first_frame:last_frame]
+        if len(window) == 0:
+            break
+        frame = first_frame + int(np.argmin(window))
+        split = frame * frame_size + frame_size // 2
+        splits.append(split)
+        last_split = split / sample_rate
+        target = last_split + chunk_seconds
+    return splits
+
+
+def split_audio(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, **kwargs) -> List[Tuple[float, np.ndarray]]:
+    """Trechos [(deslocamento em segundos, amostras)]"""
+    bounds = [0] + find_split_points(audio, sample_rate, **kwargs) + [len(audio)]
+    return [(start / sample_rate, audio[start:end]) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def init_worker(threads: int, backend: str, model_size: str):
+    """
+    Divide os núcleos entre os processos e carrega o modelo uma única vez por
+    worker (fica no registro de modelos do processo para os próximos trechos)
+    """
+    import torch
+    torch.set_num_threads(max(1, threads))
+
+    from utility.captions.transcribers import get_transcriber
+    get_transcriber(backend).warmup(model_size)
+
+
+# Pool persistente reaproveitado entre transcrições (criar processos e carregar
+# modelos a cada chamada custava mais que o ganho do paralelismo)
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_config: Optional[Tuple[int, str, str]] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(workers: int, backend: str, model_size: str) -> ProcessPoolExecutor:
+    """Pool de workers com o modelo já carregado, recriado só se a configuração mudar"""
+    global _pool, _pool_config
+    config = (workers, backend, model_size)
+    with _pool_lock:
+        if _pool is None or _pool_config != config:
+            if _pool is not None:
+                _pool.shutdown(wait=True)
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            # spawn evita herdar o estado de threads do torch do processo principal
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=init_worker, initargs=(threads, backend, model_size))
+            _pool_config = config
+        return _pool
+
+
+@atexit.register
+def shutdown_pool():
+    global _pool, _pool_config
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        _pool_config = None
+
+
+def transcribe_chunk(chunk: np.ndarray, backend: str, model_size: str, language: str, decode_options: Dict) -> Dict:
+    """Transcreve um trecho no processo do pool com os modelos do próprio processo"""
+    from utility.captions.transcribers import get_transcriber
+
+    return get_transcriber(backend).transcribe(chunk, model_size, language, decode_options)
+
+
+def shift_segment(segment: Dict, offset: float) -> Dict:
+    """Segmento com tempos (e palavras, se houver) deslocados para a linha do tempo do áudio inteiro"""
+    shifted = dict(segment)
+    shifted["start"] = segment["start"] + offset
+    shifted["end"] = segment["end"] + offset
+    if "words" in segment:
+        shifted["words"] = [dict(word, start=word["start"] + offset, end=word["end"] + offset)
+                            for word in segment["words"]]
+    return shifted
+
+
+def stitch_results(results: List[Tuple[float, Dict]]) -> Dict:
+    """Junta os resultados dos trechos em um único resultado contínuo"""
+    segments = []
+    texts = []
+    for offset, result in results:
+        for segment in result.get("segments", []):
+            shifted = shift_segment(segment, offset)
+            shifted["id"] = len(segments)
+            segments.append(shifted)
+        texts.append(result.get("text", ""))
+    language = results[0][1].get("language") if results else None
+    return {"text": "".join(texts), "segments": segments, "language": language}
+
+
+def transcribe_long_audio(audio: np.ndarray, model_size: str, language: str, decode_options: Dict,
+                          workers: int = LONG_AUDIO_WORKERS, backend: str = "whisper") -> Dict:
+    """
+    Transcreve o áudio (16 kHz mono, como whisper.load_audio) em trechos paralelos
+    com o backend de transcrição informado e devolve o resultado já costurado
+    """
+    chunks = split_audio(audio)
+    # O pool mantém o número de workers configurado para ser reaproveitado entre áudios
+    workers = max(1, workers)
+    print(f"🧩 Áudio longo ({len(audio) / SAMPLE_RATE:.0f}s): {len(chunks)} trechos em {workers} processos")
+
+    executor = get_pool(workers, backend, model_size)
+    try:
+        futures = [(offset, executor.submit(transcribe_chunk, chunk, backend, model_size, language,
+                                            decode_options))
+                   for offset, chunk in chunks]
+        results = [(offset, future.result()) for offset, future in futures]
+    except BrokenProcessPool:
+        # Um worker morreu: o próximo áudio recria o pool
+        shutdown_pool()
+        raise
+
+    return stitch_results(results)
@@ -0,0 +1,108 @@
+"""
+Gravação de legendas em vários formatos em uma única passada
+Cada tempo é formatado uma vez (milissegundos inteiros) e a mesma legenda é
+escrita em SRT, VTT, ASS e/ou JSON com o tempo de cada palavra, conforme os
+formatos pedidos pelo job
+"""
+
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+SUBTITLE_FORMATS = ("srt", "vtt", "ass", "json")
+# Formatos gerados quando o job não escolhe
+DEFAULT_SUBTITLE_FORMATS = tuple(
+    f.strip().lower() for f in os.environ.get("SUBTITLE_FORMATS", "srt,vtt").split(",") if f.strip()
+)
+
+# Alterar quando o formato do JSON de palavras mudar
+WORD_TIMINGS_JSON_VERSION = 1
+
+def normalize_formats(formats: Optional[Iterable[str]]) -> List[str]:
+    """Formatos válidos pedidos, na ordem de SUBTITLE_FORMATS (padrão: DEFAULT_SUBTITLE_FORMATS)"""
+    if formats is None:
+        formats = DEFAULT_SUBTITLE_FORMATS
+    elif isinstance(formats, str):
+        formats = formats.split(",")
+    requested = {f.strip().lower() for f in formats if f and f.strip()}
+    return [f for f in SUBTITLE_FORMATS if f in requested]
+
+
+def split_timestamp(seconds: float):
+    """(horas, minutos, segundos, milissegundos) de um tempo em segundos"""
+    milliseconds = max(0, int(round(seconds * 1000)))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return hours, minutes, secs, milliseconds
+
+
+def caption_word_timings(captions_pairs) -> List[Dict]:
+    """Tempo das palavras dividindo cada legenda igualmente (quando o alinhamento não está disponível)"""
+    words = []
+    for (start, end), text in captions_pairs:
+        caption_words = text.split()
+        if not caption_words:
+            continue
+        duration = (end - start) / len(caption_words)
+        for i, word in enumerate(caption_words):
+            words.append({"word": word, "start": start + i * duration, "end": start + (i + 1) * duration})
+    return words
+
+
+def write_subtitles(captions_pairs, paths: Dict[str, str], word_timings: Optional[List[Dict]] = None) -> Dict[str, str]:
+    """
+    Grava cada formato de {formato: caminho} percorrendo as legendas uma única vez
+    word_timings (TTS ou alinhamento) vai para o JSON; sem ele, as palavras são
+    distribuídas dentro de cada legenda
+    """
+    paths = {fmt: path for fmt, path in paths.items() if fmt in SUBTITLE_FORMATS}
+    files = {fmt: open(path, "w", encoding="utf-8") for fmt, path in paths.items() if fmt != "json"}
+    json_captions = []
+
+    try:
+        if "vtt" in files:
+            files["vtt"].write("WEBVTT\n\n")
+        if "ass" in files:
+            # Mesmo estilo e formatação de tempo das legendas queimadas no vídeo
+            from utility.render.ass_captions import ASS_STYLE_NAME, ass_header, ass_text, ass_time
+            files["ass"].write(ass_header())
+
+        for index, ((start_time, end_time), text) in enumerate(captions_pairs, 1):
+            h1, m1, s1, ms1 = split_timestamp(start_time)
+            h2, m2, s2, ms2 = split_timestamp(end_time)
+
+            if "srt" in files:
+                files["srt"].write(f"{index}\n{h1:02d}:{m1:02d}:{s1:02d},{ms1:03d} --> "
+                                   f"{h2:02d}:{m2:02d}:{s2:02d},{ms2:03d}\n{text}\n\n")
+            if "vtt" in files:
+                files["vtt"].write(f"{h1:02d}:{m1:02d}:{s1:02d}.{ms1:03d} --> "
+                                   f"{h2:02d}:{m2:02d}:{s2:02d}.{ms2:03d}\n{text}\n\n")
+            if "ass" in files:
+                files["ass"].write(f"Dialogue: 0,{ass_time(start_time)},{ass_time(end_time)},{ASS_STYLE_NAME},,0,0,0,,"
+                                   f"{ass_text(text)}\n")
+            if "json" in paths:
+                json_captions.append([round(start_time, 3), round(end_time, 3), text])
+    finally:
+        for f in files.values():
+            f.close()
+
+    if "json" in paths:
+        words = word_timings if word_timings else caption_word_timings(captions_pairs)
+        data = {
+            "version": WORD_TIMINGS_JSON_VERSION,
+            # [início, fim, texto] em segundos, compacto para o player web
+            "captions": json_captions,
+            "words": [[round(w["start"], 3), round(w["end"], 3), w["word"]] for w in words if w["word"].strip()],
+        }
+        with open(paths["json"], "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+    return paths
+
+
+def write_subtitle_files(captions_pairs, base_path: str, formats: Optional[Iterable[str]] = None,
+                         word_timings: Optional[List[Dict]] = None) -> Dict[str, str]:
+    """Grava base_path.<formato> para cada formato pedido e retorna {formato: caminho}"""
+    paths = {fmt: f"{base_path}.{fmt}" for fmt in normalize_formats(formats)}
+    return write_subtitles(captions_pairs, paths, word_timings)
@@ -1,44 +1,181 @@
-import whisper
 import re
 import os
-from datetime import timedelta
-
-def generate_timed_captions(audio_filename, model_size="base"):
-    WHISPER_MODEL = whisper.load_model(model_size)
-    
-    # Forçar português e desabilitar detecção automática
-    result = WHISPER_MODEL.transcribe(
-        audio_filename, 
-        language="pt", 
-        task="transcribe",
-        verbose=False,
-        fp16=False,
-        # Configurações adicionais para melhor reconhecimento
-        condition_on_previous_text=False,
-        temperature=0.0,
-        compression_ratio_threshold=2.4,
-        logprob_threshold=-1.0,
-        no_speech_threshold=0.6
-    )
-    
-    return getCaptionsWithTime(result)
+import asyncio
+from bisect import bisect_left
+import whisper
+from utility.captions.transcribers import get_transcriber
+from utility.captions.subtitle_writer import write_subtitles, write_subtitle_files
+from utility.captions.transcription_cache import transcription_cache, captions_from_entry
+from utility.captions.long_audio import LONG_AUDIO_SECONDS, LONG_AUDIO_WORKERS, transcribe_long_audio
+from utility.cache.disk_cache import hash_key
+from utility.audio.pcm_buffer import audio_buffers
+
+def word_timings_to_analysis(word_timings):
+    """
+    Converte o tempo das palavras no formato da análise do Whisper (um segmento
+    por palavra), para guardar o alinhamento no cache de transcrições
+    """
+    segments = [
+        {'text': timing['word'], 'start': timing['start'], 'end': timing['end']}
+        for timing in word_timings if timing['word'].strip()
+    ]
+    return {
+        'text': ' '.join(segment['text'] for segment in segments),
+        'segments': segments
+    }
+
+# Opções de decodificação do Whisper (fazem parte da chave do cache de transcrições)
+WHISPER_LANGUAGE = "pt"
+WHISPER_DECODE_OPTIONS = {
+    "task": "transcribe",
+    # Configurações adicionais para melhor reconhecimento
+    "condition_on_previous_text": False,
+    "temperature": 0.0,
+    "compression_ratio_threshold": 2.4,
+    "logprob_threshold": -1.0,
+    "no_speech_threshold": 0.6
+}
+
+# Alterar quando getCaptionsWithTime ou captions_from_word_timings mudarem
+# (legendas em cache são recalculadas dos segmentos)
+CAPTION_ALIGNER_VERSION = 3
+
+# "auto": com o roteiro conhecido, alinhar o texto ao áudio em vez de transcrever; "off": sempre transcrever
+CAPTION_ALIGNMENT = os.environ.get("CAPTION_ALIGNMENT", "auto").lower()
+
+def align_script_captions(audio_filename, script_text, model_size="base", use_cache=True):
+    """
+    Legendas a partir do alinhamento forçado do roteiro (tempo real de cada palavra)
+    O resultado fica no cache de transcrições com a chave do roteiro
+    """
+    from utility.captions.forced_alignment import align_script
+    
+    cache_key = None
+    if use_cache:
+        try:
+            align_options = {"mode": "forced_alignment", "script": hash_key(script_text)}
+            cache_key = transcription_cache.key_for(audio_filename, model_size, WHISPER_LANGUAGE, align_options)
+            entry = transcription_cache.get(cache_key)
+            if entry:
+                print(f"💾 Alinhamento em cache: {os.path.basename(audio_filename)}")
+                if entry.get("aligner_version") == CAPTION_ALIGNER_VERSION:
+                    return captions_from_entry(entry)
+                # Um segmento por palavra: o tempo de cada palavra é recuperado exatamente
+                return captions_from_word_timings([
+                    {'word': segment['text'], 'start': segment['start'], 'end': segment['end']}
+                    for segment in entry['segments']
+                ])
+        except Exception as e:
+            print(f"⚠️ Erro ao consultar cache de transcrições: {e}")
+            cache_key = None
+    
+    word_timings = align_script(audio_filename, script_text, model_size, WHISPER_LANGUAGE)
+    print(f"🎯 Roteiro alinhado ao áudio ({len(word_timings)} palavras)")
+    analysis = word_timings_to_analysis(word_timings)
+    captions_pairs = captions_from_word_timings(word_timings)
+    
+    if cache_key:
+        try:
+            transcription_cache.put(cache_key, analysis, captions_pairs, CAPTION_ALIGNER_VERSION)
+        except Exception as e:
+            print(f"⚠️ Erro ao salvar alinhamento no cache: {e}")
+    
+    return captions_pairs
+
+def generate_timed_captions(audio_filename, model_size="base", word_timings=None, use_cache=True, script_text=None,
+                            asr_backend=None):
+    # Alinhamento do próprio TTS dispensa a transcrição com Whisper
+    if word_timings:
+        print(f"⏱️ Usando alinhamento do TTS ({len(word_timings)} palavras) - Whisper não é necessário")
+        return captions_from_word_timings(word_timings)
+    
+    # Texto falado conhecido: alinhar o roteiro (uma passada do decoder) em vez de transcrever
+    if script_text and script_text.strip() and CAPTION_ALIGNMENT != "off":
+        try:
+            return align_script_captions(audio_filename, script_text, model_size, use_cache)
+        except Exception as e:
+            print(f"⚠️ Erro no alinhamento do roteiro, transcrevendo com Whisper: {e}")
+    
+    # Backend de transcrição do job (ou o configurado no servidor)
+    transcriber = get_transcriber(asr_backend)
+    
+    # Mesmo áudio, modelo, backend e opções já transcritos: reaproveitar do disco
+    cache_key = None
+    if use_cache:
+        try:
+            cache_key = transcription_cache.key_for(audio_filename, model_size, WHISPER_LANGUAGE,
+                                                    transcriber.cache_options(WHISPER_DECODE_OPTIONS))
+            entry = transcription_cache.get(cache_key)
+            if entry:
+                print(f"💾 Transcrição em cache: {os.path.basename(audio_filename)}")
+                if entry.get("aligner_version") == CAPTION_ALIGNER_VERSION:
+                    return captions_from_entry(entry)
+                return getCaptionsWithTime(entry)
+        except Exception as e:
+            print(f"⚠️ Erro ao consultar cache de transcrições: {e}")
+            cache_key = None
+    
+    # Amostras do buffer compartilhado (decodificado uma vez); áudios longos são transcritos em trechos paralelos
+    try:
+        audio = audio_buffers.get(audio_filename).whisper_samples()
+    except Exception as e:
+        print(f"⚠️ Buffer de áudio indisponível, decodificando com Whisper: {e}")
+        audio = whisper.load_audio(audio_filename)
+    if LONG_AUDIO_WORKERS > 1 and len(audio) / whisper.audio.SAMPLE_RATE >= LONG_AUDIO_SECONDS:
+        result = transcribe_long_audio(audio, model_size, WHISPER_LANGUAGE, WHISPER_DECODE_OPTIONS,
+                                       backend=transcriber.name)
+    else:
+        # Forçar português e desabilitar detecção automática
+        print(f"🗣️ Transcrevendo com backend '{transcriber.name}' (modelo {model_size})")
+        result = transcriber.transcribe(audio, model_size, WHISPER_LANGUAGE, WHISPER_DECODE_OPTIONS)
+    
+    captions_pairs = getCaptionsWithTime(result)
+    
+    if cache_key:
+        try:
+            transcription_cache.put(cache_key, result, captions_pairs, CAPTION_ALIGNER_VERSION)
+        except Exception as e:
+            print(f"⚠️ Erro ao salvar transcrição no cache: {e}")
+    
+    return captions_pairs
+
+async def generate_timed_captions_streaming(audio_chunks, model_size="base", use_cache=True, asr_backend=None):
+    """
+    Legendas de um áudio entregue por trechos (generate_audio_stream)
+    Cada trecho é legendado assim que chega (alinhamento do TTS, do roteiro ou
+    transcrição, em uma thread) enquanto os próximos ainda são sintetizados, e
+    as legendas são deslocadas pelo início do trecho no áudio final
+    Retorna (captions_pairs, word_timings ou None)
+    """
+    captions_pairs = []
+    word_timings = []
+    complete_timings = True
+    async for chunk in audio_chunks:
+        if chunk.get("restart"):
+            # O TTS recomeçou o stream com outro provedor: a linha do tempo é refeita
+            print(f"🔄 Stream de áudio reiniciado com {chunk.get('provider')} - descartando legendas parciais")
+            captions_pairs = []
+            word_timings = []
+            complete_timings = True
+            continue
+        offset = chunk["offset"]
+        chunk_captions = await asyncio.to_thread(generate_timed_captions, chunk["path"], model_size,
+                                                 chunk["word_timings"], use_cache, chunk["text"], asr_backend)
+        captions_pairs.extend(((start + offset, end + offset), text) for (start, end), text in chunk_captions)
+        if chunk["word_timings"]:
+            word_timings.extend(dict(w, start=w["start"] + offset, end=w["end"] + offset)
+                                for w in chunk["word_timings"])
+        else:
+            complete_timings = False
+        print(f"📝 Trecho {chunk['index'] + 1} legendado ({len(chunk_captions)} legendas)")
+    return captions_pairs, (word_timings if complete_timings and word_timings else None)
 
 def generate_srt_file(captions_pairs, output_filename):
     """
     Gera arquivo SRT a partir das legendas cronometradas
     """
     try:
-        with open(output_filename, 'w', encoding='utf-8') as f:
-            for i, ((start_time, end_time), text) in enumerate(captions_pairs, 1):
-                # Converter segundos para formato SRT (HH:MM:SS,mmm)
-                start_str = str(timedelta(seconds=int(start_time))) + f",{int((start_time % 1) * 1000):03d}"
-                end_str = str(timedelta(seconds=int(end_time))) + f",{int((end_time % 1) * 1000):03d}"
-                
-                # Formatar linha SRT
-                f.write(f"{i}\n")
-                f.write(f"{start_str} --> {end_str}\n")
-                f.write(f"{text}\n\n")
-        
+        write_subtitles(captions_pairs, {"srt": output_filename})
         print(f"✅ Arquivo SRT gerado: {output_filename}")
         return True
     except Exception as e:
@@ -50,67 +187,97 @@ def generate_vtt_file(captions_pairs, output_filename):
     Gera arquivo VTT a partir das legendas cronometradas
     """
     try:
-        with open(output_filename, 'w', encoding='utf-8') as f:
-            # Cabeçalho VTT
-            f.write("WEBVTT\n\n")
-            
-            for i, ((start_time, end_time), text) in enumerate(captions_pairs, 1):
-                # Converter segundos para formato VTT (HH:MM:SS.mmm)
-                start_str = str(timedelta(seconds=int(start_time))) + f".{int((start_time % 1) * 1000):03d}"
-                end_str = str(timedelta(seconds=int(end_time))) + f".{int((end_time % 1) * 1000):03d}"
-                
-                # Formatar linha VTT
-                f.write(f"{start_str} --> {end_str}\n")
-                f.write(f"{text}\n\n")
-        
+        write_subtitles(captions_pairs, {"vtt": output_filename})
         print(f"✅ Arquivo VTT gerado: {output_filename}")
         return True
     except Exception as e:
         print(f"❌ Erro ao gerar VTT: {e}")
         return False
 
-def generate_subtitle_files(audio_filename, output_dir="."):
+def generate_subtitle_files(audio_filename, output_dir=".", word_timings=None, script_text=None, asr_backend=None,
+                            formats=None, captions_pairs=None):
     """
-    Gera legendas cronometradas e arquivos SRT/VTT
+    Gera legendas cronometradas e os arquivos de legenda pedidos (SRT, VTT, ASS, JSON)
+    word_timings (retornado por generate_audio) evita rodar o Whisper
+    script_text (texto narrado) permite alinhar o roteiro em vez de transcrever
+    asr_backend escolhe o backend de transcrição (padrão: ASR_BACKEND)
+    formats escolhe os formatos (padrão: SUBTITLE_FORMATS)
+    captions_pairs já calculadas (modo streaming) são só gravadas
     """
     # Gerar legendas cronometradas
-    captions_pairs = generate_timed_captions(audio_filename)
+    if captions_pairs is None:
+        captions_pairs = generate_timed_captions(audio_filename, word_timings=word_timings, script_text=script_text,
+                                                 asr_backend=asr_backend)
     
     # Nome base do arquivo
     base_name = os.path.splitext(os.path.basename(audio_filename))[0]
     
-    # Gerar arquivos SRT e VTT
-    srt_filename = os.path.join(output_dir, f"{base_name}.srt")
-    vtt_filename = os.path.join(output_dir, f"{base_name}.vtt")
-    
-    generate_srt_file(captions_pairs, srt_filename)
-    generate_vtt_file(captions_pairs, vtt_filename)
+    # Todos os formatos em uma única passada pelas legendas
+    files = {}
+    try:
+        files = write_subtitle_files(captions_pairs, os.path.join(output_dir, base_name), formats, word_timings)
+        print(f"✅ Legendas gravadas: {', '.join(files.values())}")
+    except Exception as e:
+        print(f"❌ Erro ao gravar legendas: {e}")
     
     return {
         'captions_pairs': captions_pairs,
-        'srt_file': srt_filename,
-        'vtt_file': vtt_filename
+        'files': files,
+        'srt_file': files.get('srt'),
+        'vtt_file': files.get('vtt'),
+        'ass_file': files.get('ass'),
+        'json_file': files.get('json')
     }
 
-def splitWordsBySize(words, maxCaptionSize):
-   
+def groupWordsBySize(words, maxCaptionSize):
+    """
+    Intervalos (início, fim) das palavras de cada legenda
+    Junta palavras até maxCaptionSize caracteres e fecha a legenda ao passar da metade
+    """
     halfCaptionSize = maxCaptionSize / 2
-    captions = []
-    while words:
-        caption = words[0]
-        words = words[1:]
-        while words and len(caption + ' ' + words[0]) <= maxCaptionSize:
-            caption += ' ' + words[0]
-            words = words[1:]
-            if len(caption) >= halfCaptionSize and words:
+    groups = []
+    # Percorre a lista por índice (sem recriar a lista a cada palavra)
+    i = 0
+    total = len(words)
+    while i < total:
+        start = i
+        size = len(words[i])
+        i += 1
+        while i < total and size + 1 + len(words[i]) <= maxCaptionSize:
+            size += 1 + len(words[i])
+            i += 1
+            if size >= halfCaptionSize and i < total:
                 break
-        captions.append(caption)
-    return captions
+        groups.append((start, i))
+    return groups
 
-def getTimestampMapping(whisper_analysis):
+def splitWordsBySize(words, maxCaptionSize):
    
+    return [' '.join(words[start:end]) for start, end in groupWordsBySize(words, maxCaptionSize)]
+
+def captions_from_word_timings(word_timings, maxCaptionSize=15):
+    """
+    Legendas a partir do tempo exato de cada palavra (TTS ou alinhamento do roteiro)
+    Cada legenda vai do início da sua primeira palavra ao fim da última, sem
+    passar pela busca por posição de caractere usada na saída livre do Whisper
+    """
+    timings = [timing for timing in word_timings if timing['word'].strip()]
+    words = [timing['word'].strip() for timing in timings]
+    CaptionsPairs = []
+    for start, end in groupWordsBySize(words, maxCaptionSize):
+        caption = cleanWord(' '.join(words[start:end]))
+        if caption.strip():
+            CaptionsPairs.append(((timings[start]['start'], timings[end - 1]['end']), caption))
+    return CaptionsPairs
+
+def getTimestampMapping(whisper_analysis):
+    """
+    Mapeia a posição de cada palavra no texto para o tempo em que ela termina
+    Retorna (fins, tempos): fins em ordem crescente, um par por palavra
+    """
     index = 0
-    locationToTimestamp = {}
+    wordEnds = []
+    wordTimes = []
     for segment in whisper_analysis['segments']:
         # Para Whisper padrão, usamos o segmento completo
         text = segment['text']
@@ -122,25 +289,28 @@ def getTimestampMapping(whisper_analysis):
         word_duration = (end_time - start_time) / len(words) if words else 0
         
         for i, word in enumerate(words):
-            word_start = start_time + (i * word_duration)
             word_end = start_time + ((i + 1) * word_duration)
             
-            newIndex = index + len(word) + 1
-            locationToTimestamp[(index, newIndex)] = word_end
-            index = newIndex
+            index += len(word) + 1
+            wordEnds.append(index)
+            wordTimes.append(word_end)
     
-    return locationToTimestamp
+    return wordEnds, wordTimes
 
 def cleanWord(word):
    
     return re.sub(r'[^\w\s\-_"\'\']', '', word)
 
-def interpolateTimeFromDict(word_position, d):
-   
-    for key, value in d.items():
-        if key[0] <= word_position <= key[1]:
-            return value
-    return None
+def interpolateTimeFromMapping(word_position, mapping):
+    """
+    Tempo da palavra que contém word_position (busca binária nos fins)
+    Na fronteira entre duas palavras vale a primeira
+    """
+    wordEnds, wordTimes = mapping
+    i = bisect_left(wordEnds, word_position)
+    if word_position < 0 or i >= len(wordEnds):
+        return None
+    return wordTimes[i]
 
 def getCaptionsWithTime(whisper_analysis, maxCaptionSize=15, considerPunctuation=False):
     """
@@ -164,7 +334,7 @@ def getCaptionsWithTime(whisper_analysis, maxCaptionSize=15, considerPunctuation
     
     for word in words:
         position += len(word) + 1
-        end_time = interpolateTimeFromDict(position, wordLocationToTime)
+        end_time = interpolateTimeFromMapping(position, wordLocationToTime)
         
         if end_time and word:
             # Verificar se há pausa muito longa (mais de 1 segundo)
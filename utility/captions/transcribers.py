@@ -0,0 +1,159 @@
+"""
+Backends de transcrição (ASR)
+generate_timed_captions transcreve através desta interface, e o backend é
+escolhido por job ou pela configuração do servidor (ASR_BACKEND):
+- "whisper": openai-whisper via registro de modelos (float32 na CPU, fp16 na GPU)
+- "ctranslate2": faster-whisper/CTranslate2 com pesos quantizados em int8,
+  várias vezes mais rápido na CPU
+Todos devolvem o resultado no formato do Whisper ({"text", "segments", "language"})
+"""
+
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+ASR_BACKEND = os.environ.get("ASR_BACKEND", "whisper").lower()
+# Tipo de computação do CTranslate2 (int8 na CPU, int8_float16 ou float16 na GPU)
+ASR_COMPUTE_TYPE = os.environ.get("ASR_COMPUTE_TYPE", "int8")
+# Threads do CTranslate2 por modelo (0 = as mesmas do torch no processo)
+ASR_CPU_THREADS = int(os.environ.get("ASR_CPU_THREADS", "0"))
+
+
+class Transcriber:
+    """Interface comum dos backends de transcrição"""
+
+    name = "base"
+
+    def available(self) -> bool:
+        return True
+
+    def cache_options(self, decode_options: Dict) -> Dict:
+        """Opções que entram na chave do cache de transcrições"""
+        return decode_options
+
+    def transcribe(self, audio: np.ndarray, model_size: str, language: str, decode_options: Dict) -> Dict:
+        raise NotImplementedError
+
+    def warmup(self, model_size: str):
+        silence = np.zeros(16000, dtype=np.float32)
+        self.transcribe(silence, model_size, "pt", {})
+
+
+class WhisperTranscriber(Transcriber):
+    """openai-whisper com os modelos compartilhados do registro"""
+
+    name = "whisper"
+
+    def transcribe(self, audio: np.ndarray, model_size: str, language: str, decode_options: Dict) -> Dict:
+        from utility.captions.whisper_model_registry import whisper_model_registry
+
+        with whisper_model_registry.use_model(model_size) as entry:
+            return entry.model.transcribe(audio, language=language, verbose=None, fp16=entry.fp16, **decode_options)
+
+    def warmup(self, model_size: str):
+        from utility.captions.whisper_model_registry import whisper_model_registry
+
+        whisper_model_registry.warmup([model_size])
+
+
+class CTranslate2Transcriber(Transcriber):
+    """faster-whisper (CTranslate2) com pesos quantizados"""
+
+    name = "ctranslate2"
+
+    # Nomes das opções do openai-whisper no faster-whisper
+    OPTION_NAMES = {
+        "logprob_threshold": "log_prob_threshold",
+    }
+    SUPPORTED_OPTIONS = {
+        "task", "beam_size", "best_of", "patience", "temperature", "compression_ratio_threshold",
+        "log_prob_threshold", "no_speech_threshold", "condition_on_previous_text", "initial_prompt",
+        "word_timestamps", "vad_filter",
+    }
+
+    def __init__(self, compute_type: str = ASR_COMPUTE_TYPE, cpu_threads: int = ASR_CPU_THREADS):
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self._models: Dict[Tuple[str, str], object] = {}
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        try:
+            import faster_whisper  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def cache_options(self, decode_options: Dict) -> Dict:
+        return dict(decode_options, backend=self.name, compute_type=self.compute_type)
+
+    def get_model(self, model_size: str):
+        """Carrega cada (modelo, tipo de computação) uma única vez por processo"""
+        from faster_whisper import WhisperModel
+
+        key = (model_size, self.compute_type)
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                device = os.environ.get("WHISPER_DEVICE", "cpu")
+                cpu_threads = self.cpu_threads
+                if cpu_threads <= 0:
+                    import torch
+                    cpu_threads = torch.get_num_threads()
+                print(f"🧠 Carregando modelo CTranslate2 '{model_size}' ({device}, {self.compute_type})...")
+                model = WhisperModel(model_size, device=device, compute_type=self.compute_type,
+                                     cpu_threads=cpu_threads)
+                self._models[key] = model
+            return model
+
+    def translate_options(self, decode_options: Dict) -> Dict:
+        options = {}
+        for name, value in decode_options.items():
+            name = self.OPTION_NAMES.get(name, name)
+            if name in self.SUPPORTED_OPTIONS:
+                options[name] = value
+        return options
+
+    def transcribe(self, audio: np.ndarray, model_size: str, language: str, decode_options: Dict) -> Dict:
+        model = self.get_model(model_size)
+        segments, info = model.transcribe(audio, language=language, **self.translate_options(decode_options))
+
+        result_segments = []
+        for segment in segments:
+            converted = {"id": len(result_segments), "start": segment.start, "end": segment.end, "text": segment.text}
+            if segment.words:
+                converted["words"] = [
+                    {"word": word.word, "start": word.start, "end": word.end, "probability": word.probability}
+                    for word in segment.words
+                ]
+            result_segments.append(converted)
+        return {
+            "text": "".join(segment["text"] for segment in result_segments),
+            "segments": result_segments,
+            "language": info.language,
+        }
+
+
+# Backends registrados (uma instância por processo, com seus próprios modelos)
+TRANSCRIBERS: Dict[str, Transcriber] = {
+    WhisperTranscriber.name: WhisperTranscriber(),
+    CTranslate2Transcriber.name: CTranslate2Transcriber(),
+}
+
+
+def get_transcriber(name: Optional[str] = None) -> Transcriber:
+    """
+    Backend pelo nome (padrão: ASR_BACKEND)
+    Backend desconhecido ou sem dependência instalada volta para o Whisper
+    """
+    name = (name or ASR_BACKEND).lower()
+    transcriber = TRANSCRIBERS.get(name)
+    if transcriber is None:
+        print(f"⚠️ Backend de transcrição desconhecido '{name}', usando Whisper")
+        return TRANSCRIBERS[WhisperTranscriber.name]
+    if not transcriber.available():
+        print(f"⚠️ Backend de transcrição '{name}' indisponível (dependência não instalada), usando Whisper")
+        return TRANSCRIBERS[WhisperTranscriber.name]
+    return transcriber
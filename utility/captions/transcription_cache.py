@@ -0,0 +1,82 @@
+"""
+Cache persistente de transcrições do Whisper
+Guarda os segmentos brutos e as legendas derivadas em disco, pela chave
+(SHA-256 do áudio, modelo, idioma, opções de decodificação), para que
+re-renderizações e novas tentativas não transcrevam o mesmo áudio de novo
+"""
+
+import json
+import os
+from typing import Dict, List, Optional
+
+from utility.cache.disk_cache import DiskCache, hash_file, hash_key
+
+TRANSCRIPTION_CACHE_DIR = os.environ.get("TRANSCRIPTION_CACHE_DIR", ".cache/transcriptions")
+TRANSCRIPTION_CACHE_MAX_MB = int(os.environ.get("TRANSCRIPTION_CACHE_MAX_MB", "256"))
+
+# Alterar quando o formato salvo mudar (invalida o cache)
+TRANSCRIPTION_CACHE_VERSION = 1
+
+# Campos dos segmentos do Whisper que as legendas usam
+SEGMENT_FIELDS = ("start", "end", "text", "words")
+
+
+class TranscriptionCache:
+    """Transcrições em JSON, com despejo LRU limitado por bytes"""
+
+    def __init__(self, root: str = TRANSCRIPTION_CACHE_DIR, max_mb: int = TRANSCRIPTION_CACHE_MAX_MB):
+        self.cache = DiskCache(root, max_mb * 1024 * 1024)
+        self.cache.clear_stale_temp_files()
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, audio_path: str, model_size: str, language: str, decode_options: Dict) -> str:
+        return hash_key("transcription", TRANSCRIPTION_CACHE_VERSION, hash_file(audio_path), model_size, language,
+                        json.dumps(decode_options, sort_keys=True))
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Entrada salva ({"text", "segments", "captions_pairs", "aligner_version"}) ou None"""
+        path = self.cache.get(key, ".json")
+        if not path:
+            self.misses += 1
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Transcrição em cache ilegível, transcrevendo de novo: {e}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, whisper_result: Dict, captions_pairs: List, aligner_version: int) -> str:
+        """Salva os segmentos brutos e as legendas derivadas"""
+        entry = {
+            "text": whisper_result.get("text", ""),
+            "language": whisper_result.get("language"),
+            "segments": [
+                {field: segment[field] for field in SEGMENT_FIELDS if field in segment}
+                for segment in whisper_result.get("segments", [])
+            ],
+            "captions_pairs": [[[start, end], text] for (start, end), text in captions_pairs],
+            "aligner_version": aligner_version,
+        }
+        with self.cache.key_lock(key):
+            temp_path = self.cache.temp_path(key, ".json")
+            try:
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(entry, f, ensure_ascii=False)
+            except Exception:
+                self.cache.discard(temp_path)
+                raise
+            return self.cache.commit(temp_path, key, ".json")
+
+
+def captions_from_entry(entry: Dict) -> List:
+    """Converte as legendas salvas em JSON de volta para [((início, fim), texto)]"""
+    return [((start, end), text) for (start, end), text in entry["captions_pairs"]]
+
+
+# Instância global do cache de transcrições
+transcription_cache = TranscriptionCache()
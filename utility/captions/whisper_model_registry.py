@@ -0,0 +1,157 @@
+"""
+Registro de modelos Whisper compartilhado pelo processo
+Carrega cada combinação (modelo, dispositivo, dtype) uma única vez e
+mantém os modelos em um LRU limitado por memória, seguro entre threads
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+import whisper
+
+# Orçamento de memória para pesos carregados (MB) e número máximo de modelos
+WHISPER_MODEL_MEMORY_MB = int(os.environ.get("WHISPER_MODEL_MEMORY_MB", "3072"))
+WHISPER_MAX_MODELS = int(os.environ.get("WHISPER_MAX_MODELS", "2"))
+
+
+class LoadedWhisperModel:
+    """Modelo carregado e seus metadados no registro"""
+
+    def __init__(self, key: Tuple[str, str, str], model, size_bytes: int):
+        self.key = key
+        self.model = model
+        self.size_bytes = size_bytes
+        self.fp16 = key[2] == "float16"
+        # O decoder do Whisper instala hooks de kv-cache no próprio modelo durante
+        # a transcrição, então duas threads não podem decodificar no mesmo modelo
+        self.inference_lock = threading.Lock()
+        self.users = 0
+
+
+class WhisperModelRegistry:
+    """LRU de modelos Whisper com orçamento de memória"""
+
+    def __init__(self, memory_budget_mb: int = WHISPER_MODEL_MEMORY_MB, max_models: int = WHISPER_MAX_MODELS):
+        self.memory_budget_bytes = memory_budget_mb * 1024 * 1024
+        self.max_models = max(1, max_models)
+        self._models: "OrderedDict[Tuple[str, str, str], LoadedWhisperModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+        self.loads = 0
+        self.hits = 0
+
+    def resolve_key(self, model_size: str, device: Optional[str] = None, dtype: Optional[str] = None) -> Tuple[str, str, str]:
+        """Normaliza a chave (modelo, dispositivo, dtype) usando os padrões do ambiente"""
+        if device is None:
+            device = os.environ.get("WHISPER_DEVICE")
+        if device is None:
+            import torch
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        if dtype is None:
+            # fp16 só compensa em GPU; na CPU o Whisper roda em float32
+            dtype = "float16" if device.startswith("cuda") else "float32"
+        return (model_size, device, dtype)
+
+    def _load(self, key: Tuple[str, str, str]) -> LoadedWhisperModel:
+        model_size, device, dtype = key
+        print(f"🧠 Carregando modelo Whisper '{model_size}' ({device}, {dtype})...")
+        model = whisper.load_model(model_size, device=device)
+        if dtype == "float16":
+            model = model.half()
+        model.eval()
+        size_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+        self.loads += 1
+        print(f"✅ Modelo Whisper '{model_size}' carregado ({size_bytes / 1024 / 1024:.0f} MB)")
+        return LoadedWhisperModel(key, model, size_bytes)
+
+    def _evict_if_needed(self, keep: Tuple[str, str, str]):
+        """Remove modelos menos usados até caber no orçamento (chamado com _lock)"""
+        def over_budget():
+            total = sum(entry.size_bytes for entry in self._models.values())
+            return total > self.memory_budget_bytes or len(self._models) > self.max_models
+
+        for key in list(self._models.keys()):
+            if not over_budget():
+                break
+            entry = self._models[key]
+            if key == keep or entry.users > 0:
+                continue
+            del self._models[key]
+            print(f"♻️ Modelo Whisper removido do cache: {key[0]} ({key[1]}, {key[2]})")
+            if key[1].startswith("cuda"):
+                import torch
+                torch.cuda.empty_cache()
+
+    def get(self, model_size: str = "base", device: Optional[str] = None, dtype: Optional[str] = None) -> LoadedWhisperModel:
+        """Obtém o modelo carregado, carregando-o no máximo uma vez por processo"""
+        key = self.resolve_key(model_size, device, dtype)
+
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return entry
+            loading_lock = self._loading_locks.setdefault(key, threading.Lock())
+
+        # Apenas uma thread carrega cada chave; as demais esperam pelo resultado
+        with loading_lock:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    self._models.move_to_end(key)
+                    self.hits += 1
+                    return entry
+
+            entry = self._load(key)
+
+            with self._lock:
+                self._models[key] = entry
+                self._evict_if_needed(keep=key)
+            return entry
+
+    @contextmanager
+    def use_model(self, model_size: str = "base", device: Optional[str] = None, dtype: Optional[str] = None):
+        """Empresta o modelo com uso exclusivo durante a inferência"""
+        entry = self.get(model_size, device, dtype)
+        with self._lock:
+            entry.users += 1
+        try:
+            with entry.inference_lock:
+                yield entry
+        finally:
+            with self._lock:
+                entry.users -= 1
+
+    def warmup(self, model_sizes: Iterable[str] = ("base",), device: Optional[str] = None, dtype: Optional[str] = None):
+        """Carrega os modelos e executa uma decodificação curta para aquecer os kernels"""
+        import numpy as np
+
+        for model_size in model_sizes:
+            try:
+                with self.use_model(model_size, device, dtype) as entry:
+                    silence = np.zeros(whisper.audio.SAMPLE_RATE, dtype=np.float32)
+                    entry.model.transcribe(silence, language="pt", fp16=entry.fp16, verbose=None)
+                print(f"🔥 Modelo Whisper '{model_size}' aquecido")
+            except Exception as e:
+                print(f"⚠️ Erro ao aquecer modelo Whisper '{model_size}': {e}")
+
+    def stats(self) -> Dict:
+        """Estatísticas do registro (modelos carregados, cargas e acertos)"""
+        with self._lock:
+            return {
+                "models": [
+                    {"model": key[0], "device": key[1], "dtype": key[2], "size_mb": round(entry.size_bytes / 1024 / 1024, 1)}
+                    for key, entry in self._models.items()
+                ],
+                "loads": self.loads,
+                "hits": self.hits,
+                "memory_budget_mb": self.memory_budget_bytes // (1024 * 1024)
+            }
+
+
+# Instância global do registro de modelos
+whisper_model_registry = WhisperModelRegistry()
@@ -0,0 +1,142 @@
+"""
+Legendas palavra por palavra em Advanced SubStation Alpha (ASS)
+Gera um arquivo .ass com o tempo, a cor, a fonte, o contorno e os fades das
+legendas, para o libass queimar tudo em um único filtro do ffmpeg em vez de
+centenas de camadas no compositor
+"""
+
+import os
+import subprocess
+from functools import lru_cache
+from typing import Optional
+
+from PIL import ImageColor
+
+from utility.render.mezzanine import MEZZANINE_HEIGHT, MEZZANINE_WIDTH, get_ffmpeg_binary
+
+ASS_STYLE_NAME = "Caption"
+
+
+def ass_color(color: str) -> str:
+    """Converte uma cor ('#RRGGBB' ou nome) para o formato &HBBGGRR& do ASS"""
+    r, g, b = ImageColor.getrgb(color)[:3]
+    return f"&H{b:02X}{g:02X}{r:02X}&"
+
+
+def ass_time(t: float) -> str:
+    """Tempo em segundos no formato H:MM:SS.cc"""
+    centiseconds = max(0, int(round(t * 100)))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    seconds, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{seconds:02d}.{centiseconds:02d}"
+
+
+def ass_text(text: str) -> str:
+    """Remove caracteres que o ASS interpreta como tags ou quebras"""
+    return text.replace("\\", "").replace("{", "").replace("}", "").replace("\n", " ")
+
+
+def caption_font_name(font: str) -> str:
+    """Nome da família da fonte que o rasterizador usaria (o libass procura pelo nome)"""
+    try:
+        from utility.render.caption_rasterizer import load_font
+        return load_font(font, 12).getname()[0] or font
+    except Exception:
+        return font
+
+
+def ass_header(size=(MEZZANINE_WIDTH, MEZZANINE_HEIGHT)) -> str:
+    """
+    Cabeçalho do arquivo ASS com o estilo das legendas queimadas no vídeo
+    (também usado pelo .ass exportado, para os dois ficarem iguais)
+    """
+    from utility.render.render_engine import CAPTION_FONT, CAPTION_FONTSIZE, CAPTION_STROKE_COLOR, CAPTION_STROKE_WIDTH
+
+    width, height = size
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "WrapStyle: 2",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, "
+        "Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, "
+        "MarginL, MarginR, MarginV, Encoding",
+        f"Style: {ASS_STYLE_NAME},{caption_font_name(CAPTION_FONT)},{CAPTION_FONTSIZE},{ass_color('white')},"
+        f"{ass_color('white')},{ass_color(CAPTION_STROKE_COLOR)},{ass_color('black')},0,0,0,0,100,100,0,0,1,"
+        f"{CAPTION_STROKE_WIDTH},0,5,0,0,0,1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def build_ass_captions(filtered_captions, template_id: Optional[str] = None, offset: float = 0.0,
+                       duration: Optional[float] = None, size=(MEZZANINE_WIDTH, MEZZANINE_HEIGHT)) -> str:
+    """
+    Monta o conteúdo do arquivo ASS a partir das legendas filtradas
+    offset/duration recortam um trecho da linha do tempo (renderização paralela)
+    """
+    from utility.render.render_engine import CAPTION_FADE, plan_caption_words
+
+    width, height = size
+    lines = ass_header(size).splitlines()
+
+    fade_ms = int(CAPTION_FADE * 1000)
+    end_limit = offset + duration if duration is not None else None
+    for (t1, t2), processed_text in filtered_captions:
+        for txt, word_start, word_end, word_color in plan_caption_words(processed_text, t1, t2, template_id):
+            if word_end <= offset or (end_limit is not None and word_start >= end_limit):
+                continue
+
+            # Palavra que começou no trecho anterior entra sem repetir o fade-in
+            fade_in = fade_ms if word_start >= offset else 0
+            start = max(word_start, offset) - offset
+            end = word_end - offset
+
+            # \pos fixa a palavra no centro e desliga o empilhamento de eventos sobrepostos
+            tags = f"{{\\an5\\pos({width // 2},{height // 2})\\fad({fade_in},{fade_ms})\\c{ass_color(word_color)}}}"
+            lines.append(f"Dialogue: 0,{ass_time(start)},{ass_time(end)},{ASS_STYLE_NAME},,0,0,0,,{tags}{ass_text(txt)}")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_ass_captions(filtered_captions, path: str, template_id: Optional[str] = None, offset: float = 0.0,
+                       duration: Optional[float] = None) -> str:
+    """Grava o arquivo ASS das legendas e retorna o caminho"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(build_ass_captions(filtered_captions, template_id, offset, duration))
+    return path
+
+
+def escape_filter_path(path: str) -> str:
+    """Escapa um caminho para uso como valor de opção dentro do filter graph"""
+    path = os.path.abspath(path).replace("\\", "/")
+    return path.replace(":", "\\:").replace("'", "\\'")
+
+
+def ass_filter(path: str) -> str:
+    """Filtro do ffmpeg que queima o arquivo ASS com o libass"""
+    from utility.render.caption_rasterizer import find_font_file
+    from utility.render.render_engine import CAPTION_FONT
+
+    options = f"ass=filename='{escape_filter_path(path)}'"
+    font_file = find_font_file(CAPTION_FONT)
+    if font_file:
+        options += f":fontsdir='{escape_filter_path(os.path.dirname(font_file))}'"
+    return options
+
+
+@lru_cache(maxsize=1)
+def libass_available() -> bool:
+    """Verifica se o ffmpeg foi compilado com o filtro ass (libass)"""
+    try:
+        result = subprocess.run([get_ffmpeg_binary(), "-hide_banner", "-filters"], capture_output=True, timeout=30)
+    except Exception:
+        return False
+    return any(line.split()[1:2] == ["ass"] for line in result.stdout.decode(errors="ignore").splitlines())
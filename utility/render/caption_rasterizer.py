@@ -0,0 +1,104 @@
+"""
+Rasterizador de legendas em processo (Pillow/FreeType)
+Gera bitmaps RGBA das palavras sem abrir subprocessos do ImageMagick
+e mantém um cache LRU para palavras repetidas
+"""
+
+import os
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+# Quantidade de palavras renderizadas mantidas em memória por processo
+CAPTION_BITMAP_CACHE_SIZE = int(os.environ.get("CAPTION_BITMAP_CACHE_SIZE", "2048"))
+
+# Locais comuns da fonte Impact (Windows, msttcorefonts no Linux, macOS)
+FONT_SEARCH_PATHS = {
+    "impact": [
+        "impact.ttf",
+        "C:/Windows/Fonts/impact.ttf",
+        "/usr/share/fonts/truetype/msttcorefonts/Impact.ttf",
+        "/usr/share/fonts/truetype/msttcorefonts/impact.ttf",
+        "/usr/share/fonts/TTF/impact.ttf",
+        "/Library/Fonts/Impact.ttf",
+        "/System/Library/Fonts/Supplemental/Impact.ttf",
+    ]
+}
+
+# Fontes usadas quando a fonte pedida não está instalada
+FALLBACK_FONTS = [
+    "DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "LiberationSans-Bold.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+]
+
+
+@lru_cache(maxsize=32)
+def load_font(font: str, fontsize: int) -> ImageFont.ImageFont:
+    """Carrega a fonte pelo nome ou caminho, com fallback para fontes comuns"""
+    candidates = [font]
+    candidates.extend(FONT_SEARCH_PATHS.get(font.lower(), [f"{font}.ttf"]))
+    candidates.extend(FALLBACK_FONTS)
+
+    for candidate in candidates:
+        try:
+            return ImageFont.truetype(candidate, fontsize)
+        except (OSError, ValueError):
+            continue
+
+    print(f"⚠️ Fonte '{font}' não encontrada, usando fonte padrão do Pillow")
+    return ImageFont.load_default(size=fontsize)
+
+
+def find_font_file(font: str) -> Optional[str]:
+    """Caminho do arquivo da fonte resolvida por load_font (para ffmpeg/libass)"""
+    path = getattr(load_font(font, 12), "path", None)
+    return os.path.abspath(path) if isinstance(path, str) and os.path.exists(path) else None
+
+
+@lru_cache(maxsize=CAPTION_BITMAP_CACHE_SIZE)
+def render_text_bitmap(text: str, font: str = "Impact", fontsize: int = 90, color: str = "white",
+                       stroke_color: Optional[str] = "black", stroke_width: int = 1) -> np.ndarray:
+    """
+    Renderiza o texto como bitmap RGBA (altura x largura x 4, uint8)
+    O array retornado é compartilhado pelo cache e é somente leitura
+    """
+    pil_font = load_font(font, fontsize)
+    stroke = stroke_width if stroke_color else 0
+
+    # Caixa delimitadora justa, como o método "label" do ImageMagick
+    left, top, right, bottom = pil_font.getbbox(text, stroke_width=stroke)
+    width = max(1, right - left)
+    height = max(1, bottom - top)
+
+    image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.text((-left, -top), text, font=pil_font, fill=ImageColor.getrgb(color),
+              stroke_width=stroke, stroke_fill=ImageColor.getrgb(stroke_color) if stroke else None)
+
+    bitmap = np.asarray(image, dtype=np.uint8)
+    bitmap.setflags(write=False)
+    return bitmap
+
+
+@lru_cache(maxsize=CAPTION_BITMAP_CACHE_SIZE)
+def render_text_layers(text: str, font: str = "Impact", fontsize: int = 90, color: str = "white",
+                       stroke_color: Optional[str] = "black", stroke_width: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Separa o bitmap em camada RGB e máscara (0-1) no formato usado pelo MoviePy
+    """
+    bitmap = render_text_bitmap(text, font, fontsize, color, stroke_color, stroke_width)
+    rgb = np.ascontiguousarray(bitmap[:, :, :3])
+    mask = bitmap[:, :, 3].astype(np.float64) / 255.0
+    rgb.setflags(write=False)
+    mask.setflags(write=False)
+    return rgb, mask
+
+
+def cache_info() -> dict:
+    """Estatísticas do cache de bitmaps"""
+    info = render_text_bitmap.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize}
@@ -0,0 +1,231 @@
+"""
+Backend de renderização com filter graph nativo do ffmpeg
+Compila fundos, imagens, clips pretos, legendas e overlays do template em um
+único filter_complex e renderiza com um processo ffmpeg, sem passar os quadros
+pelo Python; o áudio entra já mixado (mixagem do template em numpy)
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Dict, List, Optional
+
+from utility.audio.pcm_buffer import audio_buffers
+from utility.render.ass_captions import ass_filter, escape_filter_path, write_ass_captions
+from utility.render.mezzanine import MEZZANINE_FPS, MEZZANINE_HEIGHT, MEZZANINE_WIDTH, get_ffmpeg_binary
+from utility.render.template_render_engine import (ASSETS_AVAILABLE, FILM_OVERLAY_OPACITY, LIGHT_LEAK_OPACITY,
+                                                    TRANSITION_FADE_DURATION, VSL_RESOLUTION, TemplateRenderEngine)
+
+if ASSETS_AVAILABLE:
+    from utility.render.template_render_engine import asset_manager
+
+RENDER_FPS = MEZZANINE_FPS
+RENDER_SIZE = (MEZZANINE_WIDTH, MEZZANINE_HEIGHT)
+
+
+def ffmpeg_color(color: str) -> str:
+    """Converte '#RRGGBB' para a sintaxe de cor do ffmpeg (0xRRGGBB)"""
+    return "0x" + color[1:] if color.startswith("#") else color
+
+
+class FilterGraphBuilder:
+    """Acumula entradas e cadeias de filtros do comando ffmpeg"""
+
+    def __init__(self):
+        self.inputs: List[List[str]] = []
+        self.chains: List[str] = []
+        self._labels = 0
+
+    def add_input(self, path: str, options: Optional[List[str]] = None) -> int:
+        self.inputs.append((options or []) + ["-i", path])
+        return len(self.inputs) - 1
+
+    def label(self, prefix: str) -> str:
+        self._labels += 1
+        return f"{prefix}{self._labels}"
+
+    def chain(self, sources: List[str], filters: str, prefix: str = "v") -> str:
+        output = self.label(prefix)
+        self.chains.append("".join(f"[{source}]" for source in sources) + filters + f"[{output}]")
+        return output
+
+    def input_args(self) -> List[str]:
+        return [arg for options in self.inputs for arg in options]
+
+    def script(self) -> str:
+        return ";\n".join(self.chains)
+
+
+def add_backgrounds(graph: FilterGraphBuilder, background_video_data, media_paths: Dict[str, Optional[str]],
+                    duration: float) -> str:
+    """
+    Fundo preto com a duração total e cada segmento sobreposto no seu intervalo
+    Segmentos sem mídia ficam como o clip preto do backend MoviePy
+    """
+    width, height = RENDER_SIZE
+    from utility.render.render_engine import is_image_url
+
+    video = graph.chain([], f"color=c=black:s={width}x{height}:r={RENDER_FPS}:d={duration:.3f},format=yuv420p")
+
+    for (t1, t2), video_url in background_video_data:
+        video_filename = media_paths.get(video_url) if video_url else None
+        segment_duration = min(t2, duration) - t1
+        if not video_filename or segment_duration <= 0:
+            continue
+
+        if is_image_url(video_url):
+            index = graph.add_input(video_filename, ["-loop", "1", "-framerate", str(RENDER_FPS),
+                                                     "-t", f"{segment_duration:.3f}"])
+        else:
+            # Clipes mais curtos que o segmento repetem em loop
+            index = graph.add_input(video_filename, ["-stream_loop", "-1", "-t", f"{segment_duration:.3f}"])
+
+        segment = graph.chain([f"{index}:v"],
+                              f"scale={width}:{height},setsar=1,fps={RENDER_FPS},format=yuv420p,"
+                              f"setpts=PTS-STARTPTS+{t1:.3f}/TB")
+        video = graph.chain([video, segment],
+                            f"overlay=eof_action=pass:repeatlast=0:enable='between(t,{t1:.3f},{t2:.3f})'")
+    return video
+
+
+def add_ass_captions(graph: FilterGraphBuilder, video: str, filtered_captions, template_id: Optional[str],
+                     work_dir: str) -> str:
+    """Todas as legendas em um único filtro ass (libass)"""
+    subtitles_path = write_ass_captions(filtered_captions, os.path.join(work_dir, "captions.ass"), template_id)
+    return graph.chain([video], ass_filter(subtitles_path))
+
+
+def add_captions(graph: FilterGraphBuilder, video: str, filtered_captions, template_id: Optional[str],
+                 work_dir: str) -> str:
+    """Uma camada drawtext por palavra, com a cor, fonte, contorno e fades das legendas MoviePy"""
+    from utility.render.caption_rasterizer import find_font_file
+    from utility.render.render_engine import (CAPTION_FADE, CAPTION_FONT, CAPTION_FONTSIZE, CAPTION_STROKE_COLOR,
+                                              CAPTION_STROKE_WIDTH, plan_caption_words)
+
+    font_file = find_font_file(CAPTION_FONT)
+    font_option = f"fontfile='{escape_filter_path(font_file)}':" if font_file else ""
+    text_files: Dict[str, str] = {}
+    layers = []
+
+    for (t1, t2), processed_text in filtered_captions:
+        for txt, word_start, word_end, word_color in plan_caption_words(processed_text, t1, t2, template_id):
+            # Texto em arquivo evita escapar aspas e pontuação no filter graph
+            if txt not in text_files:
+                text_path = os.path.join(work_dir, f"word_{len(text_files):05d}.txt")
+                with open(text_path, "w", encoding="utf-8") as f:
+                    f.write(txt)
+                text_files[txt] = text_path
+
+            fade = min(CAPTION_FADE, (word_end - word_start) / 2)
+            alpha = (f"if(lt(t,{word_start + fade:.3f}),(t-{word_start:.3f})/{fade:.3f},"
+                     f"if(gt(t,{word_end - fade:.3f}),({word_end:.3f}-t)/{fade:.3f},1))")
+            layers.append(
+                f"drawtext={font_option}textfile='{escape_filter_path(text_files[txt])}':"
+                f"fontsize={CAPTION_FONTSIZE}:fontcolor={ffmpeg_color(word_color)}:"
+                f"borderw={CAPTION_STROKE_WIDTH}:bordercolor={ffmpeg_color(CAPTION_STROKE_COLOR)}:"
+                f"x=(w-text_w)/2:y=(h-text_h)/2:"
+                f"enable='between(t,{word_start:.3f},{word_end:.3f})':alpha='{alpha}'"
+            )
+
+    if layers:
+        video = graph.chain([video], ",".join(layers))
+    return video
+
+
+def add_template_visuals(graph: FilterGraphBuilder, video: str, template_config: Dict, duration: float) -> str:
+    """Resolução, transições e overlays do template (mesma ordem de compose_template)"""
+    template_id = template_config.get('template_id', 'default')
+    visual_settings = template_config.get('visual_settings', {})
+    size = RENDER_SIZE
+
+    if template_id == "vsl_magnetic":
+        size = VSL_RESOLUTION
+        video = graph.chain([video], f"scale={size[0]}:{size[1]},setsar=1")
+    else:
+        if 'resolution' in visual_settings:
+            width, height = map(int, visual_settings['resolution'].split('x'))
+            if (width, height) != size:
+                size = (width, height)
+                video = graph.chain([video], f"scale={width}:{height},setsar=1")
+
+        transitions = visual_settings.get('transition_effects', [])
+        fades = []
+        if 'fade_in' in transitions:
+            fades.append(f"fade=t=in:st=0:d={TRANSITION_FADE_DURATION}")
+        if 'fade_out' in transitions:
+            fades.append(f"fade=t=out:st={max(0.0, duration - TRANSITION_FADE_DURATION):.3f}:d={TRANSITION_FADE_DURATION}")
+        if fades:
+            video = graph.chain([video], ",".join(fades))
+
+    if ASSETS_AVAILABLE:
+        assets = asset_manager.get_assets_for_template(template_id)
+        for asset_name, opacity in (('film_overlay', FILM_OVERLAY_OPACITY), ('light_leak', LIGHT_LEAK_OPACITY)):
+            path = assets.get(asset_name)
+            if not path or not os.path.exists(path):
+                continue
+            index = graph.add_input(path, ["-stream_loop", "-1", "-t", f"{duration:.3f}"])
+            overlay = graph.chain([f"{index}:v"],
+                                  f"scale={size[0]}:{size[1]},setsar=1,fps={RENDER_FPS},format=rgba,"
+                                  f"colorchannelmixer=aa={opacity},setpts=PTS-STARTPTS")
+            video = graph.chain([video, overlay], "overlay=eof_action=pass:repeatlast=0")
+            print(f"✅ Overlay '{asset_name}' no filter graph: {os.path.basename(path)}")
+
+    return video
+
+
+def render_ffmpeg(audio_file_path, filtered_captions, background_video_data, media_paths, output_file,
+                  template_id=None, template_config=None) -> str:
+    """
+    Renderiza o vídeo final com um único processo ffmpeg
+    Recebe as mesmas entradas já preparadas do backend MoviePy
+    """
+    from utility.render.render_engine import use_ass_captions
+
+    duration = audio_buffers.get(audio_file_path).duration
+    graph = FilterGraphBuilder()
+
+    work_dir = tempfile.mkdtemp(prefix="ffmpeg_render_")
+    try:
+        # Mixagem do template feita em numpy e gravada uma vez; o ffmpeg só codifica
+        audio_path = audio_file_path
+        if template_config:
+            audio_path = TemplateRenderEngine().write_template_mix(audio_file_path, template_config,
+                                                                   os.path.join(work_dir, "audio_mix.wav"))
+        audio_index = graph.add_input(audio_path)
+
+        video = add_backgrounds(graph, background_video_data, media_paths, duration)
+        # No filter graph o ASS entra antes dos overlays do template (mesma ordem das camadas)
+        if use_ass_captions():
+            video = add_ass_captions(graph, video, filtered_captions, template_id, work_dir)
+        else:
+            video = add_captions(graph, video, filtered_captions, template_id, work_dir)
+        if template_config:
+            video = add_template_visuals(graph, video, template_config, duration)
+        video = graph.chain([video], "format=yuv420p")
+
+        script_path = os.path.join(work_dir, "filter_complex.txt")
+        with open(script_path, "w", encoding="utf-8") as f:
+            f.write(graph.script())
+
+        command = [
+            get_ffmpeg_binary(), "-y", "-v", "error",
+            *graph.input_args(),
+            "-filter_complex_script", script_path,
+            "-map", f"[{video}]", "-map", f"{audio_index}:a",
+            "-c:v", "libx264", "-preset", "veryfast", "-r", str(RENDER_FPS),
+            "-c:a", "aac",
+            "-t", f"{duration:.3f}",
+            "-movflags", "+faststart",
+            output_file
+        ]
+        print(f"⚡ Renderizando com ffmpeg: {len(graph.inputs)} entradas, {len(graph.chains)} cadeias de filtros")
+        try:
+            subprocess.run(command, check=True, capture_output=True)
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(e.stderr.decode(errors="ignore").strip() or str(e))
+
+        print(f"✅ Vídeo renderizado com ffmpeg: {output_file}")
+        return output_file
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
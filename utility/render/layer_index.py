@@ -0,0 +1,69 @@
+"""
+Índice temporal das camadas do compositor
+O CompositeVideoClip do MoviePy verifica todas as camadas em cada quadro;
+com centenas de palavras e dezenas de fundos quase todas estão inativas.
+O índice divide a linha do tempo em janelas fixas e guarda, para cada janela,
+as camadas que a cruzam, para cada quadro consultar só as camadas visíveis
+"""
+
+import os
+from typing import List
+
+from moviepy.editor import CompositeVideoClip
+
+# Tamanho da janela do índice em segundos
+LAYER_INDEX_BUCKET_SECONDS = float(os.environ.get("LAYER_INDEX_BUCKET_SECONDS", "1.0"))
+
+
+class LayerIndex:
+    """Janelas de tempo -> camadas ativas, preservando a ordem de empilhamento"""
+
+    def __init__(self, clips, bucket_seconds: float = LAYER_INDEX_BUCKET_SECONDS):
+        self.clips = list(clips)
+        self.bucket_seconds = bucket_seconds
+
+        ends = [clip.end for clip in self.clips if clip.end is not None]
+        horizon = max(ends) if ends else 0.0
+        self.buckets: List[List[int]] = [[] for _ in range(int(horizon // bucket_seconds) + 1)]
+        # Camadas sem fim definido continuam ativas depois da última janela
+        self.tail: List[int] = []
+
+        last_bucket = len(self.buckets) - 1
+        for i, clip in enumerate(self.clips):
+            first = max(0, int(clip.start // bucket_seconds))
+            if clip.end is None:
+                last = last_bucket
+                self.tail.append(i)
+            else:
+                last = min(last_bucket, int(clip.end // bucket_seconds))
+            for k in range(first, last + 1):
+                self.buckets[k].append(i)
+
+    def candidates(self, t: float) -> List[int]:
+        k = int(t // self.bucket_seconds)
+        if k < 0:
+            return []
+        if k < len(self.buckets):
+            return self.buckets[k]
+        return self.tail
+
+    def active(self, t: float) -> list:
+        """Camadas em exibição no instante t, na ordem original"""
+        return [self.clips[i] for i in self.candidates(t) if self.clips[i].is_playing(t)]
+
+
+class IndexedCompositeVideoClip(CompositeVideoClip):
+    """CompositeVideoClip que consulta o índice temporal em vez de todas as camadas"""
+
+    def __init__(self, clips, size=None, bg_color=None, use_bgclip=False, ismask=False,
+                 bucket_seconds: float = LAYER_INDEX_BUCKET_SECONDS):
+        super().__init__(clips, size=size, bg_color=bg_color, use_bgclip=use_bgclip, ismask=ismask)
+        self.layer_index = LayerIndex(self.clips, bucket_seconds)
+
+        # A máscara de transparência também é um composite de todas as camadas
+        if isinstance(self.mask, CompositeVideoClip) and not isinstance(self.mask, IndexedCompositeVideoClip):
+            self.mask = IndexedCompositeVideoClip(self.mask.clips, self.mask.size, ismask=True, bg_color=0.0,
+                                                  bucket_seconds=bucket_seconds)
+
+    def playing_clips(self, t=0):
+        return self.layer_index.active(t)
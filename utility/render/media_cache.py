@@ -0,0 +1,111 @@
+"""
+Download concorrente de mídias de fundo com cache local
+Baixa em blocos direto para o disco, com timeout e número limitado de workers,
+guardando cada arquivo pelo hash da URL em um cache LRU limitado por bytes
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utility.cache.disk_cache import DiskCache, hash_key
+
+MEDIA_CACHE_DIR = os.environ.get("MEDIA_CACHE_DIR", ".cache/media")
+MEDIA_CACHE_MAX_MB = int(os.environ.get("MEDIA_CACHE_MAX_MB", "5120"))
+MEDIA_DOWNLOAD_WORKERS = int(os.environ.get("MEDIA_DOWNLOAD_WORKERS", "4"))
+
+# (conexão, leitura) em segundos
+DOWNLOAD_TIMEOUT = (10, 60)
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+DOWNLOAD_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+
+def url_suffix(url: str) -> str:
+    """Extensão do arquivo a partir do caminho da URL (ex: .mp4, .jpg)"""
+    ext = os.path.splitext(urlparse(url).path)[1].lower()
+    return ext if ext and len(ext) <= 6 else ""
+
+
+class MediaCache:
+    """Cache de mídias baixadas, compartilhado entre jobs do processo"""
+
+    def __init__(self, root: str = MEDIA_CACHE_DIR, max_mb: int = MEDIA_CACHE_MAX_MB,
+                 max_workers: int = MEDIA_DOWNLOAD_WORKERS):
+        self.cache = DiskCache(root, max_mb * 1024 * 1024)
+        self.cache.clear_stale_temp_files()
+        self.max_workers = max(1, max_workers)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers, max_retries=2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, url: str) -> str:
+        return hash_key("media", url)
+
+    def cached_path(self, url: str) -> Optional[str]:
+        """Caminho local da URL se já estiver no cache"""
+        return self.cache.get(self.key_for(url), url_suffix(url))
+
+    def fetch(self, url: str) -> str:
+        """Retorna o caminho local da mídia, baixando apenas se necessário"""
+        key = self.key_for(url)
+        suffix = url_suffix(url)
+
+        with self.cache.key_lock(key):
+            path = self.cache.get(key, suffix)
+            if path:
+                self.hits += 1
+                print(f"💾 Mídia em cache: {url[:60]}...")
+                return path
+
+            self.misses += 1
+            temp_path = self.cache.temp_path(key, suffix)
+            try:
+                with self.session.get(url, headers=DOWNLOAD_HEADERS, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                    response.raise_for_status()
+                    with open(temp_path, "wb") as f:
+                        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                            if chunk:
+                                f.write(chunk)
+            except Exception:
+                self.cache.discard(temp_path)
+                raise
+
+            return self.cache.commit(temp_path, key, suffix)
+
+    def fetch_many(self, urls: Iterable[str], max_workers: Optional[int] = None) -> Dict[str, Optional[str]]:
+        """
+        Baixa várias URLs em paralelo (sem repetir URLs iguais)
+        Retorna {url: caminho} com None para downloads que falharam
+        """
+        unique_urls = list(dict.fromkeys(url for url in urls if url))
+        results: Dict[str, Optional[str]] = {}
+        if not unique_urls:
+            return results
+
+        workers = min(max_workers or self.max_workers, len(unique_urls))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {url: executor.submit(self.fetch, url) for url in unique_urls}
+            for url, future in futures.items():
+                try:
+                    results[url] = future.result()
+                except Exception as e:
+                    print(f"❌ Erro no download de {url[:60]}...: {e}")
+                    results[url] = None
+
+        print(f"📥 Mídias prontas: {sum(1 for p in results.values() if p)}/{len(unique_urls)} "
+              f"(cache: {self.hits} acertos, {self.misses} downloads)")
+        return results
+
+
+# Instância global do cache de mídias
+media_cache = MediaCache()
@@ -0,0 +1,100 @@
+"""
+Cache de mezzanine para clipes de banco de imagens
+Transcodifica cada clipe baixado uma única vez com ffmpeg para a resolução,
+fps e formato de pixel da composição (1080x1920 @ 25 fps, yuv420p)
+"""
+
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from utility.cache.disk_cache import hash_key
+from utility.render.media_cache import media_cache
+
+MEZZANINE_WIDTH = 1080
+MEZZANINE_HEIGHT = 1920
+MEZZANINE_FPS = 25
+MEZZANINE_PIX_FMT = "yuv420p"
+MEZZANINE_WORKERS = int(os.environ.get("MEZZANINE_WORKERS", "2"))
+
+# Alterar quando os parâmetros de transcodificação mudarem (invalida o cache)
+MEZZANINE_VERSION = 1
+
+
+def get_ffmpeg_binary() -> str:
+    """Binário do ffmpeg: FFMPEG_BINARY, o do imageio-ffmpeg ou o do PATH"""
+    binary = os.environ.get("FFMPEG_BINARY")
+    if binary and binary != "auto-detect":
+        return binary
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return "ffmpeg"
+
+
+def mezzanine_key(source_path: str, width: int, height: int, fps: int) -> str:
+    stat = os.stat(source_path)
+    return hash_key("mezzanine", MEZZANINE_VERSION, os.path.basename(source_path), stat.st_size,
+                    width, height, fps, MEZZANINE_PIX_FMT)
+
+
+def normalize_clip(source_path: str, width: int = MEZZANINE_WIDTH, height: int = MEZZANINE_HEIGHT,
+                   fps: int = MEZZANINE_FPS) -> str:
+    """
+    Retorna o caminho do clipe já na resolução/fps da composição
+    A transcodificação acontece só na primeira vez; depois vem do cache
+    """
+    cache = media_cache.cache
+    key = mezzanine_key(source_path, width, height, fps)
+
+    with cache.key_lock(key):
+        path = cache.get(key, ".mp4")
+        if path:
+            return path
+
+        temp_path = cache.temp_path(key, ".mp4")
+        command = [
+            get_ffmpeg_binary(), "-y", "-v", "error",
+            "-i", source_path,
+            "-an",
+            "-vf", f"scale={width}:{height}:flags=bicubic,setsar=1,fps={fps},format={MEZZANINE_PIX_FMT}",
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "18",
+            "-g", str(fps),  # Keyframe a cada segundo para cortes rápidos
+            "-movflags", "+faststart",
+            str(temp_path)
+        ]
+        try:
+            subprocess.run(command, check=True, capture_output=True)
+        except subprocess.CalledProcessError as e:
+            cache.discard(temp_path)
+            raise RuntimeError(e.stderr.decode(errors="ignore").strip() or str(e))
+        except Exception:
+            cache.discard(temp_path)
+            raise
+
+        print(f"🎞️ Mezzanine criado ({width}x{height} @ {fps}fps): {os.path.basename(source_path)}")
+        return cache.commit(temp_path, key, ".mp4", protect=[source_path])
+
+
+def normalize_many(source_paths: Iterable[str], max_workers: int = MEZZANINE_WORKERS) -> Dict[str, Optional[str]]:
+    """
+    Normaliza vários clipes em paralelo
+    Retorna {original: mezzanine} com None quando a transcodificação falhar
+    """
+    unique_paths = list(dict.fromkeys(path for path in source_paths if path))
+    results: Dict[str, Optional[str]] = {}
+    if not unique_paths:
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique_paths)))) as executor:
+        futures = {path: executor.submit(normalize_clip, path) for path in unique_paths}
+        for path, future in futures.items():
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                print(f"⚠️ Erro ao normalizar {os.path.basename(path)}: {e}")
+                results[path] = None
+
+    return results
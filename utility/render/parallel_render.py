@@ -0,0 +1,200 @@
+"""
+Renderização paralela por segmentos da linha do tempo
+Divide o vídeo nos limites dos segmentos de fundo, renderiza cada trecho
+(fundos + legendas que caem nele) em um pool de processos, junta os trechos
+com o concat demuxer do ffmpeg sem recodificar e faz o mux do áudio no final
+"""
+
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from utility.audio.pcm_buffer import audio_buffers
+from utility.render.layer_index import IndexedCompositeVideoClip
+from utility.render.mezzanine import MEZZANINE_FPS, MEZZANINE_HEIGHT, MEZZANINE_WIDTH, get_ffmpeg_binary
+
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", str(os.cpu_count() or 1)))
+# Trechos menores que isso não compensam o custo de abrir um processo
+RENDER_MIN_CHUNK_SECONDS = float(os.environ.get("RENDER_MIN_CHUNK_SECONDS", "4"))
+
+RENDER_FPS = MEZZANINE_FPS
+RENDER_SIZE = (MEZZANINE_WIDTH, MEZZANINE_HEIGHT)
+
+
+def to_frame(t: float, fps: int = RENDER_FPS) -> int:
+    """Índice do quadro mais próximo do tempo t"""
+    return int(round(t * fps))
+
+
+def plan_chunks(background_video_data, duration: float, workers: int,
+                min_chunk: float = RENDER_MIN_CHUNK_SECONDS) -> List[Tuple[int, int]]:
+    """
+    Define os trechos [quadro inicial, quadro final) da renderização
+    Trabalha em índices inteiros de quadro para a soma dos trechos ser exatamente
+    o total de quadros (concat sem deriva do áudio e das legendas)
+    Corta nos inícios dos segmentos de fundo e subdivide trechos longos para
+    haver trabalho para todos os workers
+    """
+    total_frames = to_frame(duration)
+    cuts = {0, total_frames}
+    for (t1, _), _ in background_video_data:
+        frame = to_frame(t1)
+        if 0 < frame < total_frames:
+            cuts.add(frame)
+    bounds = sorted(cuts)
+
+    target = max(to_frame(min_chunk), total_frames // max(1, workers), 1)
+    chunks = []
+    for start, end in zip(bounds, bounds[1:]):
+        pieces = max(1, -(-(end - start) // target))
+        for i in range(pieces):
+            piece_start = start + (end - start) * i // pieces
+            piece_end = start + (end - start) * (i + 1) // pieces
+            if piece_end > piece_start:
+                chunks.append((piece_start, piece_end))
+    return chunks
+
+
+def shift_clip(clip, offset: float):
+    """Move o clip da linha do tempo global para a do trecho"""
+    return clip.set_start(clip.start - offset)
+
+
+def render_chunk(index: int, start_frame: int, end_frame: int, backgrounds, captions,
+                 template_id: Optional[str], template_config: Optional[Dict], timeline_duration: float,
+                 output_path: str, threads: int, ass_captions: bool = False) -> str:
+    """
+    Renderiza um trecho sem áudio (executado em um processo do pool)
+    Recebe apenas dados simples; os clips são montados dentro do processo
+    Gera exatamente end_frame - start_frame quadros
+    """
+    from utility.render.render_engine import create_background_clip, generate_colored_text_clips
+    from utility.render.template_render_engine import TemplateRenderEngine
+
+    n_frames = end_frame - start_frame
+    chunk_start = start_frame / RENDER_FPS
+    chunk_end = end_frame / RENDER_FPS
+    chunk_duration = n_frames / RENDER_FPS
+    visual_clips = []
+
+    for t1, t2, video_url, video_filename in backgrounds:
+        clip = create_background_clip(t1, t2, video_url, video_filename)
+        visual_clips.append(shift_clip(clip, chunk_start))
+
+    # Legendas do trecho em ASS, com tempos relativos ao início do trecho
+    ffmpeg_params = ["-pix_fmt", "yuv420p"]
+    if ass_captions:
+        from utility.render.ass_captions import ass_filter, write_ass_captions
+        subtitles_path = write_ass_captions(captions, os.path.splitext(output_path)[0] + ".ass", template_id,
+                                            offset=chunk_start, duration=chunk_duration)
+        ffmpeg_params += ["-vf", ass_filter(subtitles_path)]
+        captions = []
+
+    for (t1, t2), processed_text in captions:
+        for clip in generate_colored_text_clips(processed_text, t1, t2, template_id):
+            if clip.end > chunk_start and clip.start < chunk_end:
+                visual_clips.append(shift_clip(clip, chunk_start))
+
+    video = IndexedCompositeVideoClip(visual_clips, size=RENDER_SIZE).set_duration(chunk_duration)
+
+    if template_config:
+        video = TemplateRenderEngine().compose_template(video, template_config, None,
+                                                        timeline_offset=chunk_start,
+                                                        timeline_duration=timeline_duration)
+    # O MoviePy gera os quadros de np.arange(0, duração, 1/fps): meio quadro a menos garante n_frames
+    video = video.set_duration((n_frames - 0.5) / RENDER_FPS)
+
+    video.write_videofile(output_path, codec='libx264', audio=False, fps=RENDER_FPS, preset='veryfast',
+                          threads=threads, logger=None, ffmpeg_params=ffmpeg_params)
+    print(f"✅ Trecho {index} renderizado [{chunk_start:.2f}s - {chunk_end:.2f}s, {n_frames} quadros]")
+    return output_path
+
+
+def run_ffmpeg(command: List[str]):
+    try:
+        subprocess.run(command, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(e.stderr.decode(errors="ignore").strip() or str(e))
+
+
+def concat_chunks(chunk_paths: List[str], list_path: str, output_path: str):
+    """Junta os trechos com o concat demuxer, copiando o stream (sem recodificar)"""
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in chunk_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    run_ffmpeg([get_ffmpeg_binary(), "-y", "-v", "error",
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                "-c", "copy", output_path])
+
+
+def mux_audio(video_path: str, audio_path: str, output_path: str):
+    """Adiciona o áudio ao vídeo concatenado, copiando o stream de vídeo"""
+    run_ffmpeg([get_ffmpeg_binary(), "-y", "-v", "error",
+                "-i", video_path, "-i", audio_path,
+                "-map", "0:v:0", "-map", "1:a:0",
+                "-c:v", "copy", "-c:a", "aac",
+                "-shortest", "-movflags", "+faststart",
+                output_path])
+
+
+def render_parallel(audio_file_path, filtered_captions, background_video_data, media_paths, output_file,
+                    template_id=None, template_config=None, max_workers: int = RENDER_WORKERS) -> str:
+    """
+    Renderiza o vídeo em trechos paralelos e junta o resultado em output_file
+    Produz o mesmo resultado de get_output_media no modo de composição única
+    """
+    duration = audio_buffers.get(audio_file_path).duration
+
+    workers = max(1, max_workers)
+    chunks = plan_chunks(background_video_data, duration, workers)
+    workers = min(workers, len(chunks))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"⚡ Renderização paralela: {len(chunks)} trechos em {workers} processos")
+
+    from utility.render.render_engine import use_ass_captions
+    ass_captions = use_ass_captions(template_config=template_config)
+
+    work_dir = tempfile.mkdtemp(prefix="render_chunks_")
+    try:
+        jobs = []
+        for index, (start_frame, end_frame) in enumerate(chunks):
+            chunk_start = start_frame / RENDER_FPS
+            chunk_end = end_frame / RENDER_FPS
+            backgrounds = [
+                (t1, t2, video_url, media_paths.get(video_url) if video_url else None)
+                for (t1, t2), video_url in background_video_data
+                if t2 > chunk_start and t1 < chunk_end
+            ]
+            captions = [
+                ((t1, t2), text) for (t1, t2), text in filtered_captions
+                if t2 > chunk_start and t1 < chunk_end
+            ]
+            chunk_path = os.path.join(work_dir, f"chunk_{index:04d}.mp4")
+            jobs.append((index, start_frame, end_frame, backgrounds, captions, template_id, template_config,
+                         duration, chunk_path, threads, ass_captions))
+
+        # spawn: o servidor tem threads (jobs, event loops) que um fork copiaria em estado inconsistente
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(render_chunk, *job) for job in jobs]
+            chunk_paths = [future.result() for future in futures]
+
+        video_only_path = os.path.join(work_dir, "video_only.mp4")
+        concat_chunks(chunk_paths, os.path.join(work_dir, "chunks.txt"), video_only_path)
+
+        # Mixagem do template (música, efeitos) é feita uma vez para a linha do tempo inteira
+        audio_path = audio_file_path
+        if template_config:
+            from utility.render.template_render_engine import TemplateRenderEngine
+            audio_path = TemplateRenderEngine().write_template_mix(audio_file_path, template_config,
+                                                                   os.path.join(work_dir, "audio_mix.wav"))
+
+        mux_audio(video_only_path, audio_path, output_file)
+        print(f"✅ Vídeo final montado: {output_file}")
+        return output_file
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
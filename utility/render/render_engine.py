@@ -1,16 +1,18 @@
 import time
 import os
 import tempfile
+import shutil
 import zipfile
 import platform
 import subprocess
 import re
 import random
-from moviepy.editor import (AudioFileClip, CompositeVideoClip, CompositeAudioClip, ImageClip,
-                            TextClip, VideoFileClip)
-from moviepy.audio.fx.audio_loop import audio_loop
-from moviepy.audio.fx.audio_normalize import audio_normalize
-import requests
+from moviepy.editor import ImageClip, TextClip, VideoFileClip
+from utility.render.template_render_engine import TemplateRenderEngine
+from utility.render.media_cache import media_cache
+from utility.render.mezzanine import normalize_many
+from utility.render.layer_index import IndexedCompositeVideoClip
+from utility.audio.pcm_buffer import audio_buffers
 
 # Patch para compatibilidade com Pillow 10.x (ANTIALIAS foi removido)
 try:
@@ -20,6 +22,14 @@ try:
 except ImportError:
     pass
 
+# Rasterizador de legendas em processo (evita um subprocesso do ImageMagick por palavra)
+try:
+    from utility.render.caption_rasterizer import render_text_layers
+    RASTERIZER_AVAILABLE = True
+except ImportError:
+    print("⚠️ Rasterizador de legendas não disponível - usando TextClip do ImageMagick")
+    RASTERIZER_AVAILABLE = False
+
 def process_text_for_captions(text):
     """
     Processa texto para legendas seguindo as especificações:
@@ -157,15 +167,43 @@ def get_word_color(word, template_id=None):
     # Padrão
     return scheme['default']
 
-def generate_colored_text_clips(processed_text, start_time, end_time, template_id=None):
+# Estilo das legendas palavra por palavra (compartilhado pelos backends)
+CAPTION_FONT = "Impact"
+CAPTION_FONTSIZE = 90
+CAPTION_STROKE_COLOR = "black"
+CAPTION_STROKE_WIDTH = 1
+CAPTION_FADE = 0.1
+
+def create_word_clip(txt, word_color, fontsize=CAPTION_FONTSIZE, font=CAPTION_FONT, stroke_color=CAPTION_STROKE_COLOR,
+                     stroke_width=CAPTION_STROKE_WIDTH):
     """
-    Gera clips de texto palavra por palavra com cores diferentes para palavras-chave
+    Cria o clip de uma palavra usando o bitmap em cache (ou TextClip como fallback)
+    """
+    if RASTERIZER_AVAILABLE:
+        try:
+            rgb, mask = render_text_layers(txt, font, fontsize, word_color, stroke_color, stroke_width)
+            return ImageClip(rgb).set_mask(ImageClip(mask, ismask=True))
+        except Exception as e:
+            print(f"⚠️ Erro ao rasterizar '{txt}', usando TextClip: {e}")
+    
+    return TextClip(txt=txt,
+                    fontsize=fontsize,  # Fonte grande e impactante
+                    font=font,  # Fonte Impact (mais chamativa)
+                    color=word_color,  # Cor baseada na palavra
+                    stroke_color=stroke_color,  # Contorno preto
+                    stroke_width=stroke_width,  # Borda bem sutil
+                    method="label")
+
+def plan_caption_words(processed_text, start_time, end_time, template_id=None):
+    """
+    Calcula o tempo e a cor de cada palavra da legenda
+    Retorna [(texto, início, fim, cor)] usado por todos os backends de renderização
     """
     words = processed_text.split()
-    clips = []
+    planned = []
     
     if not words:
-        return clips
+        return planned
     
     # Calcular duração por palavra com buffer de sincronização
     total_duration = end_time - start_time
@@ -200,20 +238,24 @@ def generate_colored_text_clips(processed_text, start_time, end_time, template_i
         
         # Obter cor para esta palavra baseada no template
         word_color = get_word_color(word, template_id)
-        
+        planned.append((txt, word_start, word_end, word_color))
+    
+    return planned
+
+def generate_colored_text_clips(processed_text, start_time, end_time, template_id=None):
+    """
+    Gera clips de texto palavra por palavra com cores diferentes para palavras-chave
+    """
+    clips = []
+    
+    for txt, word_start, word_end, word_color in plan_caption_words(processed_text, start_time, end_time, template_id):
         try:
             # Criar texto com borda bem sutil
-            txt_clip = (TextClip(txt=txt,
-                                 fontsize=90,  # Fonte grande e impactante
-                                 font="Impact",  # Fonte Impact (mais chamativa)
-                                 color=word_color,  # Cor baseada na palavra
-                                 stroke_color="black",  # Contorno preto
-                                 stroke_width=1,  # Borda bem sutil
-                                 method="label")
+            txt_clip = (create_word_clip(txt, word_color)
                         .set_start(word_start)
                         .set_end(word_end)
-                        .fadein(0.1)  # Fade-in rápido
-                        .fadeout(0.1)  # Fade-out rápido
+                        .fadein(CAPTION_FADE)  # Fade-in rápido
+                        .fadeout(CAPTION_FADE)  # Fade-out rápido
                         .set_position(("center", "center")))  # Centralizado na tela
             
             # Adicionar clip
@@ -225,14 +267,6 @@ def generate_colored_text_clips(processed_text, start_time, end_time, template_i
     
     return clips
 
-def download_file(url, filename):
-    with open(filename, 'wb') as f:
-        headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(url, headers=headers)
-        f.write(response.content)
-
 def search_program(program_name):
     try: 
         search_cmd = "where" if platform.system() == "Windows" else "which"
@@ -244,100 +278,129 @@ def get_program_path(program_name):
     program_path = search_program(program_name)
     return program_path
 
-def get_output_media(audio_file_path, timed_captions, background_video_data, video_server, template_id=None):
-    OUTPUT_FILE_NAME = "rendered_video.mp4"
-    magick_path = get_program_path("magick")
-    print(magick_path)
-    if magick_path:
-        os.environ['IMAGEMAGICK_BINARY'] = magick_path
-    else:
-        os.environ['IMAGEMAGICK_BINARY'] = '/usr/bin/convert'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+# Modo de renderização padrão: "single" (uma composição MoviePy) ou "parallel" (segmentos em paralelo)
+RENDER_MODE = os.environ.get("RENDER_MODE", "single")
+
+# Backend de renderização padrão: "moviepy" ou "ffmpeg" (filter graph nativo, MoviePy como fallback)
+RENDER_BACKEND = os.environ.get("RENDER_BACKEND", "moviepy")
+
+# Legendas: "ass" (libass em um único filtro), "clips" (uma camada por palavra) ou "auto"
+CAPTION_RENDERER = os.environ.get("CAPTION_RENDERER", "auto")
+
+# No MoviePy o filtro ass é aplicado na codificação, depois dos overlays do template, e
+# as legendas ficariam acima deles; com template, só usar ASS quando essa ordem for pedida ("1")
+CAPTION_ASS_ABOVE_TEMPLATE = os.environ.get("CAPTION_ASS_ABOVE_TEMPLATE", "0") == "1"
+
+def use_ass_captions(caption_renderer=None, template_config=None):
+    """
+    Indica se as legendas devem ser queimadas pelo libass em vez de camadas por palavra
+    template_config informado (composição MoviePy) mantém as legendas abaixo dos overlays
+    do template, usando camadas por palavra, salvo com CAPTION_ASS_ABOVE_TEMPLATE
+    """
+    caption_renderer = caption_renderer or CAPTION_RENDERER
+    if caption_renderer == "clips":
+        return False
+    if template_config and not CAPTION_ASS_ABOVE_TEMPLATE:
+        if caption_renderer == "ass":
+            print("ℹ️ Template com overlays - legendas em camadas para ficarem abaixo deles "
+                  "(CAPTION_ASS_ABOVE_TEMPLATE=1 queima o ASS por cima)")
+        return False
+    from utility.render.ass_captions import libass_available
+    available = libass_available()
+    if caption_renderer == "ass" and not available:
+        print("⚠️ ffmpeg sem libass - usando camadas de legenda por palavra")
+    return available
+
+def is_image_url(video_url):
+    return video_url.lower().endswith(IMAGE_EXTENSIONS)
+
+def prepare_background_media(background_video_data):
+    """
+    Baixa (ou reaproveita do cache) as mídias de fundo e normaliza os vídeos
+    Retorna {url: caminho local pronto para composição} com None quando falhar
+    """
+    # Baixar todos os segmentos em paralelo (ou reaproveitar do cache local)
+    media_paths = media_cache.fetch_many(video_url for _, video_url in background_video_data)
     
-    visual_clips = []
-    print(f"🎬 Processando {len(background_video_data)} segmentos de vídeo de fundo")
+    # Transcodificar vídeos uma única vez para 1080x1920 @ 25fps (cache de mezzanine)
+    mezzanine_paths = normalize_many(
+        path for url, path in media_paths.items()
+        if path and not is_image_url(url)
+    )
     
-    for (t1, t2), video_url in background_video_data:
-        print(f"📹 Segmento [{t1:.2f}s - {t2:.2f}s]: {video_url}")
-        
-        # Verificar se URL é válida
-        if not video_url or video_url == "":
-            print(f"⚠️ URL vazia para segmento [{t1:.2f}s - {t2:.2f}s], criando clip preto")
-            from moviepy.video.VideoClip import ColorClip
-            video_clip = ColorClip(size=(1080, 1920), color=(0, 0, 0))
-            video_clip = video_clip.set_duration(t2 - t1)
+    return {
+        url: (mezzanine_paths.get(path) or path) if path else None
+        for url, path in media_paths.items()
+    }
+
+def create_color_clip(t1, t2):
+    """Clip preto usado quando o segmento não tem mídia"""
+    from moviepy.video.VideoClip import ColorClip
+    video_clip = ColorClip(size=(1080, 1920), color=(0, 0, 0))
+    video_clip = video_clip.set_duration(t2 - t1)
+    video_clip = video_clip.set_start(t1)
+    video_clip = video_clip.set_end(t2)
+    return video_clip
+
+def create_background_clip(t1, t2, video_url, video_filename):
+    """
+    Cria o clip de fundo de um segmento a partir do arquivo local
+    Usa clip preto como fallback para URL vazia, download ou leitura com erro
+    """
+    print(f"📹 Segmento [{t1:.2f}s - {t2:.2f}s]: {video_url}")
+    
+    # Verificar se URL é válida
+    if not video_url or video_url == "":
+        print(f"⚠️ URL vazia para segmento [{t1:.2f}s - {t2:.2f}s], criando clip preto")
+        return create_color_clip(t1, t2)
+    
+    if not video_filename:
+        print(f"❌ Erro no download: {video_url}")
+        # Criar clip preto como fallback
+        return create_color_clip(t1, t2)
+    
+    # Check if it's an image or video
+    if is_image_url(video_url):
+        # Convert image to video clip with explicit duration
+        try:
+            print(f"🖼️ Processando imagem: {video_filename}")
+            image_clip = ImageClip(video_filename)
+            duration = t2 - t1
+            video_clip = image_clip.set_duration(duration)
             video_clip = video_clip.set_start(t1)
             video_clip = video_clip.set_end(t2)
-            visual_clips.append(video_clip)
-            continue
-        
-        # Download the file
-        video_filename = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg').name
-        try:
-            download_file(video_url, video_filename)
-            print(f"✅ Download concluído: {video_filename}")
+            # Resize to vertical video dimensions (9:16 aspect ratio)
+            video_clip = video_clip.resize(width=1080, height=1920)
+            print(f"✅ Imagem convertida para vídeo: {video_filename}")
         except Exception as e:
-            print(f"❌ Erro no download: {e}")
-            # Criar clip preto como fallback
-            from moviepy.video.VideoClip import ColorClip
-            video_clip = ColorClip(size=(1080, 1920), color=(0, 0, 0))
-            video_clip = video_clip.set_duration(t2 - t1)
+            print(f"❌ Erro ao processar imagem {video_filename}: {e}")
+            # Criar um clip de cor sólida como fallback
+            video_clip = create_color_clip(t1, t2)
+    else:
+        # Create VideoFileClip from the downloaded video file
+        try:
+            print(f"🎬 Processando vídeo: {video_filename}")
+            video_clip = VideoFileClip(video_filename)
             video_clip = video_clip.set_start(t1)
             video_clip = video_clip.set_end(t2)
-            visual_clips.append(video_clip)
-            continue
-        
-        # Check if it's an image or video
-        if video_url.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
-            # Convert image to video clip with explicit duration
-            try:
-                print(f"🖼️ Processando imagem: {video_filename}")
-                image_clip = ImageClip(video_filename)
-                duration = t2 - t1
-                video_clip = image_clip.set_duration(duration)
-                video_clip = video_clip.set_start(t1)
-                video_clip = video_clip.set_end(t2)
-                # Resize to vertical video dimensions (9:16 aspect ratio)
-                video_clip = video_clip.resize(width=1080, height=1920)
-                print(f"✅ Imagem convertida para vídeo: {video_filename}")
-            except Exception as e:
-                print(f"❌ Erro ao processar imagem {video_filename}: {e}")
-                # Criar um clip de cor sólida como fallback
-                from moviepy.video.VideoClip import ColorClip
-                video_clip = ColorClip(size=(1080, 1920), color=(0, 0, 0))
-                video_clip = video_clip.set_duration(t2 - t1)
-                video_clip = video_clip.set_start(t1)
-                video_clip = video_clip.set_end(t2)
-        else:
-            # Create VideoFileClip from the downloaded video file
-            try:
-                print(f"🎬 Processando vídeo: {video_filename}")
-                video_clip = VideoFileClip(video_filename)
-                video_clip = video_clip.set_start(t1)
-                video_clip = video_clip.set_end(t2)
-                # Resize to vertical video dimensions (9:16 aspect ratio)
+            # Resize to vertical video dimensions (9:16 aspect ratio) se o mezzanine falhou
+            if tuple(video_clip.size) != (1080, 1920):
                 video_clip = video_clip.resize(width=1080, height=1920)
-                print(f"✅ Vídeo processado com sucesso: {video_filename}")
-            except Exception as e:
-                print(f"❌ Erro ao processar vídeo {video_filename}: {e}")
-                # Criar um clip de cor sólida como fallback
-                from moviepy.video.VideoClip import ColorClip
-                video_clip = ColorClip(size=(1080, 1920), color=(0, 0, 0))
-                video_clip = video_clip.set_duration(t2 - t1)
-                video_clip = video_clip.set_start(t1)
-                video_clip = video_clip.set_end(t2)
-        
-        print(f"📹 Adicionando clip ao composite: duração {t2-t1:.2f}s")
-        visual_clips.append(video_clip)
+            print(f"✅ Vídeo processado com sucesso: {video_filename}")
+        except Exception as e:
+            print(f"❌ Erro ao processar vídeo {video_filename}: {e}")
+            # Criar um clip de cor sólida como fallback
+            video_clip = create_color_clip(t1, t2)
     
-    audio_clips = []
-    audio_file_clip = AudioFileClip(audio_file_path)
-    audio_clips.append(audio_file_clip)
+    print(f"📹 Adicionando clip ao composite: duração {t2-t1:.2f}s")
+    return video_clip
 
-    # Detectar pausas no áudio e ajustar legendas
-    audio_file_clip = AudioFileClip(audio_file_path)
-    audio_duration = audio_file_clip.duration
-    
-    # Filtrar legendas que correspondem a pausas ou silêncio
+def filter_timed_captions(timed_captions):
+    """
+    Filtra legendas que correspondem a pausas ou silêncio e limpa o texto
+    """
     filtered_captions = []
     for (t1, t2), text in timed_captions:
         # Pular legendas muito curtas ou vazias
@@ -374,6 +437,77 @@ def get_output_media(audio_file_path, timed_captions, background_video_data, vid
         filtered_captions.append(((t1, t2), processed_text))
     
     print(f"📝 Legendas filtradas: {len(filtered_captions)} de {len(timed_captions)} originais")
+    return filtered_captions
+
+def get_output_media(audio_file_path, timed_captions, background_video_data, video_server, template_id=None, template_config=None,
+                     render_mode=None, render_backend=None):
+    """
+    Renderiza o vídeo final em uma única codificação
+    Quando template_config é informado, configurações visuais, overlays e mixagem de
+    áudio do template entram no mesmo grafo de composição das legendas e fundos
+    render_mode "parallel" renderiza a linha do tempo em segmentos usando todos os núcleos
+    render_backend "ffmpeg" compila tudo em um filter graph e renderiza com um processo ffmpeg
+    """
+    # Mídias baixadas/normalizadas para este job não são despejadas do cache antes do fim da renderização
+    with media_cache.cache.job():
+        return render_output_media(audio_file_path, timed_captions, background_video_data, template_id,
+                                   template_config, render_mode, render_backend)
+
+def render_output_media(audio_file_path, timed_captions, background_video_data, template_id=None, template_config=None,
+                        render_mode=None, render_backend=None):
+    OUTPUT_FILE_NAME = "rendered_video.mp4"
+    magick_path = get_program_path("magick")
+    print(magick_path)
+    if magick_path:
+        os.environ['IMAGEMAGICK_BINARY'] = magick_path
+    else:
+        os.environ['IMAGEMAGICK_BINARY'] = '/usr/bin/convert'
+    
+    render_mode = render_mode or RENDER_MODE
+    render_backend = render_backend or RENDER_BACKEND
+    if template_config:
+        template_id = template_config.get('template_id', template_id)
+    
+    print(f"🎬 Processando {len(background_video_data)} segmentos de vídeo de fundo")
+    media_paths = prepare_background_media(background_video_data)
+    
+    # Filtrar legendas que correspondem a pausas ou silêncio
+    filtered_captions = filter_timed_captions(timed_captions)
+    
+    if render_backend == "ffmpeg":
+        from utility.render.ffmpeg_render import render_ffmpeg
+        try:
+            return render_ffmpeg(audio_file_path, filtered_captions, background_video_data, media_paths,
+                                 OUTPUT_FILE_NAME, template_id, template_config)
+        except Exception as e:
+            print(f"⚠️ Erro no backend ffmpeg, usando MoviePy: {e}")
+    
+    if render_mode == "parallel":
+        from utility.render.parallel_render import render_parallel
+        try:
+            return render_parallel(audio_file_path, filtered_captions, background_video_data, media_paths,
+                                   OUTPUT_FILE_NAME, template_id, template_config)
+        except Exception as e:
+            print(f"⚠️ Erro na renderização paralela, usando renderização única: {e}")
+    
+    visual_clips = []
+    for (t1, t2), video_url in background_video_data:
+        visual_clips.append(create_background_clip(t1, t2, video_url, media_paths.get(video_url)))
+    
+    # Duração da narração pelo buffer compartilhado (decodificada uma única vez no pipeline)
+    narration = audio_buffers.get(audio_file_path)
+    
+    # Legendas em ASS entram como filtro do libass na própria codificação
+    ffmpeg_params = None
+    subtitles_path = None
+    if use_ass_captions(template_config=template_config):
+        from utility.render.ass_captions import ass_filter, write_ass_captions
+        fd, subtitles_path = tempfile.mkstemp(suffix=".ass")
+        os.close(fd)
+        write_ass_captions(filtered_captions, subtitles_path, template_id)
+        ffmpeg_params = ["-vf", ass_filter(subtitles_path)]
+        print(f"📝 Legendas em ASS: {subtitles_path}")
+        filtered_captions = []
     
     # Aplicar legendas filtradas com melhor sincronização
     for (t1, t2), processed_text in filtered_captions:
@@ -385,18 +519,33 @@ def get_output_media(audio_file_path, timed_captions, background_video_data, vid
         else:
             print(f"⚠️ Nenhuma legenda gerada para '{processed_text[:30]}...'")
 
-    video = CompositeVideoClip(visual_clips)
-    
-    if audio_clips:
-        audio = CompositeAudioClip(audio_clips)
-        video.duration = audio.duration
-        video.audio = audio
+    # Cada quadro consulta só as camadas ativas no instante (índice temporal)
+    video = IndexedCompositeVideoClip(visual_clips)
+    video.duration = narration.duration
 
-    video.write_videofile(OUTPUT_FILE_NAME, codec='libx264', audio_codec='aac', fps=25, preset='veryfast')
-    
-    # Clean up downloaded files
-    for (t1, t2), video_url in background_video_data:
-        video_filename = tempfile.NamedTemporaryFile(delete=False).name
-        os.remove(video_filename)
+    # Aplicar template no mesmo grafo (sem segunda codificação); o áudio é mixado à parte
+    if template_config:
+        print(f"🎬 Aplicando template '{template_id}' na mesma passada de renderização")
+        video = TemplateRenderEngine().compose_template(video, template_config)
+
+    from utility.render.parallel_render import mux_audio
+    work_dir = tempfile.mkdtemp(prefix="render_")
+    try:
+        # Mixagem do template gravada uma vez em numpy (ou a narração, sem template)
+        audio_path = audio_file_path
+        if template_config:
+            audio_path = TemplateRenderEngine().write_template_mix(audio_file_path, template_config,
+                                                                   os.path.join(work_dir, "audio_mix.wav"))
+        
+        # Vídeo sem áudio e mux final copiando o stream de vídeo
+        video_only_path = os.path.join(work_dir, "video_only.mp4")
+        video.write_videofile(video_only_path, codec='libx264', audio=False, fps=25, preset='veryfast',
+                              ffmpeg_params=ffmpeg_params)
+        mux_audio(video_only_path, audio_path, OUTPUT_FILE_NAME)
+    finally:
+        if subtitles_path and os.path.exists(subtitles_path):
+            os.remove(subtitles_path)
+        shutil.rmtree(work_dir, ignore_errors=True)
 
+    # Arquivos baixados ficam no cache de mídia (limpeza pelo despejo LRU)
     return OUTPUT_FILE_NAME
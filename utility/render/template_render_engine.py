@@ -6,10 +6,12 @@ Aplica configurações de template ao vídeo final
 
 import os
 import json
-from typing import Dict, List, Optional
-from moviepy.editor import AudioFileClip, CompositeVideoClip, CompositeAudioClip, VideoFileClip, TextClip
-from moviepy.audio.fx.audio_normalize import audio_normalize
-from moviepy.audio.fx.audio_loop import audio_loop
+from typing import Dict, List, Optional, Tuple
+from moviepy.editor import AudioFileClip, CompositeVideoClip, VideoFileClip, TextClip
+
+from utility.audio.audio_mixer import mix_tracks
+from utility.audio.pcm_buffer import audio_buffers, write_wav
+from utility.audio.pause_inserter import PauseRemap, insert_pauses, pause_targets, place_pauses
 
 # Patch para compatibilidade com Pillow 10.x (ANTIALIAS foi removido)
 try:
@@ -27,31 +29,53 @@ except ImportError:
     print("⚠️ AssetManager não disponível - usando configurações padrão")
     ASSETS_AVAILABLE = False
 
+# Níveis da mixagem e dos overlays (compartilhados com o backend ffmpeg)
+BACKGROUND_MUSIC_VOLUME = 0.1
+TENSION_EFFECT_VOLUME = 0.2
+IMPACT_EFFECT_VOLUME = 0.15
+FILM_OVERLAY_OPACITY = 0.3
+LIGHT_LEAK_OPACITY = 0.2
+TRANSITION_FADE_DURATION = 1.0
+VSL_RESOLUTION = (720, 1280)
+
 class TemplateRenderEngine:
     def __init__(self):
         self.templates = {}
     
+    def compose_template(self, video, template_config: Dict, audio_path: str = None,
+                         timeline_offset: float = 0.0, timeline_duration: Optional[float] = None):
+        """
+        Aplica o template ao grafo de composição sem codificar
+        Permite que get_output_media renderize legendas, fundos e template em uma única passada
+        timeline_offset/timeline_duration posicionam um segmento dentro do vídeo completo
+        (renderização paralela), para fades e overlays seguirem a linha do tempo global
+        """
+        # Aplicar configurações específicas do template
+        template_id = template_config.get('template_id', 'default')
+        
+        if template_id == "vsl_magnetic":
+            video = self._apply_vsl_magnetic_settings(video, template_config)
+        else:
+            # Aplicar configurações visuais padrão
+            video = self._apply_visual_settings(video, template_config.get('visual_settings', {}),
+                                                timeline_offset, timeline_duration)
+        
+        # Aplicar configurações de áudio com assets
+        if audio_path and os.path.exists(audio_path):
+            video = self._apply_audio_settings_with_assets(video, audio_path, template_config)
+        
+        # Aplicar efeitos visuais com assets
+        video = self._apply_effects_with_assets(video, template_config, timeline_offset)
+        
+        return video
+    
     def apply_template_to_video(self, video_path: str, template_config: Dict, audio_path: str = None) -> str:
-        """Aplica configurações de template ao vídeo"""
+        """Aplica configurações de template a um vídeo já renderizado (requer nova codificação)"""
         try:
             # Carregar vídeo
             video = VideoFileClip(video_path)
             
-            # Aplicar configurações específicas do template
-            template_id = template_config.get('template_id', 'default')
-            
-            if template_id == "vsl_magnetic":
-                video = self._apply_vsl_magnetic_settings(video, template_config)
-            else:
-                # Aplicar configurações visuais padrão
-                video = self._apply_visual_settings(video, template_config.get('visual_settings', {}))
-            
-            # Aplicar configurações de áudio com assets
-            if audio_path and os.path.exists(audio_path):
-                video = self._apply_audio_settings_with_assets(video, audio_path, template_config)
-            
-            # Aplicar efeitos visuais com assets
-            video = self._apply_effects_with_assets(video, template_config)
+            video = self.compose_template(video, template_config, audio_path)
             
             # Salvar vídeo processado
             output_path = f"template_processed_{os.path.basename(video_path)}"
@@ -72,8 +96,7 @@ class TemplateRenderEngine:
             visual_settings = template_config.get('visual_settings', {})
             
             # Redimensionar para formato vertical (720x1280)
-            target_width = 720
-            target_height = 1280
+            target_width, target_height = VSL_RESOLUTION
             
             # Calcular proporção para manter aspecto
             current_width, current_height = video.size
@@ -151,22 +174,26 @@ class TemplateRenderEngine:
             print(f"⚠️ Erro ao aplicar efeitos de texto VSL: {e}")
             return video
     
-    def _apply_visual_settings(self, video: VideoFileClip, visual_settings: Dict) -> VideoFileClip:
+    def _apply_visual_settings(self, video: VideoFileClip, visual_settings: Dict,
+                               timeline_offset: float = 0.0, timeline_duration: Optional[float] = None) -> VideoFileClip:
         """Aplica configurações visuais do template"""
         try:
             # Aplicar resolução se especificada
             if 'resolution' in visual_settings:
                 width, height = map(int, visual_settings['resolution'].split('x'))
-                # Usar método de redimensionamento compatível
-                try:
-                    video = video.resize((width, height))
-                except AttributeError:
-                    # Fallback para versões mais antigas do PIL
-                    video = video.resize((width, height), resample='bicubic')
+                # Frames já na resolução do template dispensam o resize por frame
+                if tuple(video.size) != (width, height):
+                    # Usar método de redimensionamento compatível
+                    try:
+                        video = video.resize((width, height))
+                    except AttributeError:
+                        # Fallback para versões mais antigas do PIL
+                        video = video.resize((width, height), resample='bicubic')
             
             # Aplicar efeitos de transição
             if 'transition_effects' in visual_settings:
-                video = self._apply_transitions(video, visual_settings['transition_effects'])
+                video = self._apply_transitions(video, visual_settings['transition_effects'],
+                                                timeline_offset, timeline_duration)
             
             return video
             
@@ -177,82 +204,7 @@ class TemplateRenderEngine:
     def _apply_audio_settings_with_assets(self, video: VideoFileClip, audio_path: str, template_config: Dict) -> VideoFileClip:
         """Aplica configurações de áudio com assets do template"""
         try:
-            # Carregar áudio principal
-            audio = AudioFileClip(audio_path)
-            print(f"🎵 Áudio principal carregado: {os.path.basename(audio_path)}")
-            
-            # Obter assets para o template
-            template_id = template_config.get('template_id', 'default')
-            background_music_choice = template_config.get('background_music')
-            print(f"🎵 Aplicando áudio para template: {template_id}")
-            if background_music_choice:
-                print(f"🎵 Música de fundo escolhida: {background_music_choice}")
-            
-            if ASSETS_AVAILABLE:
-                assets = asset_manager.get_assets_for_template(template_id, background_music_choice)
-                print(f"🎵 Assets de áudio encontrados: {list(assets.keys())}")
-                
-                # Adicionar música de fundo
-                if assets.get('background_music') and os.path.exists(assets['background_music']):
-                    print(f"🎵 Tentando aplicar música de fundo: {assets['background_music']}")
-                    try:
-                        bg_music = AudioFileClip(assets['background_music'])
-                        # Loop da música de fundo para cobrir toda a duração
-                        bg_music = audio_loop(bg_music, duration=audio.duration)
-                        # Volume reduzido para não competir com a voz
-                        bg_music = bg_music.volumex(0.1)
-                        
-                        # Combinar áudio principal com música de fundo
-                        audio = CompositeAudioClip([audio, bg_music])
-                        print(f"✅ Música de fundo aplicada: {os.path.basename(assets['background_music'])}")
-                    except Exception as e:
-                        print(f"❌ Erro ao aplicar música de fundo: {e}")
-                else:
-                    print(f"⚠️ Música de fundo não encontrada ou não existe")
-                
-                # Adicionar efeitos sonoros
-                audio_clips = [audio]
-                
-                # Efeito de tensão
-                if assets.get('tension_effect') and os.path.exists(assets['tension_effect']):
-                    print(f"🎵 Tentando aplicar efeito de tensão: {assets['tension_effect']}")
-                    try:
-                        tension = AudioFileClip(assets['tension_effect'])
-                        tension = tension.volumex(0.2)
-                        audio_clips.append(tension)
-                        print(f"✅ Efeito de tensão aplicado: {os.path.basename(assets['tension_effect'])}")
-                    except Exception as e:
-                        print(f"❌ Erro ao aplicar efeito de tensão: {e}")
-                else:
-                    print(f"⚠️ Efeito de tensão não encontrado ou não existe")
-                
-                # Efeito de impacto
-                if assets.get('impact_effect') and os.path.exists(assets['impact_effect']):
-                    print(f"🎵 Tentando aplicar efeito de impacto: {assets['impact_effect']}")
-                    try:
-                        impact = AudioFileClip(assets['impact_effect'])
-                        impact = impact.volumex(0.15)
-                        audio_clips.append(impact)
-                        print(f"✅ Efeito de impacto aplicado: {os.path.basename(assets['impact_effect'])}")
-                    except Exception as e:
-                        print(f"❌ Erro ao aplicar efeito de impacto: {e}")
-                else:
-                    print(f"⚠️ Efeito de impacto não encontrado ou não existe")
-                
-                if len(audio_clips) > 1:
-                    print(f"🎵 Combinando {len(audio_clips)} clips de áudio")
-                    audio = CompositeAudioClip(audio_clips)
-                else:
-                    print(f"⚠️ Nenhum efeito de áudio aplicado")
-            else:
-                print(f"⚠️ AssetManager não disponível")
-            
-            # Normalizar áudio final
-            try:
-                audio = audio_normalize(audio)
-            except AttributeError:
-                # CompositeAudioClip não tem atributo fps, pular normalização
-                print("⚠️ Pulando normalização do áudio (CompositeAudioClip)")
+            audio = self.build_template_audio(audio_path, template_config)
             
             # Combinar áudio com vídeo
             video = video.set_audio(audio)
@@ -265,14 +217,96 @@ class TemplateRenderEngine:
             traceback.print_exc()
             return video
     
-    def _apply_transitions(self, video: VideoFileClip, transitions: List[str]) -> VideoFileClip:
+    def mix_template_samples(self, audio_path: str, template_config: Dict):
+        """
+        Mixagem do template em numpy (narração, música com ducking e efeitos nos cues)
+        Retorna (amostras, taxa de amostragem)
+        """
+        narration = audio_buffers.get(audio_path)
+        print(f"🎵 Áudio principal carregado: {os.path.basename(audio_path)}")
+        
+        # Obter assets para o template
+        template_id = template_config.get('template_id', 'default')
+        background_music_choice = template_config.get('background_music')
+        print(f"🎵 Aplicando áudio para template: {template_id}")
+        if background_music_choice:
+            print(f"🎵 Música de fundo escolhida: {background_music_choice}")
+        
+        music = None
+        effects = []
+        if ASSETS_AVAILABLE:
+            assets = asset_manager.get_assets_for_template(template_id, background_music_choice)
+            print(f"🎵 Assets de áudio encontrados: {list(assets.keys())}")
+            
+            # Música de fundo (repetida até o fim da narração e abaixada sob a voz)
+            if assets.get('background_music') and os.path.exists(assets['background_music']):
+                try:
+                    music = audio_buffers.get(assets['background_music']).samples
+                    print(f"✅ Música de fundo aplicada: {os.path.basename(assets['background_music'])}")
+                except Exception as e:
+                    print(f"❌ Erro ao aplicar música de fundo: {e}")
+            else:
+                print(f"⚠️ Música de fundo não encontrada ou não existe")
+            
+            # Efeitos sonoros nos tempos de cue (padrão: início do vídeo)
+            effect_cues = template_config.get('effect_cues', {})
+            for asset_name, volume in (('tension_effect', TENSION_EFFECT_VOLUME),
+                                       ('impact_effect', IMPACT_EFFECT_VOLUME)):
+                if not (assets.get(asset_name) and os.path.exists(assets[asset_name])):
+                    print(f"⚠️ Efeito '{asset_name}' não encontrado ou não existe")
+                    continue
+                try:
+                    samples = audio_buffers.get(assets[asset_name]).samples
+                    for cue in effect_cues.get(asset_name, [0.0]):
+                        effects.append((samples, volume, cue))
+                    print(f"✅ Efeito '{asset_name}' aplicado: {os.path.basename(assets[asset_name])}")
+                except Exception as e:
+                    print(f"❌ Erro ao aplicar efeito '{asset_name}': {e}")
+        else:
+            print(f"⚠️ AssetManager não disponível")
+        
+        mix = mix_tracks(narration.samples, narration.sample_rate, music, BACKGROUND_MUSIC_VOLUME, effects)
+        return mix, narration.sample_rate
+    
+    def write_template_mix(self, audio_path: str, template_config: Dict, output_path: str) -> str:
+        """Grava a mixagem do template uma única vez (para o mux final); em erro, usa a narração"""
+        try:
+            mix, sample_rate = self.mix_template_samples(audio_path, template_config)
+            write_wav(output_path, mix, sample_rate)
+            return output_path
+        except Exception as e:
+            print(f"⚠️ Erro ao montar áudio do template: {e}")
+            import traceback
+            traceback.print_exc()
+            return audio_path
+    
+    def build_template_audio(self, audio_path: str, template_config: Dict):
+        """Monta a mixagem de áudio do template (narração, música de fundo e efeitos)"""
+        try:
+            mix, sample_rate = self.mix_template_samples(audio_path, template_config)
+            from moviepy.audio.AudioClip import AudioArrayClip
+            return AudioArrayClip(mix, fps=sample_rate)
+            
+        except Exception as e:
+            print(f"⚠️ Erro ao montar áudio do template: {e}")
+            import traceback
+            traceback.print_exc()
+            return AudioFileClip(audio_path)
+    
+    def _apply_transitions(self, video: VideoFileClip, transitions: List[str],
+                           timeline_offset: float = 0.0, timeline_duration: Optional[float] = None) -> VideoFileClip:
         """Aplica efeitos de transição"""
         try:
+            # Em segmentos, o fade de entrada só vale no primeiro e o de saída só no último
+            is_first = timeline_offset <= 0
+            is_last = (timeline_duration is None or video.duration is None or
+                       timeline_offset + video.duration >= timeline_duration - 1e-3)
+            
             # Implementar transições básicas
-            if 'fade_in' in transitions:
-                video = video.fadein(1.0)
-            if 'fade_out' in transitions:
-                video = video.fadeout(1.0)
+            if 'fade_in' in transitions and is_first:
+                video = video.fadein(TRANSITION_FADE_DURATION)
+            if 'fade_out' in transitions and is_last:
+                video = video.fadeout(TRANSITION_FADE_DURATION)
             
             return video
             
@@ -293,7 +327,8 @@ class TemplateRenderEngine:
             print(f"⚠️ Erro ao aplicar efeitos de áudio: {e}")
             return audio
     
-    def _apply_effects_with_assets(self, video: VideoFileClip, template_config: Dict) -> VideoFileClip:
+    def _apply_effects_with_assets(self, video: VideoFileClip, template_config: Dict,
+                                   timeline_offset: float = 0.0) -> VideoFileClip:
         """Aplica efeitos visuais com assets do template"""
         try:
             template_id = template_config.get('template_id', 'default')
@@ -310,8 +345,8 @@ class TemplateRenderEngine:
                     try:
                         overlay = VideoFileClip(assets['film_overlay'])
                         overlay = overlay.resize(video.size)
-                        overlay = overlay.set_duration(video.duration)
-                        overlay = overlay.set_opacity(0.3)  # 30% de opacidade
+                        overlay = self._align_overlay(overlay, video.duration, timeline_offset)
+                        overlay = overlay.set_opacity(FILM_OVERLAY_OPACITY)  # 30% de opacidade
                         video_clips.append(overlay)
                         print(f"✅ Overlay de filme aplicado: {os.path.basename(assets['film_overlay'])}")
                     except Exception as e:
@@ -325,8 +360,8 @@ class TemplateRenderEngine:
                     try:
                         light_leak = VideoFileClip(assets['light_leak'])
                         light_leak = light_leak.resize(video.size)
-                        light_leak = light_leak.set_duration(video.duration)
-                        light_leak = light_leak.set_opacity(0.2)  # 20% de opacidade
+                        light_leak = self._align_overlay(light_leak, video.duration, timeline_offset)
+                        light_leak = light_leak.set_opacity(LIGHT_LEAK_OPACITY)  # 20% de opacidade
                         video_clips.append(light_leak)
                         print(f"✅ Light leak aplicado: {os.path.basename(assets['light_leak'])}")
                     except Exception as e:
@@ -350,44 +385,42 @@ class TemplateRenderEngine:
             traceback.print_exc()
             return video
     
+    def _align_overlay(self, overlay, duration: float, timeline_offset: float = 0.0):
+        """Posiciona o overlay na linha do tempo global (segmentos continuam de onde o anterior parou)"""
+        if timeline_offset > 0:
+            return overlay.set_duration(timeline_offset + duration).set_start(-timeline_offset)
+        return overlay.set_duration(duration)
+    
     def apply_strategic_pauses(self, audio_file_path: str, pauses_config: Dict) -> str:
         """Aplica pausas estratégicas ao áudio"""
+        output_path, _ = self.insert_strategic_pauses(audio_file_path, pauses_config)
+        return output_path
+    
+    def insert_strategic_pauses(self, audio_file_path: str, pauses_config: Dict,
+                                word_timings: Optional[List[Dict]] = None) -> Tuple[str, PauseRemap]:
+        """
+        Insere as pausas do template em fins de frase (word_timings) ou silêncios
+        Retorna (áudio com pausas, remapeamento de tempo para legendas e segmentos)
+        """
         try:
-            # Carregar áudio
-            audio = AudioFileClip(audio_file_path)
-            
-            # Configurações de pausas
-            pause_duration = pauses_config.get('duration', 2.0)
-            pause_count = pauses_config.get('count', 3)
-            
-            # Dividir áudio em segmentos
-            total_duration = audio.duration
-            segment_duration = total_duration / (pause_count + 1)
-            
-            # Criar segmentos de áudio
-            audio_segments = []
-            for i in range(pause_count + 1):
-                start_time = i * segment_duration
-                end_time = (i + 1) * segment_duration
-                
-                segment = audio.subclip(start_time, end_time)
-                audio_segments.append(segment)
-                
-                # Adicionar pausa (exceto após o último segmento)
-                if i < pause_count:
-                    silence = AudioFileClip(audio_file_path).subclip(0, pause_duration).volumex(0)
-                    audio_segments.append(silence)
+            # Amostras do buffer compartilhado (decodificado uma única vez)
+            buffer = audio_buffers.get(audio_file_path)
+            
+            targets = pause_targets(pauses_config)
+            if not targets:
+                return audio_file_path, PauseRemap()
             
-            # Combinar segmentos
-            from moviepy.editor import concatenate_audioclips
-            final_audio = concatenate_audioclips(audio_segments)
+            frames, durations = place_pauses(buffer.samples, buffer.sample_rate, targets, word_timings)
+            final_audio, remap = insert_pauses(buffer.samples, buffer.sample_rate, frames, durations)
+            print(f"⏸️ {len(frames)} pausas inseridas ({remap.total:.1f}s no total)")
             
-            # Salvar áudio com pausas
+            # Salvar áudio com pausas e registrar as amostras para as próximas etapas
             output_path = f"paused_{audio_file_path}"
-            final_audio.write_audiofile(output_path, verbose=False, logger=None)
+            write_wav(output_path, final_audio, buffer.sample_rate)
+            audio_buffers.put(output_path, final_audio)
             
-            return output_path
+            return output_path, remap
             
         except Exception as e:
             print(f"❌ Erro ao aplicar pausas estratégicas: {e}")
-            return audio_file_path 
\ No newline at end of file
+            return audio_file_path, PauseRemap() 
\ No newline at end of file